@@ -8,6 +8,11 @@ import API_BASE_URL from './config';
 
 export default function EventCheckIn() {
   const { eventId } = useParams();
+  // Signed check-in token from the scanned QR code. It rotates within a
+  // minute, so it is traded for a check-in nonce as soon as the page opens
+  const token = new URLSearchParams(window.location.search).get('t');
+  const [nonce, setNonce] = useState(null);
+  const [tokenError, setTokenError] = useState('');
   const [event, setEvent] = useState(null);
   const [attendance, setAttendance] = useState(null);
   const [surveys, setSurveys] = useState([]);
@@ -16,6 +21,9 @@ export default function EventCheckIn() {
 
   useEffect(() => {
     fetchEvent();
+    if (token) {
+      startCheckinSession();
+    }
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [eventId]);
 
@@ -39,6 +47,24 @@ export default function EventCheckIn() {
     }
   };
 
+  const startCheckinSession = async () => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/checkin/session/`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ event_id: eventId, token: token })
+      });
+      const data = await response.json();
+      if (response.ok) {
+        setNonce(data.nonce);
+      } else {
+        setTokenError(data.detail || 'Invalid QR code. Please scan the code displayed at the event.');
+      }
+    } catch (err) {
+      console.error('Failed to start check-in:', err);
+    }
+  };
+
   const fetchSurveys = async () => {
     if (!event) return;
     try {
@@ -105,7 +131,7 @@ export default function EventCheckIn() {
       </div>
 
       {!attendance ? (
-        <TimeInOut event={event} onComplete={(data) => setAttendance(data)} />
+        <TimeInOut event={event} nonce={nonce} tokenError={tokenError} onComplete={(data) => setAttendance(data)} />
       ) : (
         <div>
           <ProgressBar currentStep={
@@ -1,12 +1,15 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import API_BASE_URL from './config';
+import { useLiveQRCode } from './liveQRCode';
 
 export default function QRAttendance() {
   const { eventId } = useParams();
   const navigate = useNavigate();
   const [event, setEvent] = useState(null);
   const [loading, setLoading] = useState(true);
+  // The displayed code carries a rotating token, reloaded as it changes
+  const { liveQrUrl } = useLiveQRCode(eventId);
   const [step, setStep] = useState('scan'); // scan, register, processing, result
   const [result, setResult] = useState(null);
   const [attendeeData, setAttendeeData] = useState({
@@ -110,10 +113,10 @@ export default function QRAttendance() {
             <h2 style={styles.qrTitle}>📱 Scan QR Code to Continue</h2>
             <p style={styles.qrSubtitle}>Point your camera at the QR code below</p>
             
-            {event.qr_code ? (
+            {liveQrUrl ? (
               <div style={styles.qrImageContainer}>
                 <img 
-                  src={`${API_BASE_URL}${event.qr_code}`} 
+                  src={liveQrUrl} 
                   alt="Event QR Code" 
                   style={styles.qrImage}
                   onError={(e) => {
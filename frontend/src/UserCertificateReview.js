@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import API_BASE_URL from './config';
+import { fetchCertificateBlob } from './certificateDownload';
 
 export default function UserCertificateReview() {
   const { attendanceId } = useParams();
@@ -93,13 +94,7 @@ export default function UserCertificateReview() {
 
   const handleDownload = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/attendances/${attendanceId}/download_certificate/`);
-      
-      if (!response.ok) {
-        throw new Error('Failed to download certificate');
-      }
-      
-      const blob = await response.blob();
+      const blob = await fetchCertificateBlob(attendanceId);
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
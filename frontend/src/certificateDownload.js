@@ -0,0 +1,34 @@
+import API_BASE_URL from './config';
+
+// download_certificate answers 202 with a certificate_status while the PDF is
+// still being rendered by the certificate worker, so poll until it is ready.
+const POLL_INTERVAL_MS = 2000;
+const MAX_POLLS = 15;
+
+export async function fetchCertificateBlob(attendanceId) {
+  for (let attempt = 0; attempt < MAX_POLLS; attempt++) {
+    const response = await fetch(`${API_BASE_URL}/api/attendances/${attendanceId}/download_certificate/`);
+
+    if (response.status === 202) {
+      const data = await response.json();
+      if (data.certificate_status === 'failed') {
+        throw new Error('Certificate generation failed. Please contact the event organizer.');
+      }
+      await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+      continue;
+    }
+
+    if (!response.ok) {
+      let detail = 'Failed to download certificate';
+      try {
+        detail = (await response.json()).detail || detail;
+      } catch (err) {
+        // Not a JSON error body
+      }
+      throw new Error(detail);
+    }
+
+    return response.blob();
+  }
+  throw new Error('Your certificate is still being generated. Please try again in a minute.');
+}
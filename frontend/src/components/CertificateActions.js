@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import API_BASE_URL from '../config';
+import { fetchCertificateBlob } from '../certificateDownload';
 import EmailPreviewModal from './EmailPreviewModal';
 
 export default function CertificateActions({ attendanceId, attendeeEmail, attendeeName, eventTitle }) {
@@ -10,36 +11,26 @@ export default function CertificateActions({ attendanceId, attendeeEmail, attend
   const handleDownload = async () => {
     try {
       console.log('Downloading certificate for attendance:', attendanceId);
-      const response = await fetch(`${API_BASE_URL}/api/attendances/${attendanceId}/download_certificate/`);
+      const blob = await fetchCertificateBlob(attendanceId);
+      console.log('Blob size:', blob.size);
       
-      console.log('Response status:', response.status);
-      
-      if (response.ok) {
-        const blob = await response.blob();
-        console.log('Blob size:', blob.size);
-        
-        if (blob.size < 100) {
-          alert('❌ Certificate file is empty or corrupted. Please try again.');
-          return;
-        }
-        
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = 'certificate.pdf';
-        document.body.appendChild(a);
-        a.click();
-        document.body.removeChild(a);
-        window.URL.revokeObjectURL(url);
-        alert('✅ Certificate downloaded successfully!');
-      } else {
-        const errorText = await response.text();
-        console.error('Download failed:', errorText);
-        alert('❌ Failed to download certificate. Please make sure you completed the event.');
+      if (blob.size < 100) {
+        alert('❌ Certificate file is empty or corrupted. Please try again.');
+        return;
       }
+      
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = 'certificate.pdf';
+      document.body.appendChild(a);
+      a.click();
+      document.body.removeChild(a);
+      window.URL.revokeObjectURL(url);
+      alert('✅ Certificate downloaded successfully!');
     } catch (err) {
       console.error('Download error:', err);
-      alert('❌ Error: ' + err.message + '\n\nMake sure the backend server is running!');
+      alert('❌ ' + err.message);
     }
   };
 
@@ -76,21 +67,15 @@ export default function CertificateActions({ attendanceId, attendeeEmail, attend
 
   const handlePrint = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/attendances/${attendanceId}/download_certificate/`);
+      const blob = await fetchCertificateBlob(attendanceId);
+      const url = window.URL.createObjectURL(blob);
       
-      if (response.ok) {
-        const blob = await response.blob();
-        const url = window.URL.createObjectURL(blob);
-        
-        // Open in new window and print
-        const printWindow = window.open(url, '_blank');
-        if (printWindow) {
-          printWindow.onload = () => {
-            printWindow.print();
-          };
-        }
-      } else {
-        alert('❌ Failed to load certificate for printing');
+      // Open in new window and print
+      const printWindow = window.open(url, '_blank');
+      if (printWindow) {
+        printWindow.onload = () => {
+          printWindow.print();
+        };
       }
     } catch (err) {
       console.error('Print error:', err);
@@ -1,29 +1,9 @@
-import React, { useState, useEffect } from 'react';
-import API_BASE_URL from '../config';
+import React from 'react';
+import { useLiveQRCode } from '../liveQRCode';
 
 export default function EventQRCode({ eventId }) {
-  const [qrCodeUrl, setQrCodeUrl] = useState(null);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    fetchQRCode();
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [eventId]);
-
-  const fetchQRCode = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/events/${eventId}/qr_code/`);
-      const data = await response.json();
-      
-      if (data.qr_code_url) {
-        setQrCodeUrl(`${API_BASE_URL}${data.qr_code_url}`);
-      }
-    } catch (err) {
-      console.error('Failed to fetch QR code:', err);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // Shown live with a rotating token; download and print use the event-long code
+  const { qrCodeUrl, liveQrUrl, loading } = useLiveQRCode(eventId);
 
   const handleDownload = () => {
     if (qrCodeUrl) {
@@ -90,7 +70,7 @@ export default function EventQRCode({ eventId }) {
       <div style={styles.card}>
         <h4 style={styles.title}>📱 Event QR Code</h4>
         <div style={styles.qrContainer}>
-          <img src={qrCodeUrl} alt="Event QR Code" style={styles.qrImage} />
+          <img src={liveQrUrl} alt="Event QR Code" style={styles.qrImage} />
         </div>
         <p style={styles.instruction}>
           Attendees can scan this QR code to check in to the event
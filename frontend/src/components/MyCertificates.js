@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import API_BASE_URL from '../config';
+import { fetchCertificateBlob } from '../certificateDownload';
 
 export default function MyCertificates() {
   const [certificates, setCertificates] = useState([]);
@@ -37,21 +38,17 @@ export default function MyCertificates() {
 
   const handleDownload = async (attendanceId, eventTitle) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/attendances/${attendanceId}/download_certificate/`);
-      
-      if (response.ok) {
-        const blob = await response.blob();
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = `certificate_${eventTitle.replace(/\s+/g, '_')}.pdf`;
-        document.body.appendChild(a);
-        a.click();
-        document.body.removeChild(a);
-        window.URL.revokeObjectURL(url);
-      }
+      const blob = await fetchCertificateBlob(attendanceId);
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `certificate_${eventTitle.replace(/\s+/g, '_')}.pdf`;
+      document.body.appendChild(a);
+      a.click();
+      document.body.removeChild(a);
+      window.URL.revokeObjectURL(url);
     } catch (err) {
-      alert('Failed to download certificate');
+      alert('Failed to download certificate: ' + err.message);
     }
   };
 
@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import API_BASE_URL from '../config';
 
-const TimeInOut = ({ event, onComplete }) => {
+const TimeInOut = ({ event, nonce, tokenError, onComplete }) => {
   const [formData, setFormData] = useState({
     full_name: '',
     email: '',
@@ -23,7 +23,8 @@ const TimeInOut = ({ event, onComplete }) => {
         },
         body: JSON.stringify({
           event_id: event.id,
-          attendee: formData
+          attendee: formData,
+          nonce: nonce
         })
       });
 
@@ -78,7 +79,7 @@ const TimeInOut = ({ event, onComplete }) => {
           />
         </div>
 
-        {error && <p style={styles.error}>{error}</p>}
+        {(error || tokenError) && <p style={styles.error}>{error || tokenError}</p>}
 
         <button type="submit" disabled={loading} style={styles.button}>
           {loading ? 'Processing...' : 'Time In'}
@@ -1,29 +1,9 @@
-import React, { useState, useEffect } from 'react';
-import API_BASE_URL from '../config';
+import React from 'react';
+import { useLiveQRCode } from '../liveQRCode';
 
 export default function UserEventQR({ event }) {
-  const [qrCodeUrl, setQrCodeUrl] = useState(null);
-  const [loading, setLoading] = useState(true);
-
-  useEffect(() => {
-    fetchQRCode();
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [event.id]);
-
-  const fetchQRCode = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/events/${event.id}/qr_code/`);
-      const data = await response.json();
-      
-      if (data.qr_code_url) {
-        setQrCodeUrl(`${API_BASE_URL}${data.qr_code_url}`);
-      }
-    } catch (err) {
-      console.error('Failed to fetch QR code:', err);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // Shown live with a rotating token; the download is the event-long code
+  const { qrCodeUrl, liveQrUrl, loading } = useLiveQRCode(event.id);
 
   const handleDownload = () => {
     if (qrCodeUrl) {
@@ -65,7 +45,7 @@ export default function UserEventQR({ event }) {
 
         <div style={styles.qrContainer}>
           <div style={styles.qrWrapper}>
-            <img src={qrCodeUrl} alt="Event QR Code" style={styles.qrImage} />
+            <img src={liveQrUrl} alt="Event QR Code" style={styles.qrImage} />
           </div>
           <div style={styles.scanLine}></div>
         </div>
@@ -0,0 +1,52 @@
+import { useState, useEffect } from 'react';
+import API_BASE_URL from './config';
+
+// The live QR image carries a check-in token that rotates every
+// rotation_seconds (QR_TOKEN_ROTATION on the server), so it is reloaded as
+// each window starts. The stored PNG (qrCodeUrl) lasts for the whole event
+// and is the one to download or print.
+export function useLiveQRCode(eventId) {
+  const [qrCodeUrl, setQrCodeUrl] = useState(null);
+  const [rotationSeconds, setRotationSeconds] = useState(0);
+  const [rotationWindow, setRotationWindow] = useState(0);
+  const [loading, setLoading] = useState(true);
+
+  useEffect(() => {
+    let cancelled = false;
+    const fetchQRCode = async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/api/events/${eventId}/qr_code/`);
+        const data = await response.json();
+        if (cancelled) return;
+        setQrCodeUrl(data.qr_code_url ? `${API_BASE_URL}${data.qr_code_url}` : null);
+        setRotationSeconds(data.rotation_seconds || 0);
+      } catch (err) {
+        console.error('Failed to fetch QR code:', err);
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    };
+    fetchQRCode();
+    return () => {
+      cancelled = true;
+    };
+  }, [eventId]);
+
+  useEffect(() => {
+    if (!rotationSeconds) return undefined;
+    const period = rotationSeconds * 1000;
+    let timer;
+    const schedule = () => {
+      timer = setTimeout(() => {
+        setRotationWindow(Math.floor(Date.now() / period));
+        schedule();
+      }, period - (Date.now() % period));
+    };
+    setRotationWindow(Math.floor(Date.now() / period));
+    schedule();
+    return () => clearTimeout(timer);
+  }, [rotationSeconds]);
+
+  const liveQrUrl = qrCodeUrl ? `${API_BASE_URL}/api/events/${eventId}/qr_code/?output=svg&w=${rotationWindow}` : null;
+  return { qrCodeUrl, liveQrUrl, rotationSeconds, loading };
+}
@@ -0,0 +1,79 @@
+"""
+Database profiles for the settings modules.
+
+Each function returns one entry for settings.DATABASES, so deployments
+pick a profile instead of copying connection options around.
+"""
+
+
+def sqlite_pragmas(synchronous='NORMAL', cache_mb=64, mmap_mb=256):
+    """PRAGMAs run on every new SQLite connection by the production profile."""
+    return {
+        # Readers no longer block the writer, nor the writer readers
+        'journal_mode': 'WAL',
+        # With WAL, NORMAL only syncs at checkpoints: a crash cannot corrupt the
+        # database, but a power loss can undo the last commits (FULL cannot)
+        'synchronous': synchronous,
+        # Negative cache_size is in KiB
+        'cache_size': -cache_mb * 1024,
+        'mmap_size': mmap_mb * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
+
+
+def sqlite_database(name, busy_timeout=20, conn_max_age=600, **pragmas):
+    """
+    SQLite tuned for many concurrent requests: WAL journaling, a page cache
+    and memory-mapped reads on every connection, persistent connections,
+    and writers that wait up to ``busy_timeout`` seconds for the write lock
+    instead of failing with "database is locked".
+
+    Transactions start with BEGIN IMMEDIATE so a transaction takes the
+    write lock up front: a deferred one that reads and then writes can fail
+    at once when another writer got there first, without waiting out the
+    busy timeout.
+    """
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': busy_timeout,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {pragma}={value}'
+                                     for pragma, value in sqlite_pragmas(**pragmas).items()),
+        },
+    }
+
+
+def postgres_database(name, user='', password='', host='localhost', port=5432,
+                      pool_min=2, pool_max=10, pool_timeout=10, mirror=None):
+    """
+    PostgreSQL through psycopg 3 with Django's built-in connection pool:
+    each process keeps ``pool_min`` to ``pool_max`` open connections and a
+    request waits up to ``pool_timeout`` seconds for a free one. Pooled
+    connections replace CONN_MAX_AGE, which must stay 0.
+
+    ``mirror`` names the alias a read replica copies, so tests run it
+    against that alias's test database instead of creating another.
+    """
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': name,
+        'USER': user,
+        'PASSWORD': password,
+        'HOST': host,
+        'PORT': port,
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'min_size': pool_min,
+                'max_size': pool_max,
+                'timeout': pool_timeout,
+            },
+        },
+    }
+    if mirror:
+        database['TEST'] = {'MIRROR': mirror}
+    return database
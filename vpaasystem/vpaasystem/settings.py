@@ -68,6 +68,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'vpass.middleware.CompletionCheckMiddleware',
 ]
 
 ROOT_URLCONF = 'vpaasystem.urls'
@@ -100,6 +101,18 @@ DATABASES = {
     }
 }
 
+# Analytics, stats and attendance exports read from a 'replica' alias when one
+# is configured (see vpass/db_router.py). Locally, point DATABASE_REPLICA_PATH at
+# a copy of db.sqlite3 to try it with two aliases; settings_test.py mirrors
+# default into one for the tests.
+DATABASE_ROUTERS = ['vpass.db_router.ReplicaRouter']
+if os.environ.get('DATABASE_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DATABASE_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -193,6 +206,64 @@ EMAIL_PORT = 1025
 EMAIL_USE_TLS = False
 DEFAULT_FROM_EMAIL = 'noreply@hcdc.edu.ph'
 
+# Outbox (drained by `python manage.py run_email_worker`): messages per second
+# over one SMTP connection (0 = no limit), and retries with a backoff that
+# starts at EMAIL_RETRY_BACKOFF seconds and doubles per attempt
+EMAIL_SEND_RATE = 5
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BACKOFF = 60
+
+# Public URL of the frontend that event QR codes point to (phones must be able to reach it)
+QR_PUBLIC_BASE_URL = os.environ.get('QR_PUBLIC_BASE_URL', 'http://localhost:3000')
+
+# Signed check-in tokens in QR codes (see vpass/checkin_tokens.py). Live codes
+# rotate every QR_TOKEN_ROTATION seconds (0 disables rotation) and stay valid
+# for QR_TOKEN_GRACE_WINDOWS more rotations; printed codes are valid from
+# QR_STATIC_TOKEN_MARGIN seconds before the event starts until as long after it ends.
+QR_TOKEN_SECRET = os.environ.get('QR_TOKEN_SECRET', '')
+QR_TOKEN_ROTATION = 30
+QR_TOKEN_GRACE_WINDOWS = 1
+QR_STATIC_TOKEN_MARGIN = 60 * 60
+# The check-in page trades the token it was opened with for a one-check-in
+# nonce valid this many seconds, so filling in the form can outlast a rotation
+CHECKIN_NONCE_TTL = 15 * 60
+# Reject check-ins that don't present a token (manual entry without scanning).
+# Off by default because manual entry in the QR scanner and the QR attendance
+# page's registration form post without one; turn it on when every check-in scans a code.
+QR_REQUIRE_CHECKIN_TOKEN = os.environ.get('QR_REQUIRE_CHECKIN_TOKEN', 'False').lower() == 'true'
+
+# Largest number of scans accepted by one request to checkin/batch/
+CHECKIN_BATCH_MAX = 500
+# Oldest scanned_at (in seconds before the upload) accepted from checkin/batch/.
+# Tokens in a batch are verified when it arrives, not at scanned_at, so this
+# only bounds how far back a device can date an attendance
+CHECKIN_MAX_UPLOAD_LAG = 10 * 60
+# Offline scanner sync cursors are moved back this many seconds so late commits are resent, not missed
+SYNC_CURSOR_OVERLAP = 5
+
+# Per-process roster cache for the QR time-in/time-out toggle (see vpass/roster_cache.py)
+ROSTER_CACHE_EVENTS = 16
+ROSTER_CACHE_TTL = 60
+ROSTER_CACHE_MAX_MEMBERS = 20000
+
+# Write-behind check-ins (see vpass/checkin_journal.py): checkin/ acknowledges scans
+# from a local append-only journal and `python manage.py run_checkin_writer` writes
+# them to the database in batches. Only turn this on with the writer running.
+CHECKIN_WRITE_BEHIND = os.environ.get('CHECKIN_WRITE_BEHIND', 'False').lower() == 'true'
+CHECKIN_JOURNAL_DIR = BASE_DIR / 'checkin_journal'
+CHECKIN_JOURNAL_SEGMENT_SECONDS = 300
+# fsync every scan before acknowledging it, so acknowledged scans survive a power loss
+CHECKIN_JOURNAL_FSYNC = True
+
+# Certificate generation queue (drained by `python manage.py run_certificate_worker`)
+CERTIFICATE_JOB_MAX_ATTEMPTS = 3
+
+# Certificate downloads: set to 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache)
+# to let the front web server send the file instead of a Django worker.
+# For nginx, SENDFILE_URL_PREFIX must be an `internal` location aliased to MEDIA_ROOT.
+SENDFILE_BACKEND = os.environ.get('SENDFILE_BACKEND') or None
+SENDFILE_URL_PREFIX = '/protected/'
+
 # ============================================================================
 # SECURITY ENHANCEMENTS (Added for production-ready school project)
 # ============================================================================
@@ -1,4 +1,5 @@
 from .settings import *
+from .databases import postgres_database, sqlite_database
 import os
 
 # Production settings
@@ -13,14 +14,34 @@ ALLOWED_HOSTS = [
     '*'  # Allow all for now
 ]
 
-# Database for production (SQLite works on Vercel)
+# Database for production (SQLite works on Vercel): WAL, busy timeout, page cache,
+# mmap and persistent connections, see vpaasystem/databases.py. Measure with
+# `python manage.py benchmark_sqlite`. The write-behind check-in journal only
+# forgets scans once they are committed, so commits must then survive a power loss.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(
+        BASE_DIR / 'db.sqlite3',
+        busy_timeout=int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+        conn_max_age=int(os.environ.get('CONN_MAX_AGE', 600)),
+        synchronous='FULL' if CHECKIN_WRITE_BEHIND else 'NORMAL',
+    )
 }
 
+# PostgreSQL with pooled connections when POSTGRES_DB is set, plus an optional
+# streaming replica (POSTGRES_REPLICA_HOST) that serves analytics and exports
+if os.environ.get('POSTGRES_DB'):
+    POSTGRES = {
+        'name': os.environ['POSTGRES_DB'],
+        'user': os.environ.get('POSTGRES_USER', ''),
+        'password': os.environ.get('POSTGRES_PASSWORD', ''),
+        'port': int(os.environ.get('POSTGRES_PORT', 5432)),
+        'pool_min': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+        'pool_max': int(os.environ.get('POSTGRES_POOL_MAX', 10)),
+    }
+    DATABASES = {'default': postgres_database(host=os.environ.get('POSTGRES_HOST', 'localhost'), **POSTGRES)}
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = postgres_database(host=os.environ['POSTGRES_REPLICA_HOST'], mirror='default', **POSTGRES)
+
 # Static files for production
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
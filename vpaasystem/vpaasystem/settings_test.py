@@ -0,0 +1,11 @@
+from .settings import *
+
+# Test settings: python manage.py test --settings=vpaasystem.settings_test
+
+# A replica alias mirroring default, so vpass/tests.py can check which
+# connection the reporting views read from (see vpass/db_router.py)
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db.sqlite3',
+    'TEST': {'MIRROR': 'default'},
+}
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Event, Attendee, Attendance, Survey, SurveyResponse, UserProfile
+from .models import Event, Attendee, Attendance, Survey, SurveyResponse, UserProfile, CertificateJob, OutboundEmail, CheckinReceipt
 
 # Register your models here.
 class UserProfileInline(admin.StackedInline):
@@ -38,6 +38,28 @@ class SurveyAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'created_at')
     search_fields = ('title', 'event__title')
 
+class CertificateJobAdmin(admin.ModelAdmin):
+    list_display = ('attendance', 'status', 'attempts', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('attendance__attendee__full_name', 'attendance__event__title')
+    actions = ('retry_failed',)
+
+    @admin.action(description='Retry selected failed jobs')
+    def retry_failed(self, request, queryset):
+        from .tasks import retry_failed_certificates
+        count = retry_failed_certificates(queryset)
+        self.message_user(request, f'{count} failed job(s) queued for another attempt.')
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'kind', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('to_email', 'subject')
+
+class CheckinReceiptAdmin(admin.ModelAdmin):
+    list_display = ('key', 'status', 'attendance', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('key',)
+
 # Unregister the default User admin
 admin.site.unregister(User)
 
@@ -47,4 +69,7 @@ admin.site.register(Event, EventAdmin)
 admin.site.register(Attendee, AttendeeAdmin)
 admin.site.register(Attendance)
 admin.site.register(Survey, SurveyAdmin)
-admin.site.register(SurveyResponse)
\ No newline at end of file
+admin.site.register(SurveyResponse)
+admin.site.register(CertificateJob, CertificateJobAdmin)
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
+admin.site.register(CheckinReceipt, CheckinReceiptAdmin)
\ No newline at end of file
@@ -0,0 +1,548 @@
+import math
+import os
+from collections import namedtuple
+from functools import lru_cache
+from io import BytesIO
+from itertools import count
+from string import Formatter
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+
+# Certificates are served and stored as binary files, so the 7-bit safe
+# ASCII85 wrapper around each compressed stream only costs CPU (its encoder
+# is pure Python) and ~25% extra size.
+rl_config.useA85 = 0
+
+# Bump whenever the certificate layout changes; stored on each Attendance
+# so outdated files can be found and regenerated.
+RENDERER_VERSION = 3
+
+# Background images given by relative path are looked up here
+TEMPLATE_ASSET_DIR = os.path.join(os.path.dirname(__file__), 'certificate_templates')
+
+# Placeholders that differ per attendee; everything else is drawn once per event
+ATTENDEE_FIELDS = {'name', 'certificate_id'}
+
+_form_names = count(1)
+
+MESSAGE_LINES = [
+    "Your participation and dedication to learning inspire us all.",
+    "May the knowledge you've gained today empower you to reach new heights",
+    "and make a positive impact in your community and beyond.",
+    "Continue to pursue excellence in all your endeavors!"
+]
+
+
+def _text(text, y, font, size, color, x=306, align='center', **options):
+    return dict(type='text', text=text, x=x, y=y, font=font, size=size, color=color, align=align, **options)
+
+
+# Certificate layouts, keyed by Event.certificate_template. Coordinates are
+# PDF points from the bottom-left corner of the page. Text may use the
+# {name}, {event_title}, {date} and {certificate_id} placeholders.
+CERTIFICATE_TEMPLATES = {
+    'default': {
+        'pagesize': letter,
+        'background': (0.95, 0.95, 0.95),
+        'elements': [
+            dict(type='rect', x=20, y=20, width=572, height=752, stroke=(0.2, 0.4, 0.7), line_width=10),
+            dict(type='circle', x=306, y=396, radius=300, fill=(0.9, 0.95, 1.0)),
+            _text("HOLY CROSS OF DAVAO COLLEGE", 722, 'Helvetica-Bold', 16, (0.6, 0.0, 0.15)),
+            _text("Vice President for Academic Affairs", 704, 'Helvetica', 11, (0.4, 0.4, 0.4)),
+            # Title with shadow effect
+            _text("CERTIFICATE", 654, 'Helvetica-Bold', 36, (0.2, 0.4, 0.7), x=308),
+            _text("CERTIFICATE", 652, 'Helvetica-Bold', 36, (0.1, 0.2, 0.5)),
+            _text("OF ACHIEVEMENT", 612, 'Helvetica', 14, (0.3, 0.3, 0.3)),
+            dict(type='line', x1=206, y1=592, x2=406, y2=592, stroke=(0.2, 0.4, 0.7), line_width=2),
+            _text("This is to certify that", 532, 'Helvetica', 16, (0.1, 0.1, 0.1)),
+            _text("{name}", 482, 'Helvetica-Bold', 24, (0.1, 0.3, 0.6), transform='upper'),
+            _text("has successfully attended the event:", 432, 'Helvetica', 14, (0.2, 0.2, 0.2)),
+            _text('"{event_title}"', 392, 'Helvetica-Bold', 18, (0.1, 0.3, 0.6)),
+            *[_text(line, 342 - 18 * i, 'Helvetica-Oblique', 11, (0.3, 0.3, 0.3))
+              for i, line in enumerate(MESSAGE_LINES)],
+            _text("Date: {date}", 220, 'Helvetica-Oblique', 12, (0.3, 0.3, 0.3)),
+            dict(type='line', x1=206, y1=160, x2=406, y2=160, stroke=(0.2, 0.4, 0.7), line_width=1),
+            _text("Authorized Signature", 140, 'Helvetica', 11, (0.3, 0.3, 0.3)),
+            _text("Holy Cross of Davao College", 125, 'Helvetica-Bold', 10, (0.3, 0.3, 0.3)),
+            _text("Vice President for Academic Affairs", 112, 'Helvetica', 9, (0.3, 0.3, 0.3)),
+            _text("Certificate ID: {certificate_id}", 40, 'Helvetica', 8, (0.5, 0.5, 0.5)),
+            _text("This certificate is proof of attendance and completion of the event.", 25,
+                  'Helvetica', 8, (0.5, 0.5, 0.5)),
+            # Watermark
+            _text("VPAA SYSTEM", -200, 'Helvetica', 60, (0.9, 0.9, 0.9), x=300, align='left', rotate=45),
+        ],
+    },
+    'modern': {
+        'pagesize': letter,
+        'background': (1, 1, 1),
+        'elements': [
+            dict(type='rect', x=0, y=672, width=612, height=120, fill=(0.08, 0.16, 0.3)),
+            dict(type='line', x1=0, y1=670, x2=612, y2=670, stroke=(0.85, 0.65, 0.13), line_width=4),
+            _text("HOLY CROSS OF DAVAO COLLEGE", 735, 'Helvetica-Bold', 18, (1, 1, 1)),
+            _text("Vice President for Academic Affairs", 712, 'Helvetica', 11, (0.85, 0.85, 0.9)),
+            _text("Certificate of Participation", 590, 'Helvetica-Bold', 30, (0.08, 0.16, 0.3)),
+            _text("PROUDLY PRESENTED TO", 540, 'Helvetica', 12, (0.45, 0.45, 0.45)),
+            _text("{name}", 490, 'Helvetica-Bold', 28, (0.08, 0.16, 0.3), transform='upper'),
+            dict(type='line', x1=156, y1=475, x2=456, y2=475, stroke=(0.85, 0.65, 0.13), line_width=1.5),
+            _text("for attending", 440, 'Helvetica', 13, (0.35, 0.35, 0.35)),
+            _text("{event_title}", 410, 'Helvetica-Bold', 18, (0.2, 0.2, 0.2)),
+            _text("held on {date}", 385, 'Helvetica-Oblique', 12, (0.4, 0.4, 0.4)),
+            dict(type='line', x1=206, y1=170, x2=406, y2=170, stroke=(0.3, 0.3, 0.3), line_width=1),
+            _text("Authorized Signature", 152, 'Helvetica', 10, (0.3, 0.3, 0.3)),
+            _text("Vice President for Academic Affairs", 138, 'Helvetica', 9, (0.3, 0.3, 0.3)),
+            dict(type='rect', x=0, y=0, width=612, height=50, fill=(0.08, 0.16, 0.3)),
+            _text("Certificate ID: {certificate_id}", 22, 'Helvetica', 8, (1, 1, 1)),
+        ],
+    },
+    'classic': {
+        'pagesize': letter,
+        'background': (0.99, 0.97, 0.9),
+        'elements': [
+            dict(type='rect', x=24, y=24, width=564, height=744, stroke=(0.45, 0.3, 0.1), line_width=4),
+            dict(type='rect', x=36, y=36, width=540, height=720, stroke=(0.45, 0.3, 0.1), line_width=1),
+            _text("Holy Cross of Davao College", 700, 'Times-Bold', 20, (0.45, 0.3, 0.1)),
+            _text("Office of the Vice President for Academic Affairs", 680, 'Times-Italic', 12, (0.3, 0.3, 0.3)),
+            _text("Certificate of Attendance", 600, 'Times-Bold', 34, (0.2, 0.15, 0.1)),
+            _text("This certifies that", 530, 'Times-Italic', 16, (0.2, 0.2, 0.2)),
+            _text("{name}", 480, 'Times-Bold', 28, (0.1, 0.1, 0.1)),
+            dict(type='line', x1=156, y1=468, x2=456, y2=468, stroke=(0.45, 0.3, 0.1), line_width=0.75),
+            _text("attended", 430, 'Times-Italic', 16, (0.2, 0.2, 0.2)),
+            _text("{event_title}", 395, 'Times-Bold', 20, (0.2, 0.15, 0.1)),
+            _text("on {date}", 365, 'Times-Roman', 14, (0.2, 0.2, 0.2)),
+            dict(type='line', x1=206, y1=170, x2=406, y2=170, stroke=(0.2, 0.2, 0.2), line_width=0.75),
+            _text("Authorized Signature", 150, 'Times-Roman', 12, (0.2, 0.2, 0.2)),
+            _text("Vice President for Academic Affairs", 135, 'Times-Italic', 10, (0.3, 0.3, 0.3)),
+            _text("Certificate No. {certificate_id}", 50, 'Times-Roman', 8, (0.4, 0.4, 0.4)),
+        ],
+    },
+}
+
+# TrueType stand-ins for the PDF base fonts when rendering PNGs, tried in
+# order: the project's fonts/ directory first, then the system font path.
+PIL_FONT_FILES = {
+    'Helvetica': ('OpenSans-Regular.ttf', 'DejaVuSans.ttf'),
+    'Helvetica-Bold': ('OpenSans-Bold.ttf', 'DejaVuSans-Bold.ttf'),
+    'Helvetica-Oblique': ('OpenSans-Italic.ttf', 'DejaVuSans-Oblique.ttf', 'DejaVuSans.ttf'),
+    'Times-Roman': ('DejaVuSerif.ttf',),
+    'Times-Bold': ('DejaVuSerif-Bold.ttf',),
+    'Times-Italic': ('DejaVuSerif-Italic.ttf', 'DejaVuSerif.ttf'),
+}
+FONT_DIR = os.path.join(os.path.dirname(__file__), '..', 'fonts')
+
+
+TextOp = namedtuple('TextOp', 'text fields x y font size color align rotate upper')
+ShapeOp = namedtuple('ShapeOp', 'kind args fill stroke line_width')
+
+
+def register_certificate_template(name, layout):
+    """Add or replace a template layout and drop any plans compiled from the old one."""
+    CERTIFICATE_TEMPLATES[name] = layout
+    compile_template.cache_clear()
+    compile_base_layer.cache_clear()
+    compile_png_base_layer.cache_clear()
+
+
+def certificate_values(attendance):
+    """Placeholder values for one attendance."""
+    event = attendance.event
+    return {
+        'name': attendance.attendee.full_name,
+        'event_title': event.title,
+        'date': event.start.strftime('%B %d, %Y'),
+        'certificate_id': attendance.id,
+    }
+
+
+def _compile_element(element):
+    kind = element['type']
+    fill = element.get('fill')
+    stroke = element.get('stroke')
+    line_width = element.get('line_width', 1)
+    if kind == 'rect':
+        return ShapeOp(kind, (element['x'], element['y'], element['width'], element['height']), fill, stroke, line_width)
+    if kind == 'circle':
+        return ShapeOp(kind, (element['x'], element['y'], element['radius']), fill, stroke, line_width)
+    if kind == 'line':
+        return ShapeOp(kind, (element['x1'], element['y1'], element['x2'], element['y2']), None, stroke, line_width)
+    if kind == 'text':
+        text = element['text']
+        fields = frozenset(field for _, field, _, _ in Formatter().parse(text) if field)
+        return TextOp(text, fields, element['x'], element['y'], element['font'], element['size'],
+                      tuple(element.get('color', (0, 0, 0))), element.get('align', 'center'),
+                      element.get('rotate', 0), element.get('transform') == 'upper')
+    raise ValueError(f'Unknown certificate element type: {kind}')
+
+
+class CompiledTemplate:
+    """
+    A certificate layout turned into a ready-to-run drawing plan.
+
+    Elements are parsed once and split into the base layer (static text and
+    anything that only depends on the event) and the attendee layer, so the
+    PDF and PNG renderers walk the same list of operations.
+    """
+
+    def __init__(self, name, layout):
+        self.name = name
+        self.pagesize = tuple(layout.get('pagesize', letter))
+        self.background = layout.get('background')
+        image = layout.get('background_image')
+        if image and not os.path.isabs(image):
+            image = os.path.join(TEMPLATE_ASSET_DIR, image)
+        self.background_image = image
+
+        self.base_ops = []
+        self.attendee_ops = []
+        for element in layout['elements']:
+            op = _compile_element(element)
+            if isinstance(op, TextOp) and op.fields & ATTENDEE_FIELDS:
+                self.attendee_ops.append(op)
+            else:
+                self.base_ops.append(op)
+
+    @staticmethod
+    def format_text(op, values):
+        text = op.text.format(**values) if op.fields else op.text
+        return text.upper() if op.upper else text
+
+    # PDF
+
+    def draw_background(self, c):
+        width, height = self.pagesize
+        if self.background is not None:
+            c.setFillColorRGB(*self.background)
+            c.rect(0, 0, width, height, fill=1, stroke=0)
+        if self.background_image:
+            c.drawImage(self.background_image, 0, 0, width, height)
+
+    def draw_pdf(self, c, ops, values):
+        for op in ops:
+            if isinstance(op, TextOp):
+                text = self.format_text(op, values)
+                c.setFont(op.font, op.size)
+                c.setFillColorRGB(*op.color)
+                if op.rotate:
+                    c.saveState()
+                    c.rotate(op.rotate)
+                if op.align == 'center':
+                    c.drawCentredString(op.x, op.y, text)
+                elif op.align == 'right':
+                    c.drawRightString(op.x, op.y, text)
+                else:
+                    c.drawString(op.x, op.y, text)
+                if op.rotate:
+                    c.restoreState()
+                continue
+
+            if op.fill is not None:
+                c.setFillColorRGB(*op.fill)
+            if op.stroke is not None:
+                c.setStrokeColorRGB(*op.stroke)
+                c.setLineWidth(op.line_width)
+            fill, stroke = int(op.fill is not None), int(op.stroke is not None)
+            if op.kind == 'rect':
+                c.rect(*op.args, fill=fill, stroke=stroke)
+            elif op.kind == 'circle':
+                c.circle(*op.args, fill=fill, stroke=stroke)
+            else:
+                c.line(*op.args)
+
+    # PNG
+
+    def blank_png(self, values, scale=2):
+        """Draw the background and base layer with Pillow at ``scale`` pixels per point."""
+        from PIL import Image
+
+        width, height = self.pagesize
+        size = (round(width * scale), round(height * scale))
+        background = _pil_color(self.background) if self.background is not None else (255, 255, 255)
+        image = Image.new('RGB', size, background)
+        if self.background_image:
+            with Image.open(self.background_image) as artwork:
+                image.paste(artwork.convert('RGB').resize(size))
+        self.draw_png(image, self.base_ops, values, scale)
+        return image
+
+    def render_png(self, values, scale=2, extra_text=None, blank=None):
+        """
+        Draw the whole certificate and return an RGB image.
+
+        ``blank`` is a pre-rendered base layer (see get_png_base_layer()); it
+        is copied, so only the attendee text is drawn per call.
+        """
+        from PIL import ImageDraw
+
+        if blank is not None:
+            image = blank.copy()
+        else:
+            image = self.blank_png(values, scale)
+        self.draw_png(image, self.attendee_ops, values, scale)
+
+        if extra_text:
+            font = load_pil_font('Helvetica', 10 * scale)
+            point = self._point(40, 80, scale)
+            ImageDraw.Draw(image).text(point, extra_text, font=font, fill=(0, 0, 0), anchor='ls')
+        return image
+
+    def draw_png(self, image, ops, values, scale):
+        from PIL import ImageDraw
+
+        draw = ImageDraw.Draw(image)
+        for op in ops:
+            if isinstance(op, TextOp):
+                font = load_pil_font(op.font, op.size * scale)
+                self._draw_png_text(image, draw, op, self.format_text(op, values), font, scale)
+            else:
+                self._draw_png_shape(draw, op, scale)
+
+    def _point(self, x, y, scale):
+        return x * scale, (self.pagesize[1] - y) * scale
+
+    def _draw_png_shape(self, draw, op, scale):
+        fill = _pil_color(op.fill) if op.fill is not None else None
+        outline = _pil_color(op.stroke) if op.stroke is not None else None
+        stroke_width = max(1, round(op.line_width * scale)) if outline else 0
+
+        if op.kind == 'line':
+            x1, y1, x2, y2 = op.args
+            draw.line([self._point(x1, y1, scale), self._point(x2, y2, scale)], fill=outline, width=stroke_width)
+            return
+
+        if op.kind == 'rect':
+            x, y, w, h = op.args
+            left, top = self._point(x, y + h, scale)
+            right, bottom = self._point(x + w, y, scale)
+        else:
+            x, y, r = op.args
+            left, top = self._point(x - r, y + r, scale)
+            right, bottom = self._point(x + r, y - r, scale)
+        if outline:
+            # PDF strokes straddle the path; Pillow draws outlines inside the box
+            grow = stroke_width / 2
+            left, top, right, bottom = left - grow, top - grow, right + grow, bottom + grow
+        box = [left, top, right, bottom]
+        if op.kind == 'rect':
+            draw.rectangle(box, fill=fill, outline=outline, width=stroke_width)
+        else:
+            draw.ellipse(box, fill=fill, outline=outline, width=stroke_width)
+
+    def _draw_png_text(self, image, draw, op, text, font, scale):
+        anchor = {'center': 'ms', 'right': 'rs'}.get(op.align, 'ls')
+        if not op.rotate:
+            draw.text(self._point(op.x, op.y, scale), text, font=font, fill=_pil_color(op.color), anchor=anchor)
+            return
+
+        from PIL import Image, ImageDraw
+
+        # The PDF rotates the coordinate system about the page origin
+        angle = math.radians(op.rotate)
+        x = op.x * math.cos(angle) - op.y * math.sin(angle)
+        y = op.x * math.sin(angle) + op.y * math.cos(angle)
+        origin_x, origin_y = self._point(x, y, scale)
+
+        # Draw onto a layer just big enough for the text, turn it and place
+        # it so the anchor point lands on the rotated origin.
+        left, top, right, bottom = font.getbbox(text, anchor=anchor)
+        layer = Image.new('RGBA', (math.ceil(right - left), math.ceil(bottom - top)), (0, 0, 0, 0))
+        ImageDraw.Draw(layer).text((-left, -top), text, font=font, fill=_pil_color(op.color) + (255,), anchor=anchor)
+        rotated = layer.rotate(op.rotate, expand=True)
+        dx = -left - layer.width / 2
+        dy = -top - layer.height / 2
+        anchor_x = rotated.width / 2 + dx * math.cos(angle) + dy * math.sin(angle)
+        anchor_y = rotated.height / 2 - dx * math.sin(angle) + dy * math.cos(angle)
+        image.paste(rotated, (round(origin_x - anchor_x), round(origin_y - anchor_y)), rotated)
+
+
+def _pil_color(color):
+    return tuple(round(channel * 255) for channel in color)
+
+
+@lru_cache(maxsize=64)
+def load_pil_font(font_name, size):
+    """
+    Load a TrueType font standing in for a PDF base font, or Pillow's default.
+
+    Cached per process: opening and parsing a font file costs more than
+    drawing a line of text with it.
+    """
+    from PIL import ImageFont
+
+    for filename in PIL_FONT_FILES.get(font_name, ('DejaVuSans.ttf',)):
+        path = os.path.abspath(os.path.join(FONT_DIR, filename))
+        try:
+            return ImageFont.truetype(path if os.path.exists(path) else filename, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=32)
+def compile_template(name):
+    """Compile a registered layout once per process; unknown names fall back to the default template."""
+    layout = CERTIFICATE_TEMPLATES.get(name) or CERTIFICATE_TEMPLATES['default']
+    return CompiledTemplate(name, layout)
+
+
+class BaseLayer:
+    """
+    Pre-rendered certificate artwork shared by every attendee of an event.
+
+    Holds the PDF operators produced by the template's base layer, so
+    stamping a certificate only splices them into the page instead of
+    re-running every drawing call and string-width measurement.
+    """
+
+    def __init__(self, plan, values, code, font_mapping):
+        self.plan = plan
+        self.values = values
+        self.code = code
+        self.font_mapping = font_mapping
+        self.form_name = f'certificate_base_{next(_form_names)}'
+
+    def draw_plan(self, c):
+        c.saveState()
+        self.plan.draw_background(c)
+        self.plan.draw_pdf(c, self.plan.base_ops, self.values)
+        c.restoreState()
+
+    def draw(self, c):
+        # The operators refer to fonts by internal names (/F1, /F2, ...) that a
+        # document hands out in registration order. They only match on a
+        # canvas that registered nothing else first; otherwise draw for real.
+        for font_name, internal_name in self.font_mapping:
+            if c._doc.getInternalFontName(font_name) != internal_name:
+                self.draw_plan(c)
+                return
+        # Images are document resources, so they cannot be replayed from
+        # captured operators and are placed per document instead.
+        if self.plan.background_image:
+            c.drawImage(self.plan.background_image, 0, 0, *self.plan.pagesize)
+        c.addLiteral(self.code)
+
+    def draw_as_form(self, c):
+        """
+        Draw the layer through a form XObject for multi-page documents.
+
+        The form is drawn from the plan once per document, against that
+        document's own font resources, so pages of different templates can
+        share one file; every later page only references it.
+        """
+        if not c.hasForm(self.form_name):
+            c.beginForm(self.form_name)
+            self.draw_plan(c)
+            c.endForm()
+        c.doForm(self.form_name)
+
+
+@lru_cache(maxsize=128)
+def compile_base_layer(template, title, date_text):
+    """Render the base layer for one template/event combination."""
+    plan = compile_template(template)
+    values = {'event_title': title, 'date': date_text}
+    c = canvas.Canvas(BytesIO(), pagesize=plan.pagesize)
+    c.saveState()
+    if plan.background is not None:
+        c.setFillColorRGB(*plan.background)
+        c.rect(0, 0, *plan.pagesize, fill=1, stroke=0)
+    plan.draw_pdf(c, plan.base_ops, values)
+    c.restoreState()
+    return BaseLayer(plan, values, '\n'.join(c._code), tuple(c._doc.fontMapping.items()))
+
+
+def get_base_layer(event):
+    return compile_base_layer(event.certificate_template, event.title, event.start.strftime('%B %d, %Y'))
+
+
+def render_certificate_pdf(attendance, use_base_layer=True):
+    """
+    Render the certificate for an attendance and return the PDF bytes.
+
+    With ``use_base_layer`` the event's cached base layer is stamped under
+    the attendee text; without it the whole page is drawn from the plan.
+    """
+    event = attendance.event
+    plan = compile_template(event.certificate_template)
+    values = certificate_values(attendance)
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=plan.pagesize)
+
+    if use_base_layer:
+        get_base_layer(event).draw(c)
+    else:
+        plan.draw_background(c)
+        plan.draw_pdf(c, plan.base_ops, values)
+
+    plan.draw_pdf(c, plan.attendee_ops, values)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def render_certificates_pdf(attendances, output):
+    """
+    Render many certificates as one multi-page PDF written to ``output``.
+
+    Fonts, the artwork and the watermark are shared by every page through
+    the event's base layer form, so each extra page only adds the attendee
+    text. Returns the number of pages written.
+    """
+    c = canvas.Canvas(output, pagesize=letter)
+    pages = 0
+    for attendance in attendances:
+        plan = compile_template(attendance.event.certificate_template)
+        c.setPageSize(plan.pagesize)
+        get_base_layer(attendance.event).draw_as_form(c)
+        plan.draw_pdf(c, plan.attendee_ops, certificate_values(attendance))
+        c.showPage()
+        pages += 1
+    c.save()
+    return pages
+
+
+@lru_cache(maxsize=8)
+def compile_png_base_layer(template, title, date_text, scale=2):
+    """
+    Render the blank PNG certificate for one template/event combination.
+
+    Everything but the attendee text is drawn once, including the measuring
+    of every static string; renders copy the image instead of redrawing it.
+    Images are several megabytes each, hence the small cache.
+    """
+    plan = compile_template(template)
+    return plan.blank_png({'event_title': title, 'date': date_text}, scale)
+
+
+def get_png_base_layer(event, scale=2):
+    return compile_png_base_layer(event.certificate_template, event.title, event.start.strftime('%B %d, %Y'), scale)
+
+
+def render_certificate_png(attendance, scale=2, extra_text=None):
+    """Render the certificate for an attendance as PNG bytes from the same plan as the PDF."""
+    plan = compile_template(attendance.event.certificate_template)
+    blank = get_png_base_layer(attendance.event, scale)
+    image = plan.render_png(certificate_values(attendance), scale=scale, extra_text=extra_text, blank=blank)
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_certificate_pngs(attendances, scale=2, extra_text=None):
+    """
+    Render PNG certificates for many attendances, yielding (attendance, bytes).
+
+    Fonts, blank templates and the encode buffer are reused across the
+    batch, so the per-certificate cost is the attendee text and the PNG
+    encoding.
+    """
+    buffer = BytesIO()
+    for attendance in attendances:
+        plan = compile_template(attendance.event.certificate_template)
+        blank = get_png_base_layer(attendance.event, scale)
+        image = plan.render_png(certificate_values(attendance), scale=scale, extra_text=extra_text, blank=blank)
+        buffer.seek(0)
+        buffer.truncate()
+        image.save(buffer, format='PNG')
+        yield attendance, buffer.getvalue()
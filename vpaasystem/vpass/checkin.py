@@ -0,0 +1,614 @@
+"""
+Fast path for QR check-ins.
+
+Each event keeps a denormalized ``present_count``. Marking an attendee
+present takes a seat with one conditional UPDATE on the event row
+(``present_count < max_capacity``) in the same transaction as the
+attendance write, so concurrent scans can never go past capacity and no
+scan has to COUNT the attendances. A re-scan of someone already present
+is a single indexed read.
+
+A signed QR token's capacity policy version is checked by that same
+UPDATE: a code issued before the event's capacity changed takes no seat.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .checkin_tokens import CheckinNonce, InvalidCheckinToken, verify_token
+from .models import Event, Attendee, Attendance, CheckinReceipt, normalize_email, normalize_student_id
+from .roster_cache import RosterMember, cached_roster, get_roster, invalidate_roster
+
+
+CheckinResult = namedtuple('CheckinResult', 'attendance_id created newly_present')
+
+STALE_POLICY_DETAIL = 'This QR code is out of date. Please scan the code currently displayed.'
+
+
+class CheckinError(Exception):
+    """A check-in that was refused; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, detail, status, action=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.action = action
+
+
+@contextmanager
+def consuming_nonce(credential):
+    """
+    Let a check-in nonce (see checkin_tokens.issue_nonce) vouch for the one
+    check-in made inside this block. Raises CheckinError if it was already
+    used; if the block fails, the nonce stays usable. QR tokens and None
+    pass through.
+    """
+    if not isinstance(credential, CheckinNonce):
+        yield
+        return
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                CheckinReceipt.objects.create(key=f'nonce-{credential.nonce_id}', status='nonce_used')
+        except IntegrityError:
+            raise CheckinError('This check-in link was already used. Please scan the event QR code again.', 403)
+        yield
+
+
+def reserve_seat(event_id, policy_version=None):
+    """
+    Count one more attendee present if the event has room; False if full,
+    missing, or no longer at the token's ``policy_version`` (when given).
+    """
+    events = Event.objects.filter(id=event_id)
+    if policy_version is not None:
+        events = events.filter(capacity_policy_version=policy_version)
+    return bool(events
+                .filter(Q(max_capacity__lte=0) | Q(present_count__lt=F('max_capacity')))
+                .update(present_count=F('present_count') + 1))
+
+
+def adjust_present_count(event_id, delta):
+    """Move an event's counter without a capacity check (admin and API edits of attendances)."""
+    if delta > 0:
+        Event.objects.filter(id=event_id).update(present_count=F('present_count') + delta)
+    elif delta < 0:
+        Event.objects.filter(id=event_id, present_count__gte=-delta).update(present_count=F('present_count') + delta)
+
+
+def present_count_subquery():
+    """Correlated subquery counting an event's present attendances (for reconciliation)."""
+    present = (Attendance.objects.filter(event=OuterRef('pk'), present=True)
+               .order_by().values('event').annotate(n=Count('id')).values('n'))
+    return Coalesce(Subquery(present, output_field=IntegerField()), 0)
+
+
+def _seat_error(event_id, policy_version=None):
+    event = Event.objects.filter(id=event_id).values_list('max_capacity', 'capacity_policy_version').first()
+    if event is None:
+        return CheckinError('Event not found', 404)
+    capacity, current_version = event
+    if policy_version is not None and policy_version != current_version:
+        return CheckinError(STALE_POLICY_DETAIL, 403)
+    return CheckinError(f'Event is full! Maximum capacity: {capacity}', 400)
+
+
+_UNKNOWN = object()
+
+
+def mark_present(event_id, attendee_id, existing=_UNKNOWN, policy_version=None):
+    """
+    Mark an attendee present at an event, taking a seat if they weren't already.
+
+    Returns a CheckinResult; raises CheckinError when the event is full or
+    does not exist. The seat and the attendance change commit together, and
+    a scan that loses a race to a concurrent one gives its seat back.
+    ``existing`` is the (attendance id, present) pair or None when the
+    caller already knows it, saving a read. ``policy_version`` is the
+    verified QR token's, if the scan carried one.
+    """
+    if existing is _UNKNOWN:
+        existing = (Attendance.objects.filter(event_id=event_id, attendee_id=attendee_id)
+                    .values_list('id', 'present').first())
+    if existing and existing[1]:
+        return CheckinResult(existing[0], False, False)
+
+    with transaction.atomic():
+        if not reserve_seat(event_id, policy_version):
+            raise _seat_error(event_id, policy_version)
+        created = False
+        if existing:
+            attendance_id = existing[0]
+            newly_present = bool(Attendance.objects.filter(id=attendance_id, present=False).update(present=True, updated_at=timezone.now()))
+        else:
+            attendance = Attendance(event_id=event_id, attendee_id=attendee_id, present=True)
+            try:
+                with transaction.atomic():
+                    Attendance.objects.bulk_create([attendance])
+                attendance_id = attendance.pk
+                created = newly_present = True
+            except IntegrityError:
+                # Inserted by a concurrent scan, or the event has just been deleted
+                attendance_id = (Attendance.objects.filter(event_id=event_id, attendee_id=attendee_id)
+                                 .values_list('id', flat=True).first())
+                if attendance_id is None:
+                    raise CheckinError('Event not found', 404)
+                newly_present = bool(Attendance.objects.filter(id=attendance_id, present=False).update(present=True, updated_at=timezone.now()))
+        if not newly_present:
+            adjust_present_count(event_id, -1)
+
+    if newly_present and not created:
+        # An existing row may already have a survey response; see vpass.signals
+        from .signals import schedule_completion_check
+        schedule_completion_check(attendance_id)
+    return CheckinResult(attendance_id, created, newly_present)
+
+
+def find_attendee_id(email):
+    """Id of the attendee registered with ``email`` (unique index lookup), or None."""
+    return Attendee.objects.filter(email=normalize_email(email)).values_list('id', flat=True).first()
+
+
+def register_attendee(email, full_name, student_id='', user=None):
+    """
+    Create an attendee and return its id, or the existing one's if a
+    concurrent request registered the same email first. Raises
+    CheckinError if the student ID belongs to someone else.
+    """
+    try:
+        with transaction.atomic():
+            return Attendee.objects.create(email=email, full_name=full_name, student_id=student_id, user=user).id
+    except IntegrityError:
+        attendee_id = find_attendee_id(email)
+        if attendee_id is not None:
+            return attendee_id
+        student_id = normalize_student_id(student_id)
+        if student_id and Attendee.objects.filter(student_id=student_id).exists():
+            raise CheckinError('This student ID is already registered to another attendee', 400)
+        raise CheckinError('This account is already linked to another attendee', 400)
+
+
+def check_in(event_id, email, verified=False, full_name='', student_id='', user=None, policy_version=None):
+    """
+    Mark an attendee present at an event and return the attendance as a small dict.
+
+    Unknown emails are registered when ``full_name`` is given; otherwise
+    CheckinError asks for the attendee's details. ``verified`` means a valid
+    signed token vouched for the event, so it is not looked up first;
+    ``policy_version`` is that token's.
+    """
+    event_id = int(event_id)
+    if not verified and not Event.objects.filter(id=event_id).exists():
+        raise CheckinError('Event not found', 404)
+
+    attendee_id = find_attendee_id(email)
+    if attendee_id is None:
+        if not full_name:
+            raise CheckinError('Please provide your details first', 404, action='register')
+        attendee_id = register_attendee(email, full_name, student_id, user)
+
+    result = mark_present(event_id, attendee_id, policy_version=policy_version)
+    note_present(event_id, email, attendee_id, result.attendance_id)
+    return {'id': result.attendance_id, 'event': event_id, 'attendee': attendee_id, 'present': True}
+
+
+def note_present(event_id, email, attendee_id, attendance_id):
+    """Record a check-in in the event's cached roster, if there is one."""
+    roster = cached_roster(event_id)
+    if roster is None:
+        return
+    member = roster.get(email)
+    if member is None or member.attendee_id != attendee_id:
+        roster.add(email, RosterMember(attendee_id, attendance_id, True))
+    else:
+        member.attendance_id = attendance_id
+        member.present = True
+
+
+def toggle_attendance(event_id, email, policy_version=None):
+    """
+    Time an attendee in, or out if they are already in, using the event's cached roster.
+
+    Returns (action, roster, member) with action 'time_in', 'time_out',
+    'completed' or 'register' (unknown email; member is None). Raises
+    CheckinError if the event does not exist or is full. A repeat scan of
+    a known attendee costs a single conditional write; if that write finds
+    the cached state out of date the roster is reloaded and the scan
+    decided again. ``policy_version`` is the verified QR token's, if any.
+    """
+    for attempt in range(2):
+        roster = get_roster(event_id)
+        if roster is None:
+            raise CheckinError('Event not found', 404)
+
+        member = roster.get(email)
+        if member is None:
+            attendee_id = find_attendee_id(email)
+            if attendee_id is None:
+                return 'register', roster, None
+            state = None
+            if not roster.complete:
+                state = (Attendance.objects.filter(event_id=event_id, attendee_id=attendee_id)
+                         .values_list('id', 'present', 'time_out').first())
+            member = RosterMember(attendee_id, *state) if state else RosterMember(attendee_id)
+            roster.add(email, member)
+
+        if member.present and not member.time_out:
+            now = timezone.now()
+            if Attendance.objects.filter(id=member.attendance_id, present=True, time_out__isnull=True).update(
+                    time_out=now, updated_at=now):
+                member.time_out = now
+                return 'time_out', roster, member
+        elif member.time_out:
+            return 'completed', roster, member
+        else:
+            existing = (member.attendance_id, False) if member.attendance_id else None
+            result = mark_present(event_id, member.attendee_id, existing=existing, policy_version=policy_version)
+            if result.newly_present:
+                member.attendance_id = result.attendance_id
+                member.present = True
+                return 'time_in', roster, member
+
+        # Another process changed this attendance since the roster was loaded
+        invalidate_roster(event_id)
+    raise CheckinError('Attendance changed during the scan, please try again', 409)
+
+
+def _parse_scan(scan, now, journaled=False):
+    """
+    Validate one batch item. Returns (event_id, email, student_id,
+    scanned_at, policy_version) or an error result.
+    """
+    if not isinstance(scan, dict):
+        return {'status': 'invalid', 'detail': 'Each scan must be an object'}
+    try:
+        event_id = int(scan.get('event_id'))
+    except (TypeError, ValueError):
+        return {'status': 'invalid', 'detail': 'Invalid event ID'}
+    email = normalize_email(str(scan.get('email') or ''))
+    student_id = normalize_student_id(str(scan.get('student_id') or ''))
+    if not email and not student_id:
+        return {'status': 'invalid', 'detail': 'Email or student ID required'}
+
+    scanned_at = now
+    if scan.get('scanned_at'):
+        try:
+            scanned_at = parse_datetime(str(scan['scanned_at']))
+        except ValueError:
+            scanned_at = None
+        if scanned_at is None:
+            return {'status': 'invalid', 'detail': 'Invalid scanned_at timestamp'}
+        if timezone.is_naive(scanned_at):
+            scanned_at = timezone.make_aware(scanned_at)
+        # A device clock running fast must not check anyone in "from the future"
+        scanned_at = min(scanned_at, now)
+        if not journaled and (now - scanned_at).total_seconds() > settings.CHECKIN_MAX_UPLOAD_LAG:
+            return {'status': 'invalid', 'detail': 'Scan is too old to upload', 'reason': 'stale_scan'}
+
+    # scanned_at comes from the device, so it can't extend a token's life: uploads
+    # are checked when they arrive. Journal timestamps are this server's own.
+    token = scan.get('token')
+    policy_version = None
+    if token:
+        verified_at = scanned_at if journaled else now
+        try:
+            policy_version = verify_token(token, event_id=event_id, now=verified_at.timestamp()).policy_version
+        except InvalidCheckinToken as e:
+            return {'status': 'invalid_token', 'detail': 'Invalid QR code', 'reason': e.reason}
+    elif settings.QR_REQUIRE_CHECKIN_TOKEN and not journaled:
+        # A journaled scan's token (or nonce) was checked when it was acknowledged
+        return {'status': 'invalid_token', 'detail': 'Please scan the event QR code to check in',
+                'reason': 'missing_token'}
+    return event_id, email, student_id, scanned_at, policy_version
+
+
+def _resolve_attendees(emails, student_ids):
+    """Map normalized emails and student ids to attendee ids with one query each."""
+    by_email = {}
+    by_student_id = {}
+    if emails:
+        by_email = {email: attendee_id for attendee_id, email in
+                    Attendee.objects.filter(email__in=emails).values_list('id', 'email')}
+    if student_ids:
+        by_student_id = {student_id: attendee_id for attendee_id, student_id in
+                         Attendee.objects.filter(student_id__in=student_ids).values_list('id', 'student_id')}
+    return by_email, by_student_id
+
+
+def _check_in_event(event_id, items, results):
+    """
+    Check in one event's share of a batch: ``items`` is a list of
+    (index, attendee_id, scanned_at, policy_version) in scan order.
+
+    The event row is locked for the transaction, so the seats counted here
+    and by concurrent single check-ins (which update the same row first)
+    never overlap.
+    """
+    with transaction.atomic():
+        event = (Event.objects.select_for_update().filter(id=event_id)
+                 .values_list('max_capacity', 'present_count', 'capacity_policy_version').first())
+        if event is None:
+            for index, _, _, _ in items:
+                results[index] = {'status': 'event_not_found', 'detail': 'Event not found'}
+            return
+        capacity, present_count, current_version = event
+        seats = capacity - present_count if capacity > 0 else len(items)
+
+        existing = dict(Attendance.objects
+                        .filter(event_id=event_id, attendee_id__in={item[1] for item in items})
+                        .values_list('attendee_id', 'present'))
+        was_absent = {attendee_id for attendee_id, present in existing.items() if not present}
+        admitted = []
+        for index, attendee_id, scanned_at, policy_version in items:
+            if policy_version is not None and policy_version != current_version:
+                results[index] = {'status': 'invalid_token', 'detail': STALE_POLICY_DETAIL, 'reason': 'stale_policy'}
+            elif existing.get(attendee_id):
+                results[index] = {'status': 'already_present', 'attendee': attendee_id}
+            elif seats <= 0:
+                results[index] = {'status': 'full', 'detail': f'Event is full! Maximum capacity: {capacity}'}
+            else:
+                seats -= 1
+                existing[attendee_id] = True
+                admitted.append((index, Attendance(event_id=event_id, attendee_id=attendee_id,
+                                                   present=True, timestamp=scanned_at)))
+        if not admitted:
+            return
+
+        Attendance.objects.bulk_create(
+            [attendance for _, attendance in admitted],
+            update_conflicts=True,
+            unique_fields=['event', 'attendee'],
+            update_fields=['present', 'updated_at'],
+        )
+        Event.objects.filter(id=event_id).update(present_count=F('present_count') + len(admitted))
+
+    invalidate_roster(event_id)
+    from .signals import schedule_completion_check
+    for index, attendance in admitted:
+        results[index] = {'status': 'checked_in', 'attendance': attendance.pk, 'attendee': attendance.attendee_id}
+        if attendance.attendee_id in was_absent:
+            # An existing row may already have a survey response; see vpass.signals
+            schedule_completion_check(attendance.pk)
+
+
+def check_in_batch(scans, journaled=False):
+    """
+    Check in a batch of scans queued by a scanner device.
+
+    Each scan is {event_id, email or student_id, scanned_at (ISO 8601,
+    optional), token (optional), idempotency_key (optional)}. Attendees are
+    resolved with one query per identifier type and each event's
+    attendances are written with one upsert. Returns one result dict per
+    scan, in order, with a ``status`` of checked_in, already_present,
+    unknown_attendee, full, event_not_found, invalid_token or invalid.
+
+    A scan whose idempotency key was seen before is not applied again: its
+    recorded result comes back with ``replayed`` set.
+
+    Tokens are verified at the time the batch arrives, so a rotating token
+    is only good within its grace window however the scan is dated. Scans
+    older than CHECKIN_MAX_UPLOAD_LAG are refused. ``journaled`` scans were
+    timestamped by this server's check-in journal: their tokens are verified
+    at that time and the lag bound doesn't apply.
+    """
+    now = timezone.now()
+    results = [None] * len(scans)
+    keys = {}
+    for index, scan in enumerate(scans):
+        key = scan.get('idempotency_key') if isinstance(scan, dict) else None
+        if key is None:
+            continue
+        if not isinstance(key, str) or not 0 < len(key) <= 64:
+            results[index] = {'status': 'invalid', 'detail': 'Invalid idempotency key'}
+        else:
+            keys.setdefault(key, []).append(index)
+
+    receipts = CheckinReceipt.objects.filter(key__in=list(keys)).values_list('key', 'status', 'attendance_id')
+    for key, receipt_status, attendance_id in receipts:
+        for index in keys.pop(key):
+            results[index] = {'status': receipt_status, 'attendance': attendance_id, 'replayed': True}
+    # A key repeated within the batch is applied once
+    first_of_key = {indexes[0]: key for key, indexes in keys.items()}
+    repeats = {index: indexes[0] for indexes in keys.values() for index in indexes[1:]}
+
+    parsed = []
+    for index, scan in enumerate(scans):
+        if results[index] is not None or index in repeats:
+            continue
+        item = _parse_scan(scan, now, journaled)
+        if isinstance(item, dict):
+            results[index] = item
+        else:
+            parsed.append((index,) + item)
+
+    by_email, by_student_id = _resolve_attendees(
+        {email for _, _, email, _, _, _ in parsed if email},
+        {student_id for _, _, _, student_id, _, _ in parsed if student_id},
+    )
+
+    per_event = {}
+    for index, event_id, email, student_id, scanned_at, policy_version in parsed:
+        attendee_id = by_email.get(email) or by_student_id.get(student_id)
+        if attendee_id is None:
+            results[index] = {'status': 'unknown_attendee', 'detail': 'Attendee not registered'}
+            continue
+        per_event.setdefault(event_id, []).append((index, attendee_id, scanned_at, policy_version))
+
+    for event_id, items in per_event.items():
+        # Earliest scans get the last seats
+        items.sort(key=lambda item: item[2])
+        _check_in_event(event_id, items, results)
+
+    # Malformed scans are not recorded, so a corrected upload can reuse the key
+    CheckinReceipt.objects.bulk_create([
+        CheckinReceipt(key=key, status=results[index]['status'], attendance_id=results[index].get('attendance'))
+        for index, key in first_of_key.items()
+        if results[index]['status'] not in ('invalid', 'invalid_token')
+    ], ignore_conflicts=True)
+    for index, first in repeats.items():
+        results[index] = dict(results[first], replayed=True)
+
+    for index, result in enumerate(results):
+        result['index'] = index
+    return results
+
+
+
+def queue_check_in(event_id, email, token=None, full_name='', student_id='', user=None, policy_version=None):
+    """
+    check_in() for write-behind mode: validate the scan and append it to the
+    journal instead of writing the attendance (see vpass.checkin_journal).
+
+    Returns the attendance dict if the attendee is already present, else a
+    pending one with ``id`` None and the journal ``receipt`` key. Unknown
+    emails are still registered at once, and a full event is refused from
+    its counter; a seat taken in the meantime can still turn a pending scan
+    into ``full`` when it is flushed.
+    """
+    from .checkin_journal import append_scan
+
+    event_id = int(event_id)
+    event = (Event.objects.filter(id=event_id)
+             .values_list('max_capacity', 'present_count', 'capacity_policy_version').first())
+    if event is None:
+        raise CheckinError('Event not found', 404)
+    if policy_version is not None and policy_version != event[2]:
+        raise CheckinError(STALE_POLICY_DETAIL, 403)
+
+    attendee_id = find_attendee_id(email)
+    if attendee_id is None:
+        if not full_name:
+            raise CheckinError('Please provide your details first', 404, action='register')
+        attendee_id = register_attendee(email, full_name, student_id, user)
+    else:
+        attendance_id = (Attendance.objects.filter(event_id=event_id, attendee_id=attendee_id, present=True)
+                         .values_list('id', flat=True).first())
+        if attendance_id is not None:
+            return {'id': attendance_id, 'event': event_id, 'attendee': attendee_id, 'present': True}
+
+    capacity, present_count, _ = event
+    if 0 < capacity <= present_count:
+        raise CheckinError(f'Event is full! Maximum capacity: {capacity}', 400)
+    key = append_scan(event_id, normalize_email(email), attendee_id, token)
+    return {'id': None, 'event': event_id, 'attendee': attendee_id, 'present': False,
+            'status': 'pending', 'receipt': key}
+
+
+def flush_journal(limit):
+    """
+    Apply up to ``limit`` unflushed journal scans with check_in_batch and
+    advance the checkpoint. Returns (results, number of torn lines skipped).
+    Only the holder of checkin_journal.writer_lock() may call this.
+    """
+    from .checkin_journal import mark_flushed, unflushed_entries
+
+    entries = unflushed_entries(limit)
+    if not entries:
+        return [], 0
+    scans = [entry for _, _, entry in entries if isinstance(entry, dict)]
+    results = check_in_batch(scans, journaled=True) if scans else []
+    # check_in_batch keeps no receipt for rejected scans; journal keys are never
+    # reused, so record them too for checkin/status/
+    CheckinReceipt.objects.bulk_create([
+        CheckinReceipt(key=scan['idempotency_key'], status=result['status'])
+        for scan, result in zip(scans, results)
+        if result['status'] in ('invalid', 'invalid_token') and scan.get('idempotency_key')
+    ], ignore_conflicts=True)
+    mark_flushed(entries)
+    return results, len(entries) - len(scans)
+
+
+def check_in_status(receipt=None, event_id=None, email=None):
+    """
+    State of a scan by journal ``receipt`` key, or of an attendee at an
+    event, including scans still waiting in the write-behind journal.
+    Returns a dict with ``status`` and ``pending``, or None if unknown.
+
+    The journal is read before the database: a scan flushed in between is
+    then found in the database, never missed by both.
+    """
+    from .checkin_journal import pending_scan, write_behind_enabled
+
+    if receipt is not None:
+        pending = pending_scan(key=receipt) if write_behind_enabled() else None
+        row = CheckinReceipt.objects.filter(key=receipt).values_list('status', 'attendance_id').first()
+        if row is not None:
+            return {'status': row[0], 'attendance': row[1], 'pending': False}
+        if pending is not None:
+            return {'status': 'pending', 'event': pending['event_id'], 'attendee': pending.get('attendee'),
+                    'attendance': None, 'pending': True}
+        return None
+
+    email = normalize_email(email)
+    pending = pending_scan(event_id=event_id, email=email) if write_behind_enabled() else None
+    attendance = (Attendance.objects.filter(event_id=event_id, attendee__email=email)
+                  .values('id', 'attendee_id', 'present', 'time_out').first())
+    if attendance is not None and (attendance['present'] or pending is None):
+        return {'status': 'present' if attendance['present'] else 'absent', 'event': event_id,
+                'attendee': attendance['attendee_id'], 'attendance': attendance['id'],
+                'present': attendance['present'], 'time_out': attendance['time_out'], 'pending': False}
+    if pending is not None:
+        return {'status': 'pending', 'event': event_id, 'attendee': pending.get('attendee'),
+                'attendance': attendance['id'] if attendance else None, 'present': False,
+                'time_out': None, 'pending': True, 'receipt': pending['idempotency_key']}
+    return None
+
+
+def encode_sync_cursor(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_sync_cursor(cursor):
+    """Datetime for a cursor from encode_sync_cursor(); raises ValueError if malformed."""
+    from datetime import datetime, timezone as dt_timezone
+
+    return datetime.fromtimestamp(int(cursor) / 1_000_000, tz=dt_timezone.utc)
+
+
+ROSTER_FIELDS = ['attendee', 'email', 'student_id', 'present', 'time_out']
+
+
+def require_roster_resync(event_ids):
+    """
+    Make offline scanners of these events download the whole roster again.
+
+    For changes a delta can't carry: deleted attendances, and attendances
+    moved to another attendee when duplicates are merged.
+    """
+    Event.objects.filter(id__in=event_ids).update(roster_reset_at=timezone.now())
+
+
+def event_roster(event_id, since=None):
+    """
+    An event's roster for offline scanners, as compact rows in ROSTER_FIELDS order.
+
+    With ``since`` only attendances changed at or after that moment are
+    returned, unless the roster was reset (see require_roster_resync) since
+    then. The new cursor is taken SYNC_CURSOR_OVERLAP seconds before the
+    query, so a change committed late by a slow transaction is sent again
+    rather than missed; rows are full state, so applying one twice is
+    harmless. Returns (rows, cursor, full), where ``full`` means the rows
+    replace the scanner's roster instead of updating it.
+    """
+    from datetime import timedelta
+
+    cursor = encode_sync_cursor(timezone.now() - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP))
+    full = since is None
+    if not full:
+        reset_at = Event.objects.filter(id=event_id).values_list('roster_reset_at', flat=True).first()
+        full = reset_at is not None and reset_at >= since
+    attendances = Attendance.objects.filter(event_id=event_id)
+    if not full:
+        attendances = attendances.filter(updated_at__gte=since)
+    rows = [
+        [attendee_id, email, student_id, present, time_out.isoformat() if time_out else None]
+        for attendee_id, email, student_id, present, time_out in attendances.order_by('id').values_list(
+            'attendee_id', 'attendee__email', 'attendee__student_id', 'present', 'time_out')
+    ]
+    return rows, cursor, full
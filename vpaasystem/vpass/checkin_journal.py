@@ -0,0 +1,338 @@
+"""
+Write-behind journal for QR check-ins (CHECKIN_WRITE_BEHIND).
+
+On SQLite every check-in of a doors-open burst waits for the one database
+write lock. In write-behind mode checkin/ validates a scan, appends it to
+a local append-only journal and answers as soon as the line is on disk;
+``python manage.py run_checkin_writer``, the only process writing the
+journal to the database, applies the scans in batches through
+check_in_batch and only then advances its checkpoint.
+
+Every line carries an idempotency key, so scans replayed from the
+checkpoint after a crash are not applied twice (see CheckinReceipt).
+Scans go to one segment file per CHECKIN_JOURNAL_SEGMENT_SECONDS; the
+writer deletes a segment once it is flushed and no longer appended to.
+A closed segment whose last line was torn by a crash has that line moved
+to a ``.torn`` file next to it, so the segment can still be retired.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+SEGMENT_PREFIX = 'checkins-'
+SEGMENT_SUFFIX = '.jsonl'
+CHECKPOINT = 'checkpoint.json'
+# A flushed segment is only deleted once it has not been written to for this many seconds
+SEGMENT_GRACE = 10
+
+TORN_SUFFIX = '.torn'
+
+# Last segment this process checked for a torn tail (see append_scan)
+_checked_segment = None
+
+logger = logging.getLogger(__name__)
+
+
+class JournalLocked(Exception):
+    """Another process is already flushing the journal."""
+
+
+def write_behind_enabled():
+    return settings.CHECKIN_WRITE_BEHIND
+
+
+def journal_dir():
+    path = Path(settings.CHECKIN_JOURNAL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _segment_name(moment):
+    return f'{SEGMENT_PREFIX}{int(moment // settings.CHECKIN_JOURNAL_SEGMENT_SECONDS):012d}{SEGMENT_SUFFIX}'
+
+
+def _segments(directory):
+    return sorted(path.name for path in directory.glob(f'{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}'))
+
+
+def _fsync_directory(directory):
+    # Makes a newly created file's directory entry durable (not possible on Windows)
+    if os.name == 'posix':
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def append_scan(event_id, email, attendee_id, token=None):
+    """
+    Journal a validated scan and return its receipt key. The scan is on
+    disk when this returns (unless CHECKIN_JOURNAL_FSYNC is off).
+    """
+    now = time.time()
+    key = f'journal-{uuid.uuid4().hex}'
+    entry = {
+        'idempotency_key': key,
+        'event_id': event_id,
+        'email': email,
+        'attendee': attendee_id,
+        'scanned_at': datetime.fromtimestamp(now, dt_timezone.utc).isoformat(),
+    }
+    if token:
+        entry['token'] = token
+    line = (json.dumps(entry, separators=(',', ':')) + '\n').encode()
+
+    global _checked_segment
+    directory = journal_dir()
+    name = _segment_name(now)
+    flags = os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+    fd = os.open(directory / name, flags, 0o644)
+    try:
+        size = os.fstat(fd).st_size
+        created = size == 0
+        if name != _checked_segment:
+            # A crash can leave a torn last line; ending it keeps this scan off it.
+            # Prefixed to the same write, so at worst a concurrent check adds a blank line
+            if size:
+                os.lseek(fd, size - 1, os.SEEK_SET)
+                if os.read(fd, 1) != b'\n':
+                    line = b'\n' + line
+            _checked_segment = name
+        # One write per line, so lines from concurrent processes never interleave
+        os.write(fd, line)
+        if settings.CHECKIN_JOURNAL_FSYNC:
+            os.fsync(fd)
+            if created:
+                _fsync_directory(directory)
+    finally:
+        os.close(fd)
+    return key
+
+
+def _read_checkpoint(directory):
+    try:
+        with open(directory / CHECKPOINT) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_checkpoint(directory, offsets):
+    temporary = directory / f'{CHECKPOINT}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(offsets, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, directory / CHECKPOINT)
+    _fsync_directory(directory)
+
+
+def _read_entries(path, start):
+    """
+    Complete lines of a segment after offset ``start``, as a list of
+    (offset after the line, entry). A line torn by a crash comes back
+    with entry None; blank lines are skipped.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    entries = []
+    position = start
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b'\n'):
+            break
+        position += len(line)
+        if line == b'\n':
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = None
+        entries.append((position, entry))
+    return entries
+
+
+def unflushed_entries(limit=None):
+    """
+    Journal lines after the checkpoint, oldest segment first, as a list of
+    (segment, offset after the line, entry). Only complete lines are read;
+    one still being written is picked up next time. A line torn by a crash
+    comes back with entry None; blank lines are skipped.
+    """
+    directory = journal_dir()
+    offsets = _read_checkpoint(directory)
+    entries = []
+    for name in _segments(directory):
+        for position, entry in _read_entries(directory / name, offsets.get(name, 0)):
+            entries.append((name, position, entry))
+            if limit and len(entries) >= limit:
+                return entries
+    return entries
+
+
+class _PendingIndex:
+    """
+    This process's index of unflushed scans, by receipt key and by (event,
+    email), for checkin/status/ polls. A refresh only reads the lines
+    appended since the last one and drops what the checkpoint has passed,
+    so a poll costs the new scans instead of a read of the whole journal.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.directory = None
+        self.reset()
+
+    def reset(self):
+        self.read_to = {}
+        self.checkpoint = {}
+        self.by_key = {}
+        self.by_scan = {}
+
+    def refresh(self):
+        directory = journal_dir()
+        if directory != self.directory:
+            self.directory = directory
+            self.reset()
+        offsets = _read_checkpoint(directory)
+        read_to = {}
+        for name in _segments(directory):
+            start = max(self.read_to.get(name, 0), offsets.get(name, 0))
+            entries = _read_entries(directory / name, start)
+            for position, entry in entries:
+                if isinstance(entry, dict) and entry.get('idempotency_key') is not None:
+                    self.add(name, position, entry)
+            read_to[name] = entries[-1][0] if entries else start
+
+        if offsets != self.checkpoint or read_to.keys() != self.read_to.keys():
+            for key, (name, position, entry) in list(self.by_key.items()):
+                # Flushed: the checkpoint passed it, or its segment was retired
+                if name not in read_to or position <= offsets.get(name, 0):
+                    self.remove(key, entry)
+            self.checkpoint = offsets
+        self.read_to = read_to
+
+    def add(self, name, position, entry):
+        key = entry['idempotency_key']
+        self.by_key[key] = (name, position, entry)
+        self.by_scan.setdefault((entry.get('event_id'), entry.get('email')), []).append(key)
+
+    def remove(self, key, entry):
+        del self.by_key[key]
+        scan = (entry.get('event_id'), entry.get('email'))
+        keys = self.by_scan[scan]
+        keys.remove(key)
+        if not keys:
+            del self.by_scan[scan]
+
+
+_pending = _PendingIndex()
+
+
+def pending_scan(key=None, event_id=None, email=None):
+    """An unflushed scan with this receipt key, or for this event and normalized email; else None."""
+    with _pending.lock:
+        _pending.refresh()
+        if key is not None:
+            found = _pending.by_key.get(key)
+        else:
+            keys = _pending.by_scan.get((event_id, email))
+            found = _pending.by_key[keys[0]] if keys else None
+    return found[2] if found else None
+
+
+def quarantine_torn_segments():
+    """
+    Move the torn last line of closed segments to a ``.torn`` file.
+
+    A crash mid-append can leave a segment ending without a newline. The
+    next append to that segment ends the line (see append_scan), but once
+    the segment is closed none comes, the checkpoint never reaches its end
+    and it is never retired. Called by the writer when it opens the
+    journal and whenever it is idle. Returns the segment names fixed.
+    """
+    directory = journal_dir()
+    current = _segment_name(time.time())
+    fixed = []
+    for name in _segments(directory):
+        path = directory / name
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if name == current or not stat.st_size or stat.st_mtime >= time.time() - SEGMENT_GRACE:
+            continue
+        with open(path, 'r+b') as f:
+            data = f.read()
+            if data.endswith(b'\n'):
+                continue
+            end = data.rfind(b'\n') + 1
+            with open(directory / f'{name}{TORN_SUFFIX}', 'ab') as quarantine:
+                quarantine.write(data[end:] + b'\n')
+                quarantine.flush()
+                os.fsync(quarantine.fileno())
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+        logger.warning('Moved a torn line (%d bytes) from closed journal segment %s to %s%s',
+                       len(data) - end, name, name, TORN_SUFFIX)
+        fixed.append(name)
+    return fixed
+
+
+def mark_flushed(entries):
+    """Advance the checkpoint past ``entries`` and delete segments that are done."""
+    directory = journal_dir()
+    offsets = _read_checkpoint(directory)
+    for name, position, _ in entries:
+        offsets[name] = max(position, offsets.get(name, 0))
+
+    current = _segment_name(time.time())
+    retired = []
+    for name in _segments(directory):
+        try:
+            stat = os.stat(directory / name)
+        except FileNotFoundError:
+            continue
+        if (name != current and offsets.get(name, 0) >= stat.st_size
+                and stat.st_mtime < time.time() - SEGMENT_GRACE):
+            retired.append(name)
+    for name in retired:
+        offsets.pop(name, None)
+    # Forget a segment before deleting it: a crash in between replays it instead of skipping lines
+    _write_checkpoint(directory, offsets)
+    for name in retired:
+        (directory / name).unlink(missing_ok=True)
+
+
+@contextmanager
+def writer_lock():
+    """Held by the one process flushing the journal; raises JournalLocked if another holds it."""
+    with open(journal_dir() / 'writer.lock', 'a+b') as f:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise JournalLocked()
+        yield
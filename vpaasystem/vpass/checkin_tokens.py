@@ -0,0 +1,175 @@
+"""
+Signed check-in tokens carried in event QR codes.
+
+A token is ``{event_id}.{not_before}.{not_after}.{policy_version}.{signature}``
+with the times as base-36 Unix timestamps and the signature a truncated
+HMAC-SHA256 of the rest. Verifying one is pure CPU work, so forged, expired
+and wrong-event scans are rejected before the database is touched.
+
+The check-in page exchanges the short-lived token it was opened with for a
+nonce, ``n.{event_id}.{not_after}.{policy_version}.{nonce_id}.{signature}``,
+valid for CHECKIN_NONCE_TTL seconds and good for one check-in, so filling
+in the form can take longer than a rotation.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+from base64 import urlsafe_b64encode
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+
+CheckinToken = namedtuple('CheckinToken', 'event_id not_before not_after policy_version')
+CheckinNonce = namedtuple('CheckinNonce', 'event_id not_after policy_version nonce_id')
+
+
+class InvalidCheckinToken(ValueError):
+    """Raised by verify_token(); ``reason`` is a short machine-readable code."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+@lru_cache(maxsize=None)
+def _signing_key(secret):
+    # Derived rather than the raw SECRET_KEY, so a leaked token key can't sign anything else
+    return hashlib.sha256(b'vpass.checkin-token:' + secret.encode()).digest()
+
+
+def _key():
+    return _signing_key(getattr(settings, 'QR_TOKEN_SECRET', '') or settings.SECRET_KEY)
+
+
+def _signature(message):
+    digest = hmac.new(_key(), message.encode(), hashlib.sha256).digest()
+    return urlsafe_b64encode(digest[:16]).rstrip(b'=').decode()
+
+
+def _base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    encoded = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if not number:
+            return encoded
+
+
+def make_token(event_id, not_before, not_after, policy_version):
+    message = f'{event_id}.{_base36(int(not_before))}.{_base36(int(not_after))}.{policy_version}'
+    return f'{message}.{_signature(message)}'
+
+
+def rotating_token(event, now=None):
+    """
+    Token for the QR code shown live at the venue.
+
+    It changes every QR_TOKEN_ROTATION seconds and stays valid for
+    QR_TOKEN_GRACE_WINDOWS more windows, so a screenshot stops working
+    shortly after the projected code moves on.
+    """
+    rotation = settings.QR_TOKEN_ROTATION
+    if not rotation:
+        return event_token(event)
+    now = int(time.time() if now is None else now)
+    window_start = now - now % rotation
+    not_after = window_start + rotation * (1 + settings.QR_TOKEN_GRACE_WINDOWS)
+    return make_token(event.id, window_start, not_after, event.capacity_policy_version)
+
+
+def rotation_expires_in(now=None):
+    """Seconds until the current rotating token is replaced (for Cache-Control)."""
+    rotation = settings.QR_TOKEN_ROTATION
+    if not rotation:
+        return None
+    now = int(time.time() if now is None else now)
+    return rotation - now % rotation
+
+
+def event_token(event):
+    """Token for printed or downloaded QR codes: valid around the event's own start and end."""
+    margin = settings.QR_STATIC_TOKEN_MARGIN
+    return make_token(
+        event.id,
+        event.start.timestamp() - margin,
+        event.end.timestamp() + margin,
+        event.capacity_policy_version,
+    )
+
+
+def verify_token(token, event_id=None, now=None):
+    """
+    Check a token's signature, validity window and (optionally) event.
+
+    Returns a CheckinToken or raises InvalidCheckinToken with reason
+    'malformed', 'bad_signature', 'wrong_event', 'not_yet_valid' or
+    'expired'. No database access: the policy version is compared with
+    Event.capacity_policy_version when the check-in takes a seat (see
+    vpass.checkin.reserve_seat).
+    """
+    if not isinstance(token, str) or len(token) > 128:
+        raise InvalidCheckinToken('malformed')
+    message, _, signature = token.rpartition('.')
+    parts = message.split('.')
+    if len(parts) != 4:
+        raise InvalidCheckinToken('malformed')
+    try:
+        token_event = int(parts[0])
+        not_before = int(parts[1], 36)
+        not_after = int(parts[2], 36)
+        policy_version = int(parts[3])
+    except ValueError:
+        raise InvalidCheckinToken('malformed')
+
+    if not hmac.compare_digest(signature, _signature(message)):
+        raise InvalidCheckinToken('bad_signature')
+    if event_id is not None and str(token_event) != str(event_id):
+        raise InvalidCheckinToken('wrong_event')
+    now = time.time() if now is None else now
+    if now < not_before:
+        raise InvalidCheckinToken('not_yet_valid')
+    if now >= not_after:
+        raise InvalidCheckinToken('expired')
+    return CheckinToken(token_event, not_before, not_after, policy_version)
+
+
+def issue_nonce(token, now=None):
+    """Exchange a verified CheckinToken for a check-in nonce valid for CHECKIN_NONCE_TTL seconds."""
+    now = int(time.time() if now is None else now)
+    not_after = now + settings.CHECKIN_NONCE_TTL
+    message = f'n.{token.event_id}.{_base36(not_after)}.{token.policy_version}.{secrets.token_hex(8)}'
+    return f'{message}.{_signature(message)}'
+
+
+def verify_nonce(nonce, event_id=None, now=None):
+    """
+    Check a nonce from issue_nonce() like verify_token() checks a token.
+
+    Returns a CheckinNonce or raises InvalidCheckinToken. Whether it was
+    already used is up to the caller (see vpass.checkin.consuming_nonce).
+    """
+    if not isinstance(nonce, str) or len(nonce) > 128:
+        raise InvalidCheckinToken('malformed')
+    message, _, signature = nonce.rpartition('.')
+    parts = message.split('.')
+    if len(parts) != 5 or parts[0] != 'n':
+        raise InvalidCheckinToken('malformed')
+    try:
+        nonce_event = int(parts[1])
+        not_after = int(parts[2], 36)
+        policy_version = int(parts[3])
+    except ValueError:
+        raise InvalidCheckinToken('malformed')
+
+    if not hmac.compare_digest(signature, _signature(message)):
+        raise InvalidCheckinToken('bad_signature')
+    if event_id is not None and str(nonce_event) != str(event_id):
+        raise InvalidCheckinToken('wrong_event')
+    now = time.time() if now is None else now
+    if now >= not_after:
+        raise InvalidCheckinToken('expired')
+    return CheckinNonce(nonce_event, not_after, policy_version, parts[4])
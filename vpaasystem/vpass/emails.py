@@ -0,0 +1,155 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def build_certificate_email(attendance):
+    """Return an unsaved OutboundEmail delivering an attendance's certificate."""
+    return OutboundEmail(
+        kind='CERTIFICATE',
+        attendance=attendance,
+        to_email=attendance.attendee.email,
+        subject=f'Certificate for {attendance.event.title}',
+        body=f'Dear {attendance.attendee.full_name},\n\nCongratulations! Your certificate for {attendance.event.title} is attached.\n\nBest regards,\nHCDC Event System',
+    )
+
+
+def queue_certificate_email(attendance):
+    """Put an attendance's certificate email in the outbox and return the row."""
+    email = build_certificate_email(attendance)
+    email.save()
+    return email
+
+
+def queue_verification_email(user, verification_link):
+    """Put an account verification email in the outbox and return the row."""
+    return OutboundEmail.objects.create(
+        kind='VERIFICATION',
+        to_email=user.email,
+        subject='Verify Your Email - HCDC Event System',
+        body=f'Click this link to verify your email: {verification_link}',
+    )
+
+
+def to_message(outbound, connection=None):
+    """Build the EmailMessage for an outbound row, reading any certificate attachment from storage."""
+    message = EmailMessage(
+        subject=outbound.subject,
+        body=outbound.body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[outbound.to_email],
+        connection=connection,
+    )
+    if outbound.kind == 'CERTIFICATE':
+        certificate = outbound.attendance.certificate
+        if not certificate:
+            raise FileNotFoundError('Certificate not generated yet')
+        with certificate.storage.open(certificate.name, 'rb') as f:
+            message.attach('certificate.pdf', f.read(), 'application/pdf')
+    return message
+
+
+def retry_delay(attempts):
+    """Exponential backoff: EMAIL_RETRY_BACKOFF seconds, doubled per failed attempt, capped at six hours."""
+    base = getattr(settings, 'EMAIL_RETRY_BACKOFF', 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), 6 * 60 * 60))
+
+
+def claim_emails(limit, queryset=None):
+    """
+    Mark up to ``limit`` outbox rows as sending and return them.
+
+    Defaults to pending rows whose next attempt is due. All candidates are
+    claimed with one conditional UPDATE stamped with the claim time, so
+    several senders polling the outbox never send a row twice.
+    """
+    now = timezone.now()
+    if queryset is None:
+        queryset = OutboundEmail.objects.filter(status='PENDING', next_attempt_at__lte=now)
+    candidates = list(queryset.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit])
+    if not candidates:
+        return []
+    OutboundEmail.objects.filter(id__in=candidates, status='PENDING').update(status='SENDING', locked_at=now)
+    return list(OutboundEmail.objects
+                .filter(id__in=candidates, status='SENDING', locked_at=now)
+                .select_related('attendance__attendee', 'attendance__event')
+                .order_by('id'))
+
+
+def requeue_stale_emails(older_than):
+    """Return rows left sending by a killed worker to the outbox."""
+    cutoff = timezone.now() - older_than
+    return OutboundEmail.objects.filter(status='SENDING', locked_at__lt=cutoff).update(
+        status='PENDING',
+        locked_at=None,
+    )
+
+
+def deliver(emails, rate=None, connection=None):
+    """
+    Send outbound emails over one connection and record each one's status.
+
+    ``connection`` is left open for the caller to reuse and close; without
+    one a connection is opened and closed for this batch. ``rate`` caps messages per second (default: settings.EMAIL_SEND_RATE,
+    0 for no limit). A failed message goes back to PENDING with a backoff
+    delay, or to FAILED after EMAIL_MAX_ATTEMPTS; the next message
+    reconnects and the batch carries on. Statuses are saved in one bulk
+    update at the end. Returns (sent, failed).
+    """
+    emails = list(emails)
+    if rate is None:
+        rate = getattr(settings, 'EMAIL_SEND_RATE', 0)
+    interval = 1.0 / rate if rate else 0
+    max_attempts = getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5)
+
+    own_connection = connection is None
+    if own_connection:
+        connection = get_connection(fail_silently=False)
+    sent = 0
+    failed = 0
+    next_send = time.monotonic()
+    try:
+        for outbound in emails:
+            if interval:
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send = max(next_send, time.monotonic()) + interval
+
+            outbound.attempts += 1
+            outbound.locked_at = None
+            try:
+                # No-op while the connection is up; reconnects after a failure
+                connection.open()
+                connection.send_messages([to_message(outbound, connection)])
+            except Exception as e:
+                outbound.last_error = str(e)
+                if outbound.attempts >= max_attempts:
+                    outbound.status = 'FAILED'
+                else:
+                    outbound.status = 'PENDING'
+                    outbound.next_attempt_at = timezone.now() + retry_delay(outbound.attempts)
+                failed += 1
+                # The server may have dropped us; the next message starts on a fresh connection
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            else:
+                outbound.status = 'SENT'
+                outbound.last_error = ''
+                outbound.sent_at = timezone.now()
+                sent += 1
+    finally:
+        if own_connection:
+            connection.close()
+        OutboundEmail.objects.bulk_update(
+            [outbound for outbound in emails if outbound.pk],
+            ['status', 'attempts', 'last_error', 'next_attempt_at', 'locked_at', 'sent_at'],
+        )
+    return sent, failed
@@ -0,0 +1,104 @@
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reportlab import rl_config
+
+from vpass.certificates import (
+    compile_base_layer, compile_png_base_layer, load_pil_font,
+    render_certificate_pdf, render_certificate_png, render_certificate_pngs, render_certificates_pdf,
+)
+from vpass.models import Event, Attendee, Attendance
+
+
+class Command(BaseCommand):
+    help = 'Measure certificate rendering throughput: full render, cached base layer, merged print PDF and PNG'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500,
+                            help='Number of certificates to render per mode')
+        parser.add_argument('--png-count', type=int, default=50,
+                            help='Number of PNG certificates to render per mode (0 to skip)')
+
+    def handle(self, *args, **options):
+        count = max(1, options['count'])
+
+        # Unsaved objects: the benchmark never touches the database or storage
+        event = Event(
+            id=1,
+            title='Graduation Week Leadership Seminar',
+            start=timezone.now(),
+            end=timezone.now() + timedelta(hours=2),
+        )
+        attendances = [
+            Attendance(
+                id=i,
+                event=event,
+                attendee=Attendee(id=i, full_name=f'Student Number {i}', email=f'student{i}@hcdc.edu.ph'),
+                present=True,
+            )
+            for i in range(1, count + 1)
+        ]
+
+        compile_base_layer.cache_clear()
+        results = []
+        # "Before" is the original renderer: full redraw with ASCII85-wrapped streams
+        for label, use_base_layer, use_a85 in (
+            ('Full render (before)', False, 1),
+            ('Cached base layer (after)', True, 0),
+        ):
+            rl_config.useA85 = use_a85
+            total_bytes = 0
+            started = time.perf_counter()
+            for attendance in attendances:
+                total_bytes += len(render_certificate_pdf(attendance, use_base_layer=use_base_layer))
+            elapsed = time.perf_counter() - started
+            results.append((label, count / elapsed, total_bytes / count))
+        rl_config.useA85 = 0
+
+        output = BytesIO()
+        started = time.perf_counter()
+        render_certificates_pdf(attendances, output)
+        elapsed = time.perf_counter() - started
+        results.append(('Merged print PDF', count / elapsed, len(output.getvalue()) / count))
+
+        self.stdout.write(f'Rendered {count} certificates per mode\n')
+        for label, rate, avg_size in results:
+            self.stdout.write(f'{label:<28} {rate:8.1f} certificates/s  {avg_size:8.0f} bytes/certificate')
+
+        speedup = results[1][1] / results[0][1]
+        saving = 100 * (1 - results[1][2] / results[0][2])
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {speedup:.1f}x faster, {saving:.0f}% smaller per certificate'))
+
+        speedup = results[2][1] / results[0][1]
+        saving = 100 * (1 - results[2][2] / results[0][2])
+        self.stdout.write(self.style.SUCCESS(f'✓ Merged PDF: {speedup:.1f}x faster, {saving:.0f}% smaller than separate files'))
+
+        png_count = min(options['png_count'], count)
+        if png_count > 0:
+            self.benchmark_png(attendances[:png_count])
+
+    def benchmark_png(self, attendances):
+        count = len(attendances)
+
+        # "Before" loads every font and draws the whole page on each call
+        started = time.perf_counter()
+        for attendance in attendances:
+            load_pil_font.cache_clear()
+            compile_png_base_layer.cache_clear()
+            render_certificate_png(attendance)
+        uncached = count / (time.perf_counter() - started)
+
+        load_pil_font.cache_clear()
+        compile_png_base_layer.cache_clear()
+        started = time.perf_counter()
+        for _ in render_certificate_pngs(attendances):
+            pass
+        cached = count / (time.perf_counter() - started)
+
+        self.stdout.write(f'\nRendered {count} PNG certificates per mode\n')
+        self.stdout.write(f'{"PNG, per-call resources":<28} {uncached:8.1f} certificates/s')
+        self.stdout.write(f'{"PNG, cached resources":<28} {cached:8.1f} certificates/s')
+        self.stdout.write(self.style.SUCCESS(f'\n✓ PNG: {cached / uncached:.1f}x faster'))
@@ -0,0 +1,105 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from vpass.checkin_tokens import rotating_token
+from vpass.models import Event, Attendee
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Measure QR check-in latency through the full request stack (middleware, DRF, database). '
+            'Creates a temporary event and attendees in the configured database and deletes them afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attendees', type=int, default=500,
+                            help='Attendees scanned per pass (each is scanned twice: check-in, then re-scan)')
+        parser.add_argument('--target-ms', type=float, default=20.0,
+                            help='p99 latency target in milliseconds')
+        parser.add_argument('--capacity', type=int, default=0,
+                            help='max_capacity of the benchmark event (0 for unlimited)')
+        parser.add_argument('--compare', action='store_true',
+                            help='Also time the legacy attendances/time_in endpoint with the same scans')
+
+    def handle(self, *args, **options):
+        count = max(1, options['attendees'])
+        now = timezone.now()
+        events = []
+        attendees = Attendee.objects.bulk_create([
+            Attendee(full_name=f'Benchmark Attendee {i}', email=f'checkin-bench-{i}@example.invalid')
+            for i in range(count)
+        ], batch_size=500)
+        client = Client(HTTP_HOST='localhost')
+
+        def make_event():
+            event = Event.objects.create(
+                title='Check-in benchmark',
+                start=now - timedelta(hours=1),
+                end=now + timedelta(hours=1),
+                max_capacity=options['capacity'],
+            )
+            events.append(event)
+            return event
+
+        def run(label, path, body):
+            event = make_event()
+            token = rotating_token(event)
+            # Count the statements of one first-time scan (the request-started
+            # signal clears connection.queries, so count at the cursor instead)
+            queries = []
+            def count_query(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+            with connection.execute_wrapper(count_query):
+                client.post(path, body(event, token, attendees[0]), content_type='application/json')
+            samples = []
+            errors = 0
+            started = time.perf_counter()
+            for _ in range(2):
+                for attendee in attendees:
+                    payload = body(event, token, attendee)
+                    t0 = time.perf_counter()
+                    response = client.post(path, payload, content_type='application/json')
+                    samples.append((time.perf_counter() - t0) * 1000)
+                    if response.status_code >= 400:
+                        errors += 1
+            elapsed = time.perf_counter() - started
+            p99 = percentile(samples, 99)
+            self.stdout.write(
+                f'{label:<22} {len(samples) / elapsed:8.0f} scans/s  '
+                f'p50 {percentile(samples, 50):6.2f} ms  p95 {percentile(samples, 95):6.2f} ms  '
+                f'p99 {p99:6.2f} ms  max {max(samples):7.2f} ms  '
+                f'{len(queries)} queries/scan  {errors} errors'
+            )
+            return p99, errors
+
+        try:
+            self.stdout.write(f'Scanning {count} attendees twice per endpoint\n')
+            p99, errors = run('checkin/', '/api/checkin/', lambda event, token, attendee: {
+                'event_id': event.id, 'email': attendee.email, 'token': token,
+            })
+            if options['compare']:
+                run('attendances/time_in/', '/api/attendances/time_in/', lambda event, token, attendee: {
+                    'event_id': event.id, 'token': token,
+                    'attendee': {'email': attendee.email, 'full_name': attendee.full_name},
+                })
+        finally:
+            Event.objects.filter(id__in=[event.id for event in events]).delete()
+            Attendee.objects.filter(id__in=[attendee.id for attendee in attendees]).delete()
+
+        self.stdout.write('\n' + '='*50)
+        if errors:
+            self.stdout.write(self.style.ERROR(f'\n✗ {errors} scans failed'))
+        elif p99 < options['target_ms']:
+            self.stdout.write(self.style.SUCCESS(f'\n✓ p99 {p99:.2f} ms is under the {options["target_ms"]:g} ms target'))
+        else:
+            self.stdout.write(self.style.ERROR(f'\n✗ p99 {p99:.2f} ms exceeds the {options["target_ms"]:g} ms target'))
@@ -0,0 +1,137 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.utils import ConnectionHandler
+
+from vpaasystem.databases import sqlite_database
+from vpass.management.commands.benchmark_checkin import percentile
+
+
+class Command(BaseCommand):
+    help = ('Compare SQLite read/write concurrency with Django\'s default connection settings and with the '
+            'production profile (vpaasystem/databases.py), on scratch database files. Each simulated request '
+            'goes through Django\'s connection handling, including the end-of-request close.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16,
+                            help='Concurrent request threads')
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='Seconds to run each profile')
+        parser.add_argument('--write-ratio', type=float, default=0.3,
+                            help='Share of requests that write (a check-in)')
+        parser.add_argument('--rows', type=int, default=20000,
+                            help='Attendance rows in the scratch database')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='benchmark-sqlite-')
+        try:
+            path = os.path.join(directory, 'default.sqlite3')
+            default = self.run('default', {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}, options)
+            path = os.path.join(directory, 'production.sqlite3')
+            production = self.run('production', sqlite_database(path), options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write('\n' + '='*50)
+        speedup = production['requests'] / max(default['requests'], 1)
+        self.stdout.write(f'\nProduction profile: {speedup:.2f}x the requests of the default settings')
+        if production['errors']:
+            self.stdout.write(self.style.ERROR(f'✗ Production profile errors: {production["errors"]}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ No "database is locked" errors with the production profile'))
+        self.stdout.write(f'\nTotal processed: {default["requests"] + production["requests"]}\n')
+
+    def setup(self, connection, rows):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE event (id INTEGER PRIMARY KEY, present_count INTEGER NOT NULL)')
+            cursor.execute('CREATE TABLE attendance (id INTEGER PRIMARY KEY, event_id INTEGER NOT NULL, '
+                           'attendee_id INTEGER NOT NULL, present BOOL NOT NULL, UNIQUE (event_id, attendee_id))')
+            cursor.executemany('INSERT INTO event (id, present_count) VALUES (%s, 0)', [(i,) for i in range(1, 11)])
+            cursor.executemany('INSERT INTO attendance (event_id, attendee_id, present) VALUES (%s, %s, 0)',
+                               [(i % 10 + 1, i) for i in range(rows)])
+
+    def run(self, label, settings_dict, options):
+        # A temporary alias, with Django's defaults filled in, so transaction.atomic() can use it
+        alias = f'benchmark_{label}'
+        connections.settings[alias] = ConnectionHandler({DEFAULT_DB_ALIAS: settings_dict}).settings[DEFAULT_DB_ALIAS]
+        rows = max(10, options['rows'])
+        self.setup(connections[alias], rows)
+        connections[alias].close()
+
+        lock = threading.Lock()
+        stats = {'read': [], 'write': [], 'errors': 0}
+        next_attendee = iter(range(rows, 10 ** 9))
+        deadline = time.perf_counter() + options['duration']
+
+        def read(connection, rng):
+            event_id = rng.randint(1, 10)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT present_count FROM event WHERE id = %s', [event_id])
+                cursor.fetchone()
+                cursor.execute('SELECT id, attendee_id, present FROM attendance WHERE event_id = %s LIMIT 50', [event_id])
+                cursor.fetchall()
+
+        def write(connection, rng):
+            event_id = rng.randint(1, 10)
+            with lock:
+                attendee_id = next(next_attendee)
+            # A check-in: take a seat and insert the attendance together
+            with transaction.atomic(using=alias), connection.cursor() as cursor:
+                cursor.execute('UPDATE event SET present_count = present_count + 1 WHERE id = %s', [event_id])
+                cursor.execute('INSERT INTO attendance (event_id, attendee_id, present) VALUES (%s, %s, 1)',
+                               [event_id, attendee_id])
+
+        def worker(seed):
+            rng = random.Random(seed)
+            samples = {'read': [], 'write': []}
+            errors = 0
+            while time.perf_counter() < deadline:
+                kind = 'write' if rng.random() < options['write_ratio'] else 'read'
+                connection = connections[alias]
+                started = time.perf_counter()
+                try:
+                    (write if kind == 'write' else read)(connection, rng)
+                except OperationalError:
+                    errors += 1
+                else:
+                    samples[kind].append((time.perf_counter() - started) * 1000)
+                # What the request_finished signal does after every request
+                connection.close_if_unusable_or_obsolete()
+            connections[alias].close()
+            with lock:
+                stats['read'] += samples['read']
+                stats['write'] += samples['write']
+                stats['errors'] += errors
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(max(1, options['threads']))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with connections[alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+        self.stdout.write(f'{label} (journal_mode={journal_mode}, CONN_MAX_AGE={settings_dict.get("CONN_MAX_AGE", 0)})')
+        for kind in ('read', 'write'):
+            samples = stats[kind]
+            if samples:
+                self.stdout.write(
+                    f'  {kind:<6} {len(samples) / elapsed:8.0f} req/s  p50 {percentile(samples, 50):7.2f} ms  '
+                    f'p95 {percentile(samples, 95):7.2f} ms  p99 {percentile(samples, 99):7.2f} ms'
+                )
+        line = f'  "database is locked" errors: {stats["errors"]}'
+        self.stdout.write(self.style.ERROR(line) if stats['errors'] else line)
+        return {'requests': len(stats['read']) + len(stats['write']), 'errors': stats['errors']}
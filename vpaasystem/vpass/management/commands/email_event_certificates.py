@@ -0,0 +1,76 @@
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from vpass.emails import build_certificate_email, claim_emails, deliver
+from vpass.models import Event, Attendance, OutboundEmail
+
+
+class Command(BaseCommand):
+    help = 'Email every approved certificate for an event over a single mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, required=True,
+                            help='ID of the event')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Messages per second (default: EMAIL_SEND_RATE, 0 for no limit)')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Messages claimed and sent per connection')
+        parser.add_argument('--resend', action='store_true',
+                            help='Also email attendees whose certificate was already sent')
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(id=options['event'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event {options["event"]} does not exist')
+
+        approved = (Attendance.objects.filter(event=event, certificate_approved=True)
+                    .exclude(Q(certificate='') | Q(certificate__isnull=True))
+                    .select_related('attendee', 'event'))
+        emails = OutboundEmail.objects.filter(kind='CERTIFICATE', attendance__event=event)
+
+        # Unsent rows from an earlier run are retried as they are; new rows
+        # are only created for attendances without one.
+        covered = emails.exclude(status='SENT') if options['resend'] else emails
+        covered_ids = set(covered.values_list('attendance_id', flat=True))
+        new_emails = [build_certificate_email(a) for a in approved if a.id not in covered_ids]
+        OutboundEmail.objects.bulk_create(new_emails, batch_size=500)
+
+        # Sending by hand skips any backoff and gives failed rows a fresh set of attempts
+        emails.filter(status='FAILED').update(status='PENDING', attempts=0)
+        emails.filter(status='PENDING').update(next_attempt_at=timezone.now())
+        started = timezone.now()
+        queue = emails.filter(status='PENDING', next_attempt_at__lte=started,
+                              attendance__certificate_approved=True)
+        total = queue.count()
+        self.stdout.write(f'Found {total} certificate emails to send for "{event.title}"...\n')
+
+        batch_size = max(1, options['batch_size'])
+        success = 0
+        failed = 0
+        # Rows are claimed like the outbox worker does, so both can run at
+        # once; failures are rescheduled past `started` and not picked up again.
+        # Every batch goes over the same mail connection.
+        connection = get_connection(fail_silently=False)
+        try:
+            while True:
+                batch = claim_emails(batch_size, queryset=queue)
+                if not batch:
+                    break
+                sent, errors = deliver(batch, rate=options['rate'], connection=connection)
+                success += sent
+                failed += errors
+                for outbound in batch:
+                    if outbound.status != 'SENT':
+                        self.stdout.write(self.style.ERROR(f'✗ {outbound.to_email}: {outbound.last_error}'))
+                self.stdout.write(f'Progress: {success + failed}/{total}')
+        finally:
+            connection.close()
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Successfully sent: {success}'))
+        if failed > 0:
+            self.stdout.write(self.style.ERROR(f'✗ Failed: {failed} (retried later by run_email_worker)'))
+        self.stdout.write(f'\nTotal processed: {total}\n')
@@ -1,45 +1,118 @@
+import json
+import os
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connections
+
 from vpass.models import Attendance
+# Pool entry points live apart from the models so spawned children can import them
+from vpass.workers import generate_certificates_for_ids, init_worker
 
 
 class Command(BaseCommand):
-    help = 'Convert all PNG certificates to PDF format'
+    help = 'Convert all PNG certificates to PDF format (parallel and resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of rendering processes (default: 1, renders in this process)')
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Attendances converted and saved per bulk update')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / '.fix_certificates_checkpoint.json'),
+                            help='File recording progress so an interrupted run can resume')
+        parser.add_argument('--reset', action='store_true',
+                            help='Ignore the checkpoint and scan every attendance again')
+
+    def load_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'done_through': 0, 'failed': {}}
+
+    def save_checkpoint(self, path, checkpoint):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
 
     def handle(self, *args, **options):
-        # Find all attendances with PNG certificates
-        attendances = Attendance.objects.filter(certificate__icontains='.png')
-        
-        total = attendances.count()
+        checkpoint_path = options['checkpoint']
+        checkpoint = {'done_through': 0, 'failed': {}} if options['reset'] else self.load_checkpoint(checkpoint_path)
+
+        # Find all attendances with PNG certificates. Rows are only switched
+        # to their PDF once it is written, so anything converted by an
+        # interrupted run no longer matches.
+        attendances = Attendance.objects.filter(certificate__icontains='.png').order_by('id')
+
+        total = attendances.filter(id__gt=checkpoint['done_through']).count()
+        if checkpoint['done_through']:
+            self.stdout.write(f'Resuming after attendance {checkpoint["done_through"]}')
         self.stdout.write(f'Found {total} PNG certificates to convert...\n')
-        
+        if not total:
+            return
+
+        chunk_size = max(1, options['chunk_size'])
+        workers = max(1, options['workers'])
+        pool = None
+        if workers > 1:
+            # Forked children must not share the parent's database connection
+            connections.close_all()
+            pool = Pool(processes=workers, initializer=init_worker)
+            submit = lambda chunk: pool.apply_async(generate_certificates_for_ids, (chunk,)).get
+        else:
+            submit = lambda chunk: partial(generate_certificates_for_ids, chunk)
+
+        def chunks():
+            # Each page of ids is its own short query: a long-lived cursor
+            # would hold SQLite's read lock and block the workers' commits.
+            last_id = checkpoint['done_through']
+            while True:
+                chunk = list(attendances.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+                if not chunk:
+                    return
+                yield chunk
+                last_id = chunk[-1]
+
         success = 0
         failed = 0
-        
-        for attendance in attendances:
-            try:
-                # Delete old PNG certificate
-                old_cert = str(attendance.certificate)
-                attendance.certificate.delete(save=False)
-                
-                # Generate new PDF certificate
-                if attendance.generate_certificate():
-                    success += 1
-                    self.stdout.write(self.style.SUCCESS(
-                        f'✓ Converted: {old_cert} → {attendance.certificate}'
-                    ))
-                else:
-                    failed += 1
-                    self.stdout.write(self.style.ERROR(
-                        f'✗ Failed to generate certificate for attendance {attendance.id}'
-                    ))
-            except Exception as e:
-                failed += 1
-                self.stdout.write(self.style.ERROR(
-                    f'✗ Error converting attendance {attendance.id}: {str(e)}'
-                ))
-        
+        in_flight = deque()
+
+        def collect():
+            # Chunks are collected in submission order, so everything up to
+            # the last id of a collected chunk is finished.
+            nonlocal success, failed
+            chunk, result = in_flight.popleft()
+            converted, failures = result()
+            success += converted
+            failed += len(failures)
+            for attendance_id, error in failures:
+                checkpoint['failed'][str(attendance_id)] = error
+                self.stdout.write(self.style.ERROR(f'✗ Error converting attendance {attendance_id}: {error}'))
+            checkpoint['done_through'] = chunk[-1]
+            self.save_checkpoint(checkpoint_path, checkpoint)
+            self.stdout.write(f'Progress: {success + failed}/{total}')
+
+        try:
+            for chunk in chunks():
+                in_flight.append((chunk, submit(chunk)))
+                # Keep every worker busy without reading ahead of them
+                if len(in_flight) >= workers * 2:
+                    collect()
+            while in_flight:
+                collect()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
         self.stdout.write('\n' + '='*50)
         self.stdout.write(self.style.SUCCESS(f'\n✓ Successfully converted: {success}'))
         if failed > 0:
             self.stdout.write(self.style.ERROR(f'✗ Failed: {failed}'))
+            self.stdout.write(f'Failed attendances are listed in {checkpoint_path}; rerun with --reset to retry them')
         self.stdout.write(f'\nTotal processed: {total}\n')
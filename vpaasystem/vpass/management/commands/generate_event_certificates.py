@@ -0,0 +1,72 @@
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+from vpass.models import Event, Attendance
+# Pool entry points live apart from the models so spawned children can import them
+from vpass.workers import generate_certificates_for_ids, init_worker
+
+
+class Command(BaseCommand):
+    help = 'Generate every missing certificate for an event ahead of time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, required=True,
+                            help='ID of the event')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of rendering processes (default: 1, renders in this process)')
+        parser.add_argument('--chunk-size', type=int, default=100,
+                            help='Attendances rendered and saved per bulk update')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate certificates that already exist')
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(id=options['event'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event {options["event"]} does not exist')
+
+        attendances = Attendance.objects.filter(event=event, present=True)
+        if not options['force']:
+            attendances = attendances.filter(Q(certificate='') | Q(certificate__isnull=True))
+
+        attendance_ids = list(attendances.order_by('id').values_list('id', flat=True))
+        total = len(attendance_ids)
+        self.stdout.write(f'Found {total} certificates to generate for "{event.title}"...\n')
+        if not total:
+            return
+
+        chunk_size = max(1, options['chunk_size'])
+        chunks = [attendance_ids[i:i + chunk_size] for i in range(0, total, chunk_size)]
+
+        workers = max(1, options['workers'])
+        pool = None
+        if workers > 1:
+            # Forked children must not share the parent's database connection
+            connections.close_all()
+            pool = Pool(processes=min(workers, len(chunks)), initializer=init_worker)
+            results = pool.imap_unordered(generate_certificates_for_ids, chunks)
+        else:
+            results = map(generate_certificates_for_ids, chunks)
+
+        success = 0
+        failed = 0
+        try:
+            for generated, failures in results:
+                success += generated
+                failed += len(failures)
+                for attendance_id, error in failures:
+                    self.stdout.write(self.style.ERROR(f'✗ Attendance {attendance_id}: {error}'))
+                self.stdout.write(f'Progress: {success + failed}/{total}')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Successfully generated: {success}'))
+        if failed > 0:
+            self.stdout.write(self.style.ERROR(f'✗ Failed: {failed}'))
+        self.stdout.write(f'\nTotal processed: {total}\n')
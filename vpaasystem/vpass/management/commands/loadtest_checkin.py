@@ -0,0 +1,232 @@
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from vpass.checkin_tokens import event_token
+from vpass.management.commands.benchmark_checkin import percentile
+from vpass.models import Event, Attendee, Survey
+
+
+class Session:
+    """One simulated phone: a keep-alive connection that records every request it makes."""
+
+    def __init__(self, base_url, stats, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connect = lambda: connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip('/')
+        self.stats = stats
+        self.connection = None
+
+    def request(self, name, method, path, body=None):
+        """Returns (status, decoded JSON or None); status is 0 when the request itself failed."""
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = self.connect()
+            self.connection.request(method, self.prefix + path, payload, headers)
+            response = self.connection.getresponse()
+            raw = response.read()
+            status = response.status
+            if response.will_close:
+                self.close()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            status, raw = 0, b''
+        self.stats.record(name, status, (time.perf_counter() - started) * 1000)
+        try:
+            return status, json.loads(raw) if raw and raw[:1] in (b'{', b'[') else None
+        except ValueError:
+            return status, None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, status, ms):
+        with self.lock:
+            self.samples[name].append(ms)
+            self.statuses[name][status] += 1
+
+
+class Command(BaseCommand):
+    help = ('Simulate a burst of students going through the check-in page against a running server '
+            '(runserver, gunicorn, ...) and report throughput, latency percentiles and error rates per '
+            'endpoint. Creates a live event and students in the configured database and deletes them afterwards, '
+            'so run it with the same settings as the server.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help='Server to load (default: http://127.0.0.1:8000)')
+        parser.add_argument('--students', type=int, default=300,
+                            help='Students in the burst')
+        parser.add_argument('--concurrency', type=int, default=30,
+                            help='Students on their phones at the same time')
+        parser.add_argument('--ramp', type=float, default=10.0,
+                            help='Seconds over which students arrive (0 for everyone at once)')
+        parser.add_argument('--new-ratio', type=float, default=0.3,
+                            help='Share of students not registered yet, who sign up at time-in')
+        parser.add_argument('--polls', type=int, default=3,
+                            help='check_completion polls while waiting for the certificate')
+        parser.add_argument('--think-time', type=float, default=0.5,
+                            help='Mean pause in seconds between a student\'s steps (0 to hammer)')
+        parser.add_argument('--no-survey', action='store_true',
+                            help='Run the event without a survey step')
+        parser.add_argument('--timeout', type=float, default=30.0,
+                            help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int,
+                            help='Random seed, for repeatable runs')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the synthetic event and students afterwards')
+
+    def handle(self, *args, **options):
+        count = options['students']
+        if count < 1 or options['concurrency'] < 1:
+            raise CommandError('--students and --concurrency must be at least 1')
+        rng = random.Random(options['seed'])
+        run_id = uuid.uuid4().hex[:8]
+        now = timezone.now()
+
+        event = Event.objects.create(
+            title=f'Load test {run_id}',
+            description='Synthetic event created by loadtest_checkin',
+            start=now - timedelta(minutes=30),
+            end=now + timedelta(hours=2),
+        )
+        survey = None
+        if not options['no_survey']:
+            survey = Survey.objects.create(event=event, title='Event feedback', questions=[
+                {'id': 1, 'type': 'multiple_choice', 'question': 'How would you rate the event?',
+                 'options': ['Excellent', 'Good', 'Fair', 'Poor'], 'required': True},
+                {'id': 2, 'type': 'text', 'question': 'Any comments?'},
+            ])
+        students = [{
+            'full_name': f'Load Student {i}',
+            'email': f'loadtest-{run_id}-{i}@example.invalid',
+            'student_id': f'LT{run_id}{i:05d}'.upper(),
+        } for i in range(count)]
+        new_count = round(count * min(1.0, max(0.0, options['new_ratio'])))
+        Attendee.objects.bulk_create([Attendee(**student) for student in students[new_count:]], batch_size=500)
+        rng.shuffle(students)
+        token = event_token(event)
+
+        stats = Stats()
+        think = options['think_time']
+        ramp = max(0.0, options['ramp'])
+        arrivals = sorted(rng.uniform(0, ramp) for _ in students)
+
+        def pause(student_rng):
+            if think > 0:
+                time.sleep(student_rng.expovariate(1 / think))
+
+        def student_visit(index, student, arrive_at):
+            # One generator per student: with --seed the run does not depend on thread scheduling
+            seed = options['seed']
+            student_rng = random.Random(None if seed is None else seed + index)
+            delay = arrive_at - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            session = Session(options['base_url'], stats, options['timeout'])
+            try:
+                # The /event/<id>/checkin page loads the event, then the student times in
+                session.request('events/<id>', 'GET', f'/api/events/{event.id}/')
+                pause(student_rng)
+                status, attendance = session.request('attendances/time_in', 'POST', '/api/attendances/time_in/', {
+                    'event_id': event.id, 'attendee': student, 'token': token,
+                })
+                if status not in (200, 201) or not attendance:
+                    return
+                attendance_id = attendance['id']
+                session.request('surveys/by_event', 'GET', f'/api/surveys/by_event/?event_id={event.id}')
+                session.request('check_completion', 'GET', f'/api/attendances/{attendance_id}/check_completion/')
+                pause(student_rng)
+                session.request('time_out', 'POST', f'/api/attendances/{attendance_id}/time_out/')
+                session.request('check_completion', 'GET', f'/api/attendances/{attendance_id}/check_completion/')
+                if survey is not None:
+                    pause(student_rng)
+                    session.request('survey-responses', 'POST', '/api/survey-responses/', {
+                        'attendance': attendance_id, 'survey': survey.id,
+                        'answers': {'1': student_rng.choice(['Excellent', 'Good', 'Fair']), '2': 'Great event'},
+                    })
+                for poll in range(options['polls']):
+                    status, completion = session.request(
+                        'check_completion', 'GET', f'/api/attendances/{attendance_id}/check_completion/')
+                    if completion and completion.get('certificate_ready'):
+                        break
+                    if poll < options['polls'] - 1:
+                        pause(student_rng)
+                # 202 means queued: counted, but not as an error
+                session.request('download_certificate', 'GET', f'/api/attendances/{attendance_id}/download_certificate/')
+            finally:
+                session.close()
+
+        self.stdout.write(
+            f'Simulating {count} students ({new_count} new) against {options["base_url"]}, '
+            f'{options["concurrency"]} at a time over {ramp:g}s, event {event.id}\n'
+        )
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                for future in [pool.submit(student_visit, i, s, t) for i, (s, t) in enumerate(zip(students, arrivals))]:
+                    future.result()
+            elapsed = time.perf_counter() - started
+        finally:
+            if not options['keep']:
+                Event.objects.filter(id=event.id).delete()
+                Attendee.objects.filter(email__startswith=f'loadtest-{run_id}-').delete()
+
+        self.report(stats, elapsed, count)
+
+    def report(self, stats, elapsed, count):
+        total = 0
+        total_errors = 0
+        self.stdout.write(f'{"endpoint":<22} {"requests":>8} {"req/s":>7} {"p50 ms":>8} {"p95 ms":>8} '
+                          f'{"p99 ms":>8} {"max ms":>8} {"errors":>7}  statuses')
+        for name, samples in stats.samples.items():
+            statuses = stats.statuses[name]
+            errors = sum(n for status, n in statuses.items() if status == 0 or status >= 400)
+            total += len(samples)
+            total_errors += errors
+            self.stdout.write(
+                f'{name:<22} {len(samples):>8} {len(samples) / elapsed:>7.1f} '
+                f'{percentile(samples, 50):>8.1f} {percentile(samples, 95):>8.1f} '
+                f'{percentile(samples, 99):>8.1f} {max(samples):>8.1f} {errors / len(samples):>7.1%}  '
+                + ' '.join(f'{status or "failed"}×{n}' for status, n in sorted(statuses.items()))
+            )
+        all_samples = [ms for samples in stats.samples.values() for ms in samples]
+
+        self.stdout.write('\n' + '='*50)
+        if all_samples:
+            self.stdout.write(
+                f'\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, '
+                f'{count / elapsed:.1f} students/s, p50 {percentile(all_samples, 50):.1f} ms, '
+                f'p95 {percentile(all_samples, 95):.1f} ms, p99 {percentile(all_samples, 99):.1f} ms'
+            )
+        if total_errors:
+            self.stdout.write(self.style.ERROR(f'✗ Errors: {total_errors} ({total_errors / max(total, 1):.2%})'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ No errors'))
+        self.stdout.write(f'\nTotal processed: {count}\n')
@@ -0,0 +1,153 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim, Upper
+
+from vpass.checkin import present_count_subquery, require_roster_resync
+from vpass.models import (
+    Event, Attendee, Attendance, CertificateJob, CheckinReceipt, OutboundEmail, SurveyResponse,
+    normalize_email, normalize_student_id,
+)
+
+
+class Command(BaseCommand):
+    help = ('Fold attendees sharing a normalized email or student ID into one row, '
+            'merging their attendances (run before the unique identity migration)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the merges without changing anything')
+
+    def duplicate_groups(self):
+        """Sets of attendee ids that share an email or a student ID (transitively)."""
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for key in (Lower(Trim('email')), Upper(Trim('student_id'))):
+            attendees = Attendee.objects.annotate(key=key).exclude(key__isnull=True).exclude(key='')
+            duplicated = attendees.values('key').annotate(n=Count('id')).filter(n__gt=1).values('key')
+            members = defaultdict(list)
+            for attendee_id, value in attendees.filter(key__in=duplicated).values_list('id', 'key'):
+                members[value].append(attendee_id)
+            for ids in members.values():
+                for other in ids[1:]:
+                    parent[find(other)] = find(ids[0])
+
+        groups = defaultdict(set)
+        for attendee_id in list(parent):
+            groups[find(attendee_id)].add(attendee_id)
+        return sorted(groups.values(), key=min)
+
+    def choose_survivor(self, attendees):
+        # Keep the row linked to a login, then the one with the most history, then the oldest
+        return min(attendees, key=lambda a: (a.user_id is None, -a.n_attendances, a.id))
+
+    def fold_attendances(self, survivor, losers):
+        """
+        Move the losers' attendances to the survivor. Where both attended the
+        same event the best row is kept (certificate, then present, then the
+        survivor's own) and the other one's survey responses, emails, receipts
+        and queued job move onto it before it is deleted. Returns (moved, folded, event ids).
+        """
+        ids = [survivor.id] + [a.id for a in losers]
+        by_event = defaultdict(list)
+        for attendance in Attendance.objects.filter(attendee_id__in=ids).order_by('id'):
+            by_event[attendance.event_id].append(attendance)
+
+        folded = 0
+        for rows in by_event.values():
+            if len(rows) < 2:
+                continue
+            keeper = min(rows, key=lambda a: (not a.certificate, not a.present, a.attendee_id != survivor.id, a.id))
+            for other in rows:
+                if other.id == keeper.id:
+                    continue
+                taken = SurveyResponse.objects.filter(attendance=keeper).values('survey_id')
+                SurveyResponse.objects.filter(attendance=other).exclude(survey_id__in=taken).update(attendance=keeper)
+                OutboundEmail.objects.filter(attendance=other).update(attendance=keeper)
+                CheckinReceipt.objects.filter(attendance=other).update(attendance=keeper)
+                if not CertificateJob.objects.filter(attendance=keeper).exists():
+                    CertificateJob.objects.filter(attendance=other).update(attendance=keeper)
+                keeper.present = keeper.present or other.present
+                keeper.timestamp = min(keeper.timestamp, other.timestamp)
+                if other.time_out and (keeper.time_out is None or other.time_out > keeper.time_out):
+                    keeper.time_out = other.time_out
+                other.delete()
+                folded += 1
+            keeper.attendee_id = survivor.id
+            keeper.save(update_fields=['attendee', 'present', 'timestamp', 'time_out', 'updated_at'])
+
+        moved = Attendance.objects.filter(attendee_id__in=[a.id for a in losers]).update(attendee_id=survivor.id)
+        return moved, folded, set(by_event)
+
+    def merge(self, survivor, losers):
+        moved, folded, events = self.fold_attendances(survivor, losers)
+
+        # Identity fields are unique (the normalized email may still be a
+        # loser's), so the losers are gone before the survivor takes them
+        student_id = survivor.student_id or next((a.student_id for a in losers if a.student_id), None)
+        user_id = survivor.user_id or next((a.user_id for a in losers if a.user_id), None)
+        Attendee.objects.filter(id__in=[a.id for a in losers]).delete()
+        Attendee.objects.filter(id=survivor.id).update(
+            email=normalize_email(survivor.email),
+            student_id=normalize_student_id(student_id),
+            user_id=user_id,
+        )
+        # Moved rows changed attendee without a delta offline scanners could apply
+        require_roster_resync(events)
+        return moved, folded, events
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        groups = self.duplicate_groups()
+        self.stdout.write(f'Found {len(groups)} groups of duplicate attendees...\n')
+
+        merged = 0
+        removed = 0
+        folded_total = 0
+        skipped = 0
+        touched_events = set()
+        for ids in groups:
+            attendees = list(Attendee.objects.filter(id__in=ids).annotate(n_attendances=Count('attendances')))
+            survivor = self.choose_survivor(attendees)
+            losers = [a for a in attendees if a.id != survivor.id]
+            users = {a.user_id for a in attendees if a.user_id}
+            label = ', '.join(f'#{a.id} {a.email}' + (f' [{a.student_id}]' if a.student_id else '') for a in losers)
+            if len(users) > 1:
+                skipped += 1
+                self.stdout.write(self.style.ERROR(
+                    f'✗ #{survivor.id} {survivor.email}: duplicates {label} belong to different user accounts; merge them by hand'))
+                continue
+            if dry_run:
+                self.stdout.write(f'Would merge {label} into #{survivor.id} {survivor.email}')
+                merged += 1
+                removed += len(losers)
+                continue
+            with transaction.atomic():
+                moved, folded, events = self.merge(survivor, losers)
+            touched_events |= events
+            merged += 1
+            removed += len(losers)
+            folded_total += folded
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Merged {label} into #{survivor.id} {survivor.email} ({moved} attendances moved, {folded} folded)'))
+
+        if touched_events:
+            # Folding two present rows into one changes the event's present count
+            Event.objects.filter(id__in=touched_events).update(present_count=present_count_subquery())
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Merged groups: {merged} ({removed} duplicate attendees removed, {folded_total} attendances folded)'))
+        if skipped > 0:
+            self.stdout.write(self.style.ERROR(f'✗ Skipped: {skipped}'))
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was changed'))
+        self.stdout.write(f'\nTotal processed: {len(groups)}\n')
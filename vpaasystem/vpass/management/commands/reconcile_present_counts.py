@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from vpass.checkin import present_count_subquery
+from vpass.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Recount present attendances and repair Event.present_count where it has drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int,
+                            help='Only reconcile this event')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drift without changing anything')
+
+    def handle(self, *args, **options):
+        events = Event.objects.order_by('id')
+        if options['event']:
+            events = events.filter(id=options['event'])
+
+        counted = events.annotate(actual=present_count_subquery())
+        drifted = list(counted.exclude(present_count=F('actual')).values_list('id', 'title', 'present_count', 'actual'))
+        total = events.count()
+        self.stdout.write(f'Checking present counts for {total} events...\n')
+
+        for event_id, title, stored, actual in drifted:
+            self.stdout.write(self.style.ERROR(f'✗ Event {event_id} "{title}": counter {stored}, actually present {actual}'))
+
+        repaired = 0
+        if drifted and not options['dry_run']:
+            # Recounted inside the UPDATE itself, so check-ins that land
+            # between the report above and this statement are not lost
+            repaired = Event.objects.filter(id__in=[row[0] for row in drifted]).update(
+                present_count=present_count_subquery()
+            )
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Consistent: {total - len(drifted)}'))
+        if drifted:
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f'Drifted: {len(drifted)} (dry run, nothing changed)'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ Repaired: {repaired}'))
+        self.stdout.write(f'\nTotal processed: {total}\n')
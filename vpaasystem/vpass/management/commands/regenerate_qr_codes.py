@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from vpass.models import Event
+from vpass.qr import public_base_url, render_qr
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the stored QR code of every event (e.g. after changing QR_PUBLIC_BASE_URL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int,
+                            help='Only regenerate this event')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Events saved per bulk update')
+
+    def handle(self, *args, **options):
+        events = Event.objects.order_by('id')
+        if options['event']:
+            events = events.filter(id=options['event'])
+
+        total = events.count()
+        self.stdout.write(f'Regenerating QR codes for {total} events...\n')
+
+        batch_size = max(1, options['batch_size'])
+        # Old cached renders point at the previous base URL
+        render_qr.cache_clear()
+        success = 0
+        failed = 0
+        pending = []
+        for event in events.only('id', 'start', 'end', 'capacity_policy_version', 'qr_code').iterator(chunk_size=batch_size):
+            try:
+                event.generate_qr_code()
+                pending.append(event)
+                success += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'✗ Event {event.id}: {str(e)}'))
+            if len(pending) >= batch_size:
+                Event.objects.bulk_update(pending, ['qr_code'])
+                pending.clear()
+        Event.objects.bulk_update(pending, ['qr_code'])
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Successfully regenerated: {success}'))
+        if failed > 0:
+            self.stdout.write(self.style.ERROR(f'✗ Failed: {failed}'))
+        if total:
+            self.stdout.write(f'QR codes now point to {public_base_url()}')
+        self.stdout.write(f'\nTotal processed: {total}\n')
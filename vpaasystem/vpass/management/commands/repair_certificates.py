@@ -0,0 +1,105 @@
+import hashlib
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from vpass.models import Attendance
+from vpass.tasks import enqueue_certificate, retry_failed_certificates
+
+
+class Command(BaseCommand):
+    help = 'Verify certificate files against their recorded size and checksum, backfilling or repairing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report problems without changing anything')
+        parser.add_argument('--requeue', action='store_true',
+                            help='Queue broken certificates for regeneration')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Give certificate jobs that used up their attempts another round')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows read and updated per batch')
+
+    def inspect(self, attendance):
+        """Hash the stored file. Returns (size, sha256) or None if it cannot be read."""
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with attendance.certificate.storage.open(attendance.certificate.name, 'rb') as f:
+                for block in iter(lambda: f.read(64 * 1024), b''):
+                    digest.update(block)
+                    size += len(block)
+        except OSError:
+            return None
+        return size, digest.hexdigest()
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+
+        attendances = (Attendance.objects.exclude(Q(certificate='') | Q(certificate__isnull=True))
+                       .select_related('attendee', 'event')
+                       .order_by('id'))
+        total = attendances.count()
+        self.stdout.write(f'Verifying {total} certificates...\n')
+
+        ok = 0
+        backfilled = []
+        broken = []
+        pending = []
+
+        def flush():
+            if not dry_run and pending:
+                Attendance.objects.bulk_update(pending, Attendance.CERTIFICATE_METADATA_FIELDS)
+            pending.clear()
+
+        for attendance in attendances.iterator(chunk_size=batch_size):
+            result = self.inspect(attendance)
+            if result is None:
+                problem = 'file missing'
+            elif result[0] < Attendance.MIN_CERTIFICATE_SIZE:
+                problem = f'file too small ({result[0]} bytes)'
+            elif attendance.certificate_sha256 and attendance.certificate_sha256 != result[1]:
+                problem = 'checksum mismatch'
+            else:
+                problem = None
+
+            if problem:
+                broken.append(attendance)
+                self.stdout.write(self.style.ERROR(f'✗ Attendance {attendance.id}: {problem}'))
+                if not dry_run:
+                    if result is not None:
+                        attendance.certificate.delete(save=False)
+                    attendance.certificate = None
+                    attendance.clear_certificate_metadata()
+                    pending.append(attendance)
+            elif attendance.certificate_size != result[0] or not attendance.certificate_sha256:
+                # Written before the metadata columns existed
+                attendance.certificate_size, attendance.certificate_sha256 = result
+                backfilled.append(attendance)
+                pending.append(attendance)
+            else:
+                ok += 1
+
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+
+        if options['requeue'] and not dry_run:
+            for attendance in broken:
+                enqueue_certificate(attendance)
+
+        retried = 0
+        if options['retry_failed'] and not dry_run:
+            retried = retry_failed_certificates()
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Verified: {ok}'))
+        if backfilled:
+            self.stdout.write(self.style.SUCCESS(f'✓ Metadata backfilled: {len(backfilled)}'))
+        if broken:
+            action = 'found' if dry_run else ('cleared and requeued' if options['requeue'] else 'cleared')
+            self.stdout.write(self.style.ERROR(f'✗ Broken certificates {action}: {len(broken)}'))
+        if retried:
+            self.stdout.write(self.style.SUCCESS(f'✓ Failed jobs requeued: {retried}'))
+        self.stdout.write(f'\nTotal processed: {total}\n')
@@ -0,0 +1,79 @@
+import time
+from datetime import timedelta
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from vpass.tasks import claim_certificate_jobs, requeue_stale_jobs
+# Pool entry points live apart from the models so spawned children can import them
+from vpass.workers import init_worker, run_certificate_job
+
+
+class Command(BaseCommand):
+    help = 'Render queued certificates in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of rendering processes (default: 1, renders in this process)')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Jobs claimed from the queue per round')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Seconds after which a running job is considered abandoned')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = max(1, options['batch_size'])
+        stale_after = timedelta(seconds=options['stale_after'])
+
+        pool = None
+        if workers > 1:
+            # Forked children must not share the parent's database connection
+            connections.close_all()
+            pool = Pool(processes=workers, initializer=init_worker)
+
+        self.stdout.write(f'Certificate worker started with {workers} process(es)...\n')
+
+        success = 0
+        failed = 0
+        try:
+            while True:
+                requeued = requeue_stale_jobs(stale_after)
+                if requeued:
+                    self.stdout.write(f'Requeued {requeued} abandoned job(s)')
+
+                job_ids = claim_certificate_jobs(batch_size)
+                if not job_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                if pool is not None:
+                    results = pool.imap_unordered(run_certificate_job, job_ids)
+                else:
+                    results = map(run_certificate_job, job_ids)
+
+                for job_id, succeeded, error in results:
+                    if succeeded:
+                        success += 1
+                    else:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f'✗ Job {job_id} failed: {error}'))
+
+                self.stdout.write(f'Processed {len(job_ids)} job(s)')
+        except KeyboardInterrupt:
+            self.stdout.write('\nStopping certificate worker...')
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Certificates generated: {success}'))
+        if failed > 0:
+            self.stdout.write(self.style.ERROR(f'✗ Failed: {failed}'))
@@ -0,0 +1,65 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from vpass.checkin import flush_journal
+from vpass.checkin_journal import JournalLocked, quarantine_torn_segments, writer_lock
+
+
+class Command(BaseCommand):
+    help = 'Write check-ins acknowledged from the write-behind journal to the database, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.CHECKIN_BATCH_MAX,
+                            help='Scans written per transaction batch')
+        parser.add_argument('--poll-interval', type=float, default=0.2,
+                            help='Seconds to sleep when the journal is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Flush the journal and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        totals = Counter()
+        torn = 0
+        try:
+            with writer_lock():
+                self.stdout.write('Check-in writer started...\n')
+                torn += self.quarantine()
+                while True:
+                    results, skipped = flush_journal(batch_size)
+                    if not results and not skipped:
+                        # Segments closed with a torn tail would never be retired
+                        torn += self.quarantine()
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    counts = Counter(result['status'] for result in results)
+                    totals.update(counts)
+                    torn += skipped
+                    if skipped:
+                        self.stdout.write(self.style.ERROR(f'✗ Skipped {skipped} torn journal line(s)'))
+                    self.stdout.write(f'Flushed {len(results)} scan(s): '
+                                      + ', '.join(f'{n} {name}' for name, n in counts.most_common()))
+        except JournalLocked:
+            raise CommandError('Another run_checkin_writer is already flushing this journal')
+        except KeyboardInterrupt:
+            self.stdout.write('\nStopping check-in writer...')
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Checked in: {totals["checked_in"]}'))
+        if totals['already_present']:
+            self.stdout.write(f'Already present: {totals["already_present"]}')
+        rejected = sum(totals.values()) - totals['checked_in'] - totals['already_present']
+        if rejected or torn:
+            self.stdout.write(self.style.ERROR(f'✗ Rejected: {rejected}, torn lines: {torn}'))
+        self.stdout.write(f'\nTotal processed: {sum(totals.values()) + torn}\n')
+
+    def quarantine(self):
+        fixed = quarantine_torn_segments()
+        for name in fixed:
+            self.stdout.write(self.style.ERROR(f'✗ Moved the torn last line of {name} to {name}.torn'))
+        return len(fixed)
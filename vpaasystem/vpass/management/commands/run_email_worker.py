@@ -0,0 +1,72 @@
+import time
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from vpass.emails import claim_emails, deliver, requeue_stale_emails
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails in the background'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Emails claimed and sent over one connection per round')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Messages per second (default: EMAIL_SEND_RATE, 0 for no limit)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Seconds after which a sending email is considered abandoned')
+        parser.add_argument('--once', action='store_true',
+                            help='Send everything that is due and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        stale_after = timedelta(seconds=options['stale_after'])
+
+        self.stdout.write('Email worker started...\n')
+
+        success = 0
+        failed = 0
+        # Busy rounds share one mail connection; it is closed whenever the
+        # outbox runs dry so the server never drops it while idle
+        connection = get_connection(fail_silently=False)
+        try:
+            while True:
+                requeued = requeue_stale_emails(stale_after)
+                if requeued:
+                    self.stdout.write(f'Requeued {requeued} abandoned email(s)')
+
+                emails = claim_emails(batch_size)
+                if not emails:
+                    connection.close()
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                sent, errors = deliver(emails, rate=options['rate'], connection=connection)
+                success += sent
+                failed += errors
+                for outbound in emails:
+                    if outbound.status == 'PENDING':
+                        self.stdout.write(self.style.ERROR(
+                            f'✗ {outbound.to_email}: {outbound.last_error} (retrying at {outbound.next_attempt_at:%H:%M:%S})'
+                        ))
+                    elif outbound.status == 'FAILED':
+                        self.stdout.write(self.style.ERROR(
+                            f'✗ {outbound.to_email}: {outbound.last_error} (giving up after {outbound.attempts} attempts)'
+                        ))
+
+                self.stdout.write(f'Processed {len(emails)} email(s)')
+        except KeyboardInterrupt:
+            self.stdout.write('\nStopping email worker...')
+        finally:
+            connection.close()
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Emails sent: {success}'))
+        if failed > 0:
+            self.stdout.write(self.style.ERROR(f'✗ Failed attempts: {failed}'))
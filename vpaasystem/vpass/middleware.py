@@ -0,0 +1,20 @@
+from .signals import finish_completion_batch, start_completion_batch
+
+
+class CompletionCheckMiddleware:
+    """
+    Batch the completion checks scheduled while a request runs (see
+    vpass.signals.schedule_completion_check) and evaluate them once the view
+    has returned, before the response leaves and while the request's
+    database connection is still the one Django manages.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_completion_batch()
+        try:
+            return self.get_response(request)
+        finally:
+            finish_completion_batch()
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0010_certificatejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='certificate_generated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='certificate_renderer_version',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='certificate_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='certificate_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
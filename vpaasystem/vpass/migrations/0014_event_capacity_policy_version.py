@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0013_outbox_retry_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity_policy_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
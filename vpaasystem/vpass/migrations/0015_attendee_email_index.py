@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0014_event_capacity_policy_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendee',
+            index=models.Index(fields=['email'], name='vpass_atten_email_11d54a_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:52
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_present_count(apps, schema_editor):
+    Event = apps.get_model('vpass', 'Event')
+    Attendance = apps.get_model('vpass', 'Attendance')
+    present = (Attendance.objects.filter(event=OuterRef('pk'), present=True)
+               .order_by().values('event').annotate(n=Count('id')).values('n'))
+    Event.objects.update(present_count=Coalesce(Subquery(present, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0015_attendee_email_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='present_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_present_count, migrations.RunPython.noop),
+    ]
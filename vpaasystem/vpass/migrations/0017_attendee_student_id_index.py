@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0016_event_present_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendee',
+            index=models.Index(fields=['student_id'], name='vpass_atten_student_dd4d7a_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:00
+
+from django.db import migrations
+from django.db.models.functions import Lower, Trim, Upper
+
+
+def normalize_identities(apps, schema_editor):
+    # Same rules as vpass.models.normalize_email / normalize_student_id
+    Attendee = apps.get_model('vpass', 'Attendee')
+    Attendee.objects.update(email=Lower(Trim('email')), student_id=Upper(Trim('student_id')))
+    Attendee.objects.filter(student_id='').update(student_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0018_offline_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_identities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_for_duplicates(apps, schema_editor):
+    Attendee = apps.get_model('vpass', 'Attendee')
+    duplicates = {}
+    for field in ('email', 'student_id'):
+        duplicates[field] = (Attendee.objects.exclude(**{f'{field}__isnull': True})
+                             .values(field).annotate(n=Count('id')).filter(n__gt=1).count())
+    if any(duplicates.values()):
+        raise RuntimeError(
+            f"Cannot make attendee identities unique: {duplicates['email']} duplicated emails and "
+            f"{duplicates['student_id']} duplicated student IDs. Merge them first:\n"
+            "    python manage.py migrate vpass 0019_normalize_attendee_identity\n"
+            "    python manage.py merge_duplicate_attendees\n"
+            "    python manage.py migrate"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0019_normalize_attendee_identity'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_for_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='attendee',
+            name='vpass_atten_email_11d54a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='attendee',
+            name='vpass_atten_student_dd4d7a_idx',
+        ),
+        migrations.AlterField(
+            model_name='attendee',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='attendee',
+            name='student_id',
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True),
+        ),
+    ]
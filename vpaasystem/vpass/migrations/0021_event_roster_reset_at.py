@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vpass', '0020_attendee_unique_identity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='roster_reset_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
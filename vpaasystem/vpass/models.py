@@ -4,6 +4,7 @@ from django.core.files.base import ContentFile
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+import hashlib
 import io
 from PIL import Image, ImageDraw, ImageFont
 import os
@@ -84,6 +85,13 @@ class Event(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_events')
     qr_code = models.ImageField(upload_to='qr_codes/', null=True, blank=True)
     max_capacity = models.IntegerField(default=0, help_text="0 means unlimited")
+    # Bumped whenever max_capacity changes; carried in signed check-in tokens
+    capacity_policy_version = models.PositiveIntegerField(default=1)
+    # Attendances marked present, maintained by vpass.checkin; repaired by reconcile_present_counts
+    present_count = models.PositiveIntegerField(default=0)
+    # Set when roster rows are deleted or change attendee; offline scanners that
+    # synced before it get the whole roster again (see vpass.checkin.event_roster)
+    roster_reset_at = models.DateTimeField(null=True, blank=True)
     certificate_template = models.CharField(max_length=50, default='default', choices=[
         ('default', 'Default Template'),
         ('modern', 'Modern Template'),
@@ -123,50 +131,39 @@ class Event(models.Model):
     
     @property
     def attendee_count(self):
-        return self.attendances.filter(present=True).count()
+        return self.present_count
     
     def generate_qr_code(self):
-        import qrcode
-        from io import BytesIO
-        from django.core.files import File
-        import socket
-        
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        
-        # Get local IP address for mobile access
-        try:
-            # Get the local IP address of the machine
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-        except:
-            local_ip = "localhost"
-        
-        # Generate URL that opens the check-in page (NOT the QR display page)
-        # Use local IP so phones on same network can access
-        event_url = f"http://{local_ip}:3000/event/{self.id}/checkin"
-        qr.add_data(event_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        
-        filename = f'qr_event_{self.id}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
-        buffer.close()
+        # Check-in URL comes from settings.QR_PUBLIC_BASE_URL; see vpass.qr
+        from .qr import save_event_qr_code
+        save_event_qr_code(self)
+
+
+def normalize_email(email):
+    """Canonical form of an attendee email: trimmed and lower-cased."""
+    return (email or '').strip().lower()
+
+
+def normalize_student_id(student_id):
+    """Canonical form of a student ID: trimmed and upper-cased, None when blank."""
+    return (student_id or '').strip().upper() or None
 
 
 class Attendee(models.Model):
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='attendee_profile')
     full_name = models.CharField(max_length=255)
-    email = models.EmailField()
-    student_id = models.CharField(max_length=20, blank=True, null=True)
+    # Stored normalized (see save()); duplicates are folded by merge_duplicate_attendees
+    email = models.EmailField(unique=True)
+    student_id = models.CharField(max_length=20, blank=True, null=True, unique=True)
     
     def __str__(self):
         return f"{self.full_name} ({self.student_id or 'No ID'})"
+    
+    def save(self, *args, **kwargs):
+        self.email = normalize_email(self.email)
+        self.student_id = normalize_student_id(self.student_id)
+        super().save(*args, **kwargs)
 
 
 class Attendance(models.Model):
@@ -179,6 +176,18 @@ class Attendance(models.Model):
     certificate_reviewed = models.BooleanField(default=False)
     certificate_approved = models.BooleanField(default=False)
     certificate_modifications = models.JSONField(default=dict, blank=True)
+    # Recorded when the certificate file is written so request paths never stat the file
+    certificate_size = models.PositiveIntegerField(null=True, blank=True)
+    certificate_sha256 = models.CharField(max_length=64, blank=True)
+    certificate_generated_at = models.DateTimeField(null=True, blank=True)
+    certificate_renderer_version = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Bumped on every change to the check-in state; offline scanners sync by it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Anything smaller than this is not a real certificate PDF
+    MIN_CERTIFICATE_SIZE = 1000
+    CERTIFICATE_METADATA_FIELDS = ['certificate', 'certificate_size', 'certificate_sha256',
+                                   'certificate_generated_at', 'certificate_renderer_version']
 
     class Meta:
         unique_together = ('event', 'attendee')
@@ -186,142 +195,141 @@ class Attendance(models.Model):
             models.Index(fields=['event', 'attendee']),
             models.Index(fields=['timestamp']),
             models.Index(fields=['present']),
+            models.Index(fields=['event', 'updated_at']),
         ]
 
     def __str__(self):
         return f"{self.attendee} - {self.event} - {'Present' if self.present else 'Absent'}"
         
-    def generate_certificate(self):
-        from datetime import date
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.platypus import Paragraph, Frame, Image
-        from io import BytesIO
-        from django.conf import settings
-        import os
+    @property
+    def has_valid_certificate(self):
+        """
+        Whether a usable certificate is stored, judged from the recorded metadata.
+
+        Rows written before the metadata columns existed have no size yet and
+        are trusted until the repair_certificates command backfills them.
+        """
+        if not self.certificate:
+            return False
+        return self.certificate_size is None or self.certificate_size >= self.MIN_CERTIFICATE_SIZE
+    
+    def set_certificate_metadata(self, content, renderer_version=None):
+        self.certificate_size = len(content)
+        self.certificate_sha256 = hashlib.sha256(content).hexdigest()
+        self.certificate_generated_at = timezone.now()
+        if renderer_version is not None:
+            self.certificate_renderer_version = renderer_version
+    
+    def clear_certificate_metadata(self):
+        self.certificate_size = None
+        self.certificate_sha256 = ''
+        self.certificate_generated_at = None
+        self.certificate_renderer_version = None
+        
+    def generate_certificate(self, save=True):
+        from .certificates import RENDERER_VERSION, render_certificate_pdf
         
         if not self.present:
             return False
             
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        
-        # Add background color
-        c.setFillColorRGB(0.95, 0.95, 0.95)
-        c.rect(0, 0, width, height, fill=1, stroke=0)
-        
-        # Add border
-        c.setStrokeColorRGB(0.2, 0.4, 0.7)
-        c.setLineWidth(10)
-        c.rect(20, 20, width-40, height-40, fill=0, stroke=1)
-        
-        # Add decorative elements
-        c.setFillColorRGB(0.9, 0.95, 1.0)
-        c.circle(width/2, height/2, 300, fill=1, stroke=0)
-        
-        # Add school name at top
-        c.setFont('Helvetica-Bold', 16)
-        c.setFillColorRGB(0.6, 0.0, 0.15)  # HCDC maroon color
-        c.drawCentredString(width/2, height-70, "HOLY CROSS OF DAVAO COLLEGE")
-        c.setFont('Helvetica', 11)
-        c.setFillColorRGB(0.4, 0.4, 0.4)
-        c.drawCentredString(width/2, height-88, "Vice President for Academic Affairs")
-        
-        # Add title with shadow effect
-        c.setFont('Helvetica-Bold', 36)
-        c.setFillColorRGB(0.2, 0.4, 0.7)
-        c.drawCentredString(width/2 + 2, height-140 + 2, "CERTIFICATE")
-        c.setFillColorRGB(0.1, 0.2, 0.5)
-        c.drawCentredString(width/2, height-140, "CERTIFICATE")
-        
-        # Add subtitle
-        c.setFont('Helvetica', 14)
-        c.setFillColorRGB(0.3, 0.3, 0.3)
-        c.drawCentredString(width/2, height-180, "OF ACHIEVEMENT")
-        
-        # Add decorative line
-        c.setStrokeColorRGB(0.2, 0.4, 0.7)
-        c.setLineWidth(2)
-        c.line(width/2 - 100, height-200, width/2 + 100, height-200)
-        
-        # Add main content
-        c.setFont('Helvetica', 16)
-        c.setFillColorRGB(0.1, 0.1, 0.1)
-        c.drawCentredString(width/2, height-260, "This is to certify that")
-        
-        # Add name with highlight
-        c.setFont('Helvetica-Bold', 24)
-        c.setFillColorRGB(0.1, 0.3, 0.6)
-        c.drawCentredString(width/2, height-310, self.attendee.full_name.upper())
-        
-        # Add event details
-        c.setFont('Helvetica', 14)
-        c.setFillColorRGB(0.2, 0.2, 0.2)
-        c.drawCentredString(width/2, height-360, "has successfully attended the event:")
-        c.setFont('Helvetica-Bold', 18)
-        c.setFillColorRGB(0.1, 0.3, 0.6)
-        c.drawCentredString(width/2, height-400, f'"{self.event.title}"')
-        
-        # Add inspirational message
-        c.setFont('Helvetica-Oblique', 11)
-        c.setFillColorRGB(0.3, 0.3, 0.3)
-        message_lines = [
-            "Your participation and dedication to learning inspire us all.",
-            "May the knowledge you've gained today empower you to reach new heights",
-            "and make a positive impact in your community and beyond.",
-            "Continue to pursue excellence in all your endeavors!"
-        ]
-        y_position = height - 450
-        for line in message_lines:
-            c.drawCentredString(width/2, y_position, line)
-            y_position -= 18
-        
-        # Add date
-        c.setFont('Helvetica-Oblique', 12)
-        c.setFillColorRGB(0.3, 0.3, 0.3)
-        c.drawCentredString(width/2, 220, f"Date: {self.event.start.strftime('%B %d, %Y')}")
-        
-        # Add signature line
-        c.setLineWidth(1)
-        c.line(width/2 - 100, 160, width/2 + 100, 160)
-        c.setFont('Helvetica', 11)
-        c.drawCentredString(width/2, 140, "Authorized Signature")
-        c.setFont('Helvetica-Bold', 10)
-        c.drawCentredString(width/2, 125, "Holy Cross of Davao College")
-        c.setFont('Helvetica', 9)
-        c.drawCentredString(width/2, 112, "Vice President for Academic Affairs")
-        
-        # Add footer
-        c.setFont('Helvetica', 8)
-        c.setFillColorRGB(0.5, 0.5, 0.5)
-        c.drawCentredString(width/2, 40, f"Certificate ID: {self.id}")
-        c.drawCentredString(width/2, 25, "This certificate is proof of attendance and completion of the event.")
-        
-        # Add watermark
-        c.saveState()
-        c.setFont('Helvetica', 60)
-        c.setFillColorRGB(0.9, 0.9, 0.9)
-        c.rotate(45)
-        c.drawString(300, -200, "VPAA SYSTEM")
-        c.restoreState()
-        
-        c.save()
-        
-        # Rewind buffer to beginning
-        buffer.seek(0)
+        pdf = render_certificate_pdf(self)
         
         # Save the PDF to the certificate field
         filename = f"certificate_{self.attendee.id}_{self.event.id}.pdf"
-        self.certificate.save(filename, ContentFile(buffer.read()), save=False)
-        self.save()
-        buffer.close()
+        self.certificate.save(filename, ContentFile(pdf), save=False)
+        self.set_certificate_metadata(pdf, RENDERER_VERSION)
+        if save:
+            # Only the certificate columns: a check-in or time-out saved while
+            # the PDF was rendering must not be overwritten with stale values
+            self.save(update_fields=self.CERTIFICATE_METADATA_FIELDS)
         
         return True
 
 
+class CertificateJob(models.Model):
+    """Queued certificate render for an attendance, drained by run_certificate_worker."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    attendance = models.OneToOneField(Attendance, on_delete=models.CASCADE, related_name='certificate_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Certificate job for {self.attendance} ({self.get_status_display()})"
+
+
+class OutboundEmail(models.Model):
+    """
+    Outbox row for one email, delivered by run_email_worker.
+
+    Requests only insert rows; the worker sends them in batches and retries
+    failures with exponential backoff. Certificate emails attach the
+    attendance's PDF when they are sent.
+    """
+    KIND_CHOICES = [
+        ('CERTIFICATE', 'Certificate'),
+        ('VERIFICATION', 'Email verification'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    attendance = models.ForeignKey(Attendance, on_delete=models.CASCADE, null=True, blank=True, related_name='emails')
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} email to {self.to_email} ({self.get_status_display()})"
+
+
+class CheckinReceipt(models.Model):
+    """
+    Outcome of a scan uploaded with an idempotency key.
+
+    Scanner devices replay their queue after reconnecting; a scan whose key
+    is already here gets the recorded result back instead of being applied
+    again.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    attendance = models.ForeignKey(Attendance, on_delete=models.SET_NULL, null=True, blank=True, related_name='checkin_receipts')
+    status = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Check-in receipt {self.key} ({self.status})"
+
+
 class Survey(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='surveys')
     title = models.CharField(max_length=255)
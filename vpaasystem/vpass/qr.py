@@ -0,0 +1,94 @@
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+
+from .checkin_tokens import event_token, rotating_token
+
+
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def public_base_url():
+    """Base URL of the frontend that phones open after scanning, from settings (never probed)."""
+    return settings.QR_PUBLIC_BASE_URL.rstrip('/')
+
+
+def checkin_url(event, token=None):
+    """The URL an event's QR code points to, carrying a signed check-in token."""
+    if token is None:
+        token = event_token(event)
+    return f"{public_base_url()}/event/{event.id}/checkin?t={token}"
+
+
+def _make_qr(url):
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr
+
+
+def _svg(qr):
+    """
+    Minimal SVG for a QR matrix: one path, with each run of dark modules in a
+    row merged into a single rectangle. Scales to any projector size.
+    """
+    matrix = qr.get_matrix()
+    size = len(matrix)
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                runs.append(f'M{start},{y}h{x - start}v1h-{x - start}z')
+            else:
+                x += 1
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<path fill="#fff" d="M0,0h{size}v{size}H0z"/>'
+        f'<path d="{"".join(runs)}"/></svg>'
+    ).encode()
+
+
+@lru_cache(maxsize=256)
+def render_qr(event_id, url, output='png'):
+    """
+    Render the QR code for ``url`` as PNG or SVG bytes.
+
+    Cached per process by event and URL, so serving a code again (or
+    rotating back to one) costs a dictionary lookup instead of a render.
+    """
+    qr = _make_qr(url)
+    if output == 'svg':
+        return _svg(qr)
+    buffer = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def event_qr(event, output='png', rotating=False):
+    """
+    Rendered QR code bytes for an event's check-in URL.
+
+    ``rotating`` uses the short-lived token for codes displayed live;
+    otherwise the token lasts for the whole event (printed codes).
+    """
+    token = rotating_token(event) if rotating else None
+    return render_qr(event.id, checkin_url(event, token), output)
+
+
+def save_event_qr_code(event):
+    """Write the event's PNG QR code through the storage layer (not saved to the database)."""
+    from django.core.files.base import ContentFile
+
+    if event.qr_code:
+        event.qr_code.delete(save=False)
+    event.qr_code.save(f'qr_event_{event.id}.png', ContentFile(event_qr(event)), save=False)
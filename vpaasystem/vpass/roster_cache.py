@@ -0,0 +1,129 @@
+"""
+In-process roster cache for live events.
+
+The QR time-in/time-out toggle needs an event's attendees and their state
+on every scan. A roster holds, per event, each attendee's attendance keyed
+by normalized email plus whether the event has an active survey, so a
+repeat scan is answered from memory and costs only its own write.
+
+Rosters are evicted least-recently-used beyond ROSTER_CACHE_EVENTS and
+reloaded after ROSTER_CACHE_TTL seconds. Saves and deletes of attendances,
+surveys and events drop the affected roster (see vpass.signals); the
+check-in fast paths update it in place. Writes made by other processes
+are only picked up on reload, so every write taken on the strength of a
+cached state is conditional and the caller reloads when it matches
+nothing.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+
+from .models import Event, Attendance, Survey, normalize_email
+
+
+class RosterMember:
+    __slots__ = ('attendee_id', 'attendance_id', 'present', 'time_out')
+
+    def __init__(self, attendee_id, attendance_id=None, present=False, time_out=None):
+        self.attendee_id = attendee_id
+        self.attendance_id = attendance_id
+        self.present = present
+        self.time_out = time_out
+
+
+class EventRoster:
+    """
+    ``complete`` is False for events too large to hold: their members are
+    not cached and a missing member says nothing about the database.
+    """
+    __slots__ = ('event_id', 'has_survey', 'members', 'complete', 'expires_at')
+
+    def __init__(self, event_id, has_survey, members, complete, expires_at):
+        self.event_id = event_id
+        self.has_survey = has_survey
+        self.members = members
+        self.complete = complete
+        self.expires_at = expires_at
+
+    def get(self, email):
+        return self.members.get(normalize_email(email))
+
+    def add(self, email, member):
+        if self.complete:
+            self.members[normalize_email(email)] = member
+
+
+_rosters = OrderedDict()
+_lock = threading.Lock()
+# Bumped by every invalidation, so a roster read while one happened is not stored
+_generation = 0
+
+
+def load_roster(event_id):
+    """Read an event's roster (two queries). Returns None if the event does not exist."""
+    has_survey = (Event.objects.filter(id=event_id)
+                  .annotate(has_survey=Exists(Survey.objects.filter(event=OuterRef('pk'), is_active=True)))
+                  .values_list('has_survey', flat=True).first())
+    if has_survey is None:
+        return None
+    limit = settings.ROSTER_CACHE_MAX_MEMBERS
+    rows = list(Attendance.objects.filter(event_id=event_id)
+                .values_list('attendee__email', 'attendee_id', 'id', 'present', 'time_out')[:limit + 1])
+    complete = len(rows) <= limit
+    members = {}
+    if complete:
+        for email, attendee_id, attendance_id, present, time_out in rows:
+            members[normalize_email(email)] = RosterMember(attendee_id, attendance_id, present, time_out)
+    return EventRoster(event_id, has_survey, members, complete, time.monotonic() + settings.ROSTER_CACHE_TTL)
+
+
+def get_roster(event_id):
+    """
+    The cached roster of an event, loading it on a miss or after its TTL.
+
+    Returns None if the event does not exist. Events with more than
+    ROSTER_CACHE_MAX_MEMBERS attendances are cached without members.
+    """
+    now = time.monotonic()
+    with _lock:
+        roster = _rosters.get(event_id)
+        if roster is not None and roster.expires_at > now:
+            _rosters.move_to_end(event_id)
+            return roster
+        generation = _generation
+
+    roster = load_roster(event_id)
+    if roster is None:
+        invalidate_roster(event_id)
+        return None
+    with _lock:
+        if generation != _generation:
+            return roster
+        _rosters[event_id] = roster
+        _rosters.move_to_end(event_id)
+        while len(_rosters) > settings.ROSTER_CACHE_EVENTS:
+            _rosters.popitem(last=False)
+    return roster
+
+
+def cached_roster(event_id):
+    """The roster if it is cached and fresh, without loading it."""
+    with _lock:
+        roster = _rosters.get(event_id)
+    if roster is not None and roster.expires_at > time.monotonic():
+        return roster
+    return None
+
+
+def invalidate_roster(event_id=None):
+    """Drop one event's roster, or every roster when ``event_id`` is None."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if event_id is None:
+            _rosters.clear()
+        else:
+            _rosters.pop(event_id, None)
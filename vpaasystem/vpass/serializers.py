@@ -2,7 +2,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.core.validators import EmailValidator, RegexValidator
 from django.utils import timezone
-from .models import Event, Attendee, Attendance, Survey, SurveyResponse, UserProfile
+from .models import Event, Attendee, Attendance, Survey, SurveyResponse, UserProfile, normalize_email, normalize_student_id
 
 User = get_user_model()
 
@@ -72,6 +72,7 @@ class EventSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
         fields = '__all__'
+        read_only_fields = ['capacity_policy_version', 'present_count']
     
     def validate(self, data):
         # Validate start and end times
@@ -118,6 +119,26 @@ class AttendeeSerializer(serializers.ModelSerializer):
         if len(value.strip()) < 2:
             raise serializers.ValidationError("Full name must be at least 2 characters long")
         return value.strip()
+    
+    def _check_unique(self, field, value, message):
+        # Nested in AttendanceSerializer an existing attendee is reused, not duplicated
+        if self.parent is not None or value is None:
+            return
+        others = Attendee.objects.filter(**{field: value})
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError(message)
+    
+    def validate_email(self, value):
+        value = normalize_email(value)
+        self._check_unique('email', value, "An attendee with this email already exists")
+        return value
+    
+    def validate_student_id(self, value):
+        value = normalize_student_id(value)
+        self._check_unique('student_id', value, "An attendee with this student ID already exists")
+        return value
 
 
 class AttendanceSerializer(serializers.ModelSerializer):
@@ -131,9 +152,18 @@ class AttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ['certificate']
 
     def create(self, validated_data):
+        from .checkin import CheckinError, find_attendee_id, register_attendee
+
         att_data = validated_data.pop('attendee')
-        attendee, _ = Attendee.objects.get_or_create(email=att_data['email'], defaults=att_data)
-        attendance, _ = Attendance.objects.get_or_create(event=validated_data['event'], attendee=attendee)
+        attendee_id = find_attendee_id(att_data['email'])
+        if attendee_id is None:
+            # A student ID or account that belongs to another attendee is a 400, not an IntegrityError
+            try:
+                attendee_id = register_attendee(att_data['email'], att_data['full_name'],
+                                                att_data.get('student_id') or '', att_data.get('user'))
+            except CheckinError as e:
+                raise serializers.ValidationError({'attendee': [e.detail]})
+        attendance, _ = Attendance.objects.get_or_create(event=validated_data['event'], attendee_id=attendee_id)
         
         for k, v in validated_data.items():
             setattr(attendance, k, v)
@@ -1,58 +1,116 @@
-from django.db.models.signals import post_save
+from asgiref.local import Local
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
+from .models import Event, Attendee, Attendance, Survey, SurveyResponse
+from .roster_cache import invalidate_roster
+
+
+# Attendance ids waiting for a completion check. Context-local like Django's
+# own connection handling, so it is safe under both WSGI threads and ASGI.
+_state = Local()
+
+
+def evaluate_completion(attendance_id):
+    """Queue a certificate if the attendance is present, has a survey response and none exists yet."""
+    attendance = (Attendance.objects
+                  .filter(pk=attendance_id, present=True, survey_responses__isnull=False)
+                  .filter(Q(certificate='') | Q(certificate__isnull=True))
+                  .first())
+    if attendance is not None:
+        from .tasks import enqueue_certificate
+        enqueue_certificate(attendance)
 
-def try_generate_certificate(attendance):
-    
-    try:
-        has_present = bool(getattr(attendance, 'present', False))
-    except Exception:
-        has_present = False
 
-    
-    has_survey = False
+def _evaluate_quietly(attendance_id):
     try:
-        manager = getattr(attendance, 'survey_responses', None)
-        if manager is not None:
-            
-            try:
-                has_survey = manager.exists()
-            except Exception:
-               
-                try:
-                    has_survey = len(list(manager.all())) > 0
-                except Exception:
-                    has_survey = False
+        evaluate_completion(attendance_id)
     except Exception:
-        has_survey = False
+        # A failed check must never break the save that triggered it
+        pass
 
-    if has_present and has_survey and not getattr(attendance, 'certificate', None):
-        # Use the PDF generator from the model instead of PNG
-        try:
-            attendance.generate_certificate()
-        except Exception:
-            # If PDF generation fails, silently pass
-            pass
 
+def flush_completion_checks():
+    pending = getattr(_state, 'pending', None)
+    _state.pending = None
+    for attendance_id in pending or ():
+        _evaluate_quietly(attendance_id)
 
-@receiver(post_save)
-def attendance_and_survey_post_save(sender, instance, created, **kwargs):
+
+def schedule_completion_check(attendance_id):
     """
-    This single receiver listens to post_save for any model. We check the
-    instance class name to run certificate generation only for Attendance or
-    SurveyResponse instances.
+    Ask for a completion check of an attendance once its writes are committed.
+
+    During a request, triggers are collected and evaluated once when the
+    request finishes, so several saves touching the same attendance collapse
+    into a single check. Elsewhere (commands, workers) the check runs when
+    the surrounding transaction commits.
     """
-    model_name = sender.__name__ if hasattr(sender, '__name__') else str(sender)
-    
-    if model_name in ('Attendance', 'SurveyResponse'):
-        try:
-            
-            if model_name == 'SurveyResponse':
-                att = getattr(instance, 'attendance', None)
-                if att is not None:
-                    try_generate_certificate(att)
-            else:  
-                try_generate_certificate(instance)
-        except Exception:
-           
-            pass
+    if attendance_id is None:
+        return
+    if not getattr(_state, 'in_request', False):
+        transaction.on_commit(lambda: _evaluate_quietly(attendance_id))
+        return
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        pending = _state.pending = set()
+    pending.add(attendance_id)
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_post_save(sender, instance, **kwargs):
+    invalidate_roster(instance.event_id)
+    schedule_completion_check(instance.pk)
+
+
+# Cached rosters (vpass.roster_cache) follow saves and deletes made through the ORM
+@receiver(post_delete, sender=Attendance)
+@receiver(post_save, sender=Survey)
+@receiver(post_delete, sender=Survey)
+def invalidate_event_roster(sender, instance, **kwargs):
+    invalidate_roster(instance.event_id)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_roster_of_event(sender, instance, **kwargs):
+    invalidate_roster(instance.pk)
+
+
+@receiver(post_save, sender=Attendee)
+def invalidate_rosters_of_attendee(sender, instance, created, update_fields=None, **kwargs):
+    # A new attendee has no attendances yet; an edited one may have a new email
+    if created:
+        return
+    invalidate_roster()
+    if update_fields is None or {'email', 'student_id'} & set(update_fields):
+        # Offline scanners pick the new identity up with the attendances' next delta
+        Attendance.objects.filter(attendee=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_post_delete(sender, instance, **kwargs):
+    from .checkin import require_roster_resync
+    require_roster_resync([instance.event_id])
+
+
+@receiver(post_save, sender=SurveyResponse)
+def survey_response_post_save(sender, instance, **kwargs):
+    schedule_completion_check(instance.attendance_id)
+
+
+# Called by vpass.middleware.CompletionCheckMiddleware around each request
+def start_completion_batch():
+    _state.in_request = True
+    _state.pending = None
+
+
+def finish_completion_batch():
+    # Runs after the view and all of its transactions have finished, on the
+    # request's own connection (request_finished would be too late: Django
+    # may already have closed it)
+    _state.in_request = False
+    flush_completion_checks()
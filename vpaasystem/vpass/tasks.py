@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Attendance, CertificateJob
+
+
+def enqueue_certificate(attendance):
+    """
+    Queue a certificate render for an attendance and return its job.
+
+    Requests only insert (or re-arm) a CertificateJob row; the PDF itself is
+    rendered by the run_certificate_worker command. A job that is already
+    pending or running is left untouched, so repeated polling is cheap.
+    A failed job stays failed: it is retried only through
+    retry_failed_certificates, so CERTIFICATE_JOB_MAX_ATTEMPTS holds.
+    """
+    job, created = CertificateJob.objects.get_or_create(attendance=attendance)
+    if not created and job.status == 'DONE':
+        CertificateJob.objects.filter(pk=job.pk, status=job.status).update(
+            status='PENDING',
+            attempts=0,
+            last_error='',
+            locked_at=None,
+            updated_at=timezone.now(),
+        )
+        job.status = 'PENDING'
+    return job
+
+
+def retry_failed_certificates(jobs=None):
+    """Re-arm failed certificate jobs (all of them by default) and return how many."""
+    if jobs is None:
+        jobs = CertificateJob.objects.all()
+    return jobs.filter(status='FAILED').update(
+        status='PENDING',
+        attempts=0,
+        last_error='',
+        locked_at=None,
+        updated_at=timezone.now(),
+    )
+
+
+def certificate_status(attendance):
+    """Return 'ready', 'pending', 'failed' or 'none' for an attendance's certificate."""
+    if attendance.has_valid_certificate:
+        return 'ready'
+    try:
+        job = attendance.certificate_job
+    except CertificateJob.DoesNotExist:
+        return 'none'
+    if job.status in ('PENDING', 'RUNNING'):
+        return 'pending'
+    if job.status == 'FAILED':
+        return 'failed'
+    return 'none'
+
+
+def claim_certificate_jobs(limit):
+    """
+    Mark up to ``limit`` pending jobs as running and return their ids.
+
+    Each job is claimed with a conditional UPDATE, so several worker
+    commands can poll the same queue without rendering a job twice.
+    """
+    candidates = CertificateJob.objects.filter(status='PENDING').order_by('created_at').values_list('id', flat=True)[:limit]
+    claimed = []
+    for job_id in candidates:
+        updated = CertificateJob.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING',
+            attempts=F('attempts') + 1,
+            locked_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale_jobs(older_than):
+    """Return jobs left running by a killed worker to the queue."""
+    cutoff = timezone.now() - older_than
+    return CertificateJob.objects.filter(status='RUNNING', locked_at__lt=cutoff).update(
+        status='PENDING',
+        locked_at=None,
+        updated_at=timezone.now(),
+    )
+
+
+def run_certificate_job(job_id):
+    """Render the certificate for a claimed job. Returns (job_id, succeeded, error)."""
+    max_attempts = getattr(settings, 'CERTIFICATE_JOB_MAX_ATTEMPTS', 3)
+
+    try:
+        job = CertificateJob.objects.select_related('attendance__attendee', 'attendance__event').get(pk=job_id)
+    except CertificateJob.DoesNotExist:
+        return job_id, False, 'Job no longer exists'
+
+    attendance = job.attendance
+    error = ''
+    try:
+        if attendance.has_valid_certificate:
+            succeeded = True
+        else:
+            succeeded = attendance.generate_certificate()
+            if not succeeded:
+                error = 'Attendee is not marked present'
+    except Exception as e:
+        succeeded = False
+        error = str(e)
+
+    if succeeded:
+        status = 'DONE'
+    elif job.attempts >= max_attempts or not attendance.present:
+        status = 'FAILED'
+    else:
+        status = 'PENDING'
+
+    CertificateJob.objects.filter(pk=job.pk).update(
+        status=status,
+        last_error=error,
+        locked_at=None,
+        updated_at=timezone.now(),
+    )
+    return job_id, succeeded, error
+
+
+def generate_certificates_for_ids(attendance_ids):
+    """
+    Render certificates for a chunk of attendances and store them in one bulk update.
+
+    Returns (generated, failures) where failures is a list of (id, error).
+    """
+    attendances = Attendance.objects.filter(id__in=attendance_ids).select_related('attendee', 'event')
+    generated = []
+    failures = []
+    replaced = []
+    for attendance in attendances:
+        old_name = attendance.certificate.name if attendance.certificate else None
+        try:
+            if attendance.generate_certificate(save=False):
+                generated.append(attendance)
+                if old_name and old_name != attendance.certificate.name:
+                    replaced.append(old_name)
+            else:
+                failures.append((attendance.id, 'Attendee is not marked present'))
+        except Exception as e:
+            failures.append((attendance.id, str(e)))
+
+    try:
+        Attendance.objects.bulk_update(generated, Attendance.CERTIFICATE_METADATA_FIELDS)
+    except Exception:
+        # Rows still point at the old files; don't leave the new ones behind
+        for attendance in generated:
+            default_storage.delete(attendance.certificate.name)
+        raise
+    # Old files are only removed once the new names are stored
+    for name in replaced:
+        default_storage.delete(name)
+    CertificateJob.objects.filter(attendance__in=generated, status='PENDING').update(
+        status='DONE',
+        updated_at=timezone.now(),
+    )
+    return len(generated), failures
+
@@ -1,3 +1,517 @@
-from django.test import TestCase
+import os
+import re
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from smtplib import SMTPException
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from reportlab.pdfgen import canvas
+
+from . import checkin_journal
+from .certificates import CERTIFICATE_TEMPLATES, TextOp, compile_base_layer, compile_template
+from .checkin import encode_sync_cursor, reserve_seat
+from .checkin_tokens import rotating_token
+from .db_router import REPLICA_ALIAS, ReplicaRouter, replica_reads
+from .emails import claim_emails, deliver, queue_verification_email
+from .models import Event, Attendee, Attendance, OutboundEmail
+
+
+@skipUnless(REPLICA_ALIAS in settings.DATABASES, 'needs --settings=vpaasystem.settings_test')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    settings_test mirrors default into the replica alias, so both see the same rows;
+    queries are told apart by the connection that ran them. A
+    TransactionTestCase commits the setup rows so the replica connection can
+    read them.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(title='Graduation', start=now - timedelta(days=1), end=now + timedelta(hours=2))
+        self.attendee = Attendee.objects.create(full_name='Ana Cruz', email='ana@example.com', student_id='S-1')
+        Attendance.objects.create(event=self.event, attendee=self.attendee, present=True)
+
+    def get_by_alias(self, url):
+        """GET ``url`` and return (response, queries on default, queries on the replica)."""
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            response = self.client.get(url)
+        return response, len(default), len(replica)
+
+    def test_decorated_actions_read_from_replica(self):
+        for url in ['/api/events/analytics/', '/api/events/stats/',
+                    f'/api/events/{self.event.id}/export_attendance/',
+                    f'/api/attendances/analytics/?event_id={self.event.id}']:
+            with self.subTest(url=url):
+                response, on_default, on_replica = self.get_by_alias(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(on_replica, 0)
+                self.assertEqual(on_default, 0)
+
+    def test_undecorated_views_read_from_default(self):
+        for url in ['/api/events/', f'/api/events/{self.event.id}/', '/api/attendances/']:
+            with self.subTest(url=url):
+                response, on_default, on_replica = self.get_by_alias(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(on_default, 0)
+                self.assertEqual(on_replica, 0)
+
+    def test_writes_use_default(self):
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Event), REPLICA_ALIAS)
+            self.assertEqual(router.db_for_write(Event), 'default')
+        self.assertEqual(router.db_for_read(Event), 'default')
+
+        with CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            response = self.client.post('/api/checkin/', {
+                'event_id': self.event.id,
+                'email': 'ben@example.com',
+                'full_name': 'Ben Reyes',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(replica), 0)
+        self.assertTrue(Attendance.objects.using('default').filter(attendee__email='ben@example.com').exists())
+
+    def test_replica_is_not_migrated(self):
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, 'vpass', model_name='event'))
+        self.assertTrue(router.allow_migrate('default', 'vpass', model_name='event'))
+
+    def test_events_by_month_are_year_month_strings(self):
+        response = self.client.get('/api/events/analytics/')
+        self.assertEqual(response.status_code, 200)
+        months = response.json()['events_by_month']
+        self.assertEqual(len(months), 1)
+        for row in months:
+            self.assertRegex(row['month'], re.compile(r'^\d{4}-\d{2}$'))
+            self.assertEqual(row['count'], 1)
+
+
+class CheckinNonceTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(title='Orientation', start=now - timedelta(hours=1), end=now + timedelta(hours=2))
+
+    def start_session(self):
+        response = self.client.post('/api/checkin/session/', {
+            'event_id': self.event.id, 'token': rotating_token(self.event),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['nonce']
+
+    def time_in(self, email, **credential):
+        return self.client.post('/api/attendances/time_in/', dict({
+            'event_id': self.event.id, 'attendee': {'full_name': 'Slow Typer', 'email': email},
+        }, **credential), content_type='application/json')
+
+    def test_nonce_outlasts_the_rotating_token(self):
+        token = rotating_token(self.event)
+        nonce = self.start_session()
+        with mock.patch('time.time', return_value=time.time() + 65):
+            self.assertEqual(self.time_in('slow@example.com', token=token).json()['reason'], 'expired')
+            self.assertEqual(self.time_in('slow@example.com', nonce=nonce).status_code, 201)
+
+    def test_nonce_is_single_use(self):
+        nonce = self.start_session()
+        self.assertEqual(self.time_in('first@example.com', nonce=nonce).status_code, 201)
+        self.assertEqual(self.time_in('second@example.com', nonce=nonce).status_code, 403)
+        self.assertFalse(Attendee.objects.filter(email='second@example.com').exists())
+
+    def test_failed_check_in_keeps_the_nonce(self):
+        Attendee.objects.create(full_name='Ana Cruz', email='ana@example.com', student_id='S-1')
+        nonce = self.start_session()
+        response = self.client.post('/api/attendances/time_in/', {
+            'event_id': self.event.id, 'nonce': nonce,
+            'attendee': {'full_name': 'Ben Reyes', 'email': 'ben@example.com', 'student_id': 'S-1'},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.time_in('ben@example.com', nonce=nonce).status_code, 201)
+
+    def test_expired_token_gets_no_nonce(self):
+        with mock.patch('time.time', return_value=time.time() - 120):
+            token = rotating_token(self.event)
+        response = self.client.post('/api/checkin/session/', {'event_id': self.event.id, 'token': token},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class CheckinBatchTokenTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(title='Orientation', start=now - timedelta(hours=1), end=now + timedelta(hours=2))
+        Attendee.objects.create(full_name='Ana Cruz', email='ana@example.com', student_id='S-1')
+
+    def upload(self, token, scanned_at):
+        response = self.client.post('/api/checkin/batch/', {'scans': [{
+            'event_id': self.event.id, 'email': 'ana@example.com',
+            'token': token, 'scanned_at': scanned_at.isoformat(),
+        }]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]
+
+    def test_backdated_scan_cannot_replay_an_expired_token(self):
+        # A screenshot taken two minutes ago, uploaded with its original time
+        with mock.patch('time.time', return_value=time.time() - 120):
+            token = rotating_token(self.event)
+        result = self.upload(token, timezone.now() - timedelta(seconds=110))
+        self.assertEqual(result['status'], 'invalid_token')
+        self.assertEqual(result['reason'], 'expired')
+        self.assertFalse(Attendance.objects.filter(event=self.event).exists())
+
+    def test_live_token_keeps_the_scan_time(self):
+        scanned_at = timezone.now() - timedelta(seconds=5)
+        result = self.upload(rotating_token(self.event), scanned_at)
+        self.assertEqual(result['status'], 'checked_in')
+        self.assertEqual(Attendance.objects.get(pk=result['attendance']).timestamp, scanned_at)
+
+
+class CertificateBaseLayerTests(SimpleTestCase):
+    @staticmethod
+    def fonts_used(c):
+        """Fonts named by the Tf operators drawn on ``c`` so far, resolved through its document."""
+        fonts = {internal: name for name, internal in c._doc.fontMapping.items()}
+        return {fonts[internal] for internal in re.findall(r'(/F\d+) [\d.]+ Tf', '\n'.join(c._code))}
+
+    def test_base_layer_keeps_its_fonts_after_other_fonts(self):
+        for template in CERTIFICATE_TEMPLATES:
+            with self.subTest(template=template):
+                plan = compile_template(template)
+                expected = {op.font for op in plan.base_ops if isinstance(op, TextOp)} | {'Helvetica'}
+                c = canvas.Canvas(BytesIO(), pagesize=plan.pagesize)
+                # Another template's page registered its fonts first
+                c.setFont('Courier-BoldOblique', 10)
+                c._code.clear()
+                compile_base_layer(template, 'Graduation', 'June 01, 2026').draw(c)
+                self.assertLessEqual(self.fonts_used(c), expected)
+
+    def test_single_certificate_replays_the_layer(self):
+        plan = compile_template('default')
+        c = canvas.Canvas(BytesIO(), pagesize=plan.pagesize)
+        layer = compile_base_layer('default', 'Graduation', 'June 01, 2026')
+        layer.draw(c)
+        self.assertIn(layer.code, c._code)
+
+
+class GenerateCertificateTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        now = timezone.now()
+        event = Event.objects.create(title='Graduation', start=now - timedelta(hours=1), end=now + timedelta(hours=2))
+        attendee = Attendee.objects.create(full_name='Ana Cruz', email='ana@example.com', student_id='S-1')
+        self.attendance = Attendance.objects.create(event=event, attendee=attendee, present=True)
+
+    def test_saving_the_certificate_keeps_concurrent_changes(self):
+        attendance = Attendance.objects.select_related('event', 'attendee').get(pk=self.attendance.pk)
+        # Timed out by another request while this one renders the PDF
+        time_out = timezone.now()
+        Attendance.objects.filter(pk=attendance.pk).update(time_out=time_out)
+
+        self.assertTrue(attendance.generate_certificate())
+        stored = Attendance.objects.get(pk=attendance.pk)
+        self.assertEqual(stored.time_out, time_out)
+        self.assertTrue(stored.has_valid_certificate)
+        self.assertEqual(stored.certificate_sha256, attendance.certificate_sha256)
+
+
+class RosterSyncTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(title='Graduation', start=now - timedelta(hours=1), end=now + timedelta(hours=2))
+        self.ana = Attendee.objects.create(full_name='Ana Cruz', email='ana@example.com', student_id='S-1')
+        self.ben = Attendee.objects.create(full_name='Ben Reyes', email='ben@example.com', student_id='S-2')
+        for attendee in (self.ana, self.ben):
+            Attendance.objects.create(event=self.event, attendee=attendee, present=True)
+        # The scanner last synced a minute ago, after these rows last changed
+        Attendance.objects.update(updated_at=now - timedelta(minutes=2))
+        self.cursor = encode_sync_cursor(now - timedelta(minutes=1))
+
+    def sync(self):
+        response = self.client.get(f'/api/events/{self.event.id}/sync/', {'cursor': self.cursor})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['full'], {row[0]: row for row in data['rows']}
+
+    def test_unchanged_roster_sends_nothing(self):
+        self.assertEqual(self.sync(), (False, {}))
+
+    def test_deleted_attendance_forces_full_sync(self):
+        Attendance.objects.get(attendee=self.ben).delete()
+        full, rows = self.sync()
+        self.assertTrue(full)
+        self.assertEqual(set(rows), {self.ana.id})
+
+    def test_identity_edit_is_in_the_delta(self):
+        self.ben.email = 'ben.reyes@example.com'
+        self.ben.student_id = 'S-22'
+        self.ben.save()
+        full, rows = self.sync()
+        self.assertFalse(full)
+        self.assertEqual(set(rows), {self.ben.id})
+        self.assertEqual(rows[self.ben.id][1:3], ['ben.reyes@example.com', 'S-22'])
+
+    def test_merge_forces_full_sync(self):
+        # A duplicate from before emails were normalized
+        duplicate = Attendee.objects.create(full_name='Ben Reyes', email='ben.dup@example.com')
+        Attendee.objects.filter(pk=duplicate.pk).update(email='BEN@example.com')
+        other = Event.objects.create(title='Orientation', start=self.event.start, end=self.event.end)
+        Attendance.objects.create(event=other, attendee=duplicate, present=True)
+        Attendance.objects.create(event=self.event, attendee=duplicate, present=False)
+        Event.objects.update(roster_reset_at=None)
+
+        call_command('merge_duplicate_attendees', stdout=StringIO())
+        full, rows = self.sync()
+        self.assertTrue(full)
+        survivor = Attendee.objects.get(email='ben@example.com')
+        self.assertEqual(set(rows), {self.ana.id, survivor.id})
+        self.assertEqual(rows[survivor.id][1:4], ['ben@example.com', 'S-2', True])
+        self.assertTrue(Event.objects.get(pk=other.pk).roster_reset_at)
+
+
+class CheckinJournalTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(CHECKIN_JOURNAL_DIR=directory.name, CHECKIN_JOURNAL_FSYNC=False))
+        self.directory = checkin_journal.journal_dir()
+
+    def test_pending_index_reads_only_new_lines(self):
+        first = checkin_journal.append_scan(1, 'ana@example.com', 10)
+        second = checkin_journal.append_scan(1, 'ben@example.com', 11)
+        self.assertEqual(checkin_journal.pending_scan(key=first)['email'], 'ana@example.com')
+        self.assertEqual(checkin_journal.pending_scan(event_id=1, email='ben@example.com')['idempotency_key'], second)
+
+        with mock.patch.object(checkin_journal, '_read_entries', wraps=checkin_journal._read_entries) as read:
+            checkin_journal.pending_scan(key=first)
+        (path, start), = [call.args for call in read.call_args_list]
+        self.assertEqual(start, path.stat().st_size)
+
+        checkin_journal.mark_flushed(checkin_journal.unflushed_entries(limit=1))
+        self.assertIsNone(checkin_journal.pending_scan(key=first))
+        self.assertIsNone(checkin_journal.pending_scan(event_id=1, email='ana@example.com'))
+        self.assertIsNotNone(checkin_journal.pending_scan(key=second))
+
+    def test_torn_closed_segment_is_quarantined_and_retired(self):
+        name = checkin_journal._segment_name(time.time() - 3600)
+        path = self.directory / name
+        path.write_bytes(b'{"idempotency_key":"journal-1","event_id":1,"email":"ana@example.com"}\n{"idempot')
+        old = time.time() - 600
+        os.utime(path, (old, old))
+
+        with self.assertLogs('vpass.checkin_journal', 'WARNING'):
+            self.assertEqual(checkin_journal.quarantine_torn_segments(), [name])
+        self.assertEqual((self.directory / f'{name}.torn').read_bytes(), b'{"idempot\n')
+        entries = checkin_journal.unflushed_entries()
+        self.assertEqual([entry['idempotency_key'] for _, _, entry in entries], ['journal-1'])
+
+        os.utime(path, (old, old))
+        checkin_journal.mark_flushed(entries)
+        self.assertFalse(path.exists())
+
+
+class EmailDeliveryTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name, EMAIL_SEND_RATE=0,
+                                            EMAIL_RETRY_BACKOFF=60, EMAIL_MAX_ATTEMPTS=3))
+        now = timezone.now()
+        self.event = Event.objects.create(title='Graduation', start=now - timedelta(hours=2), end=now - timedelta(hours=1))
+
+    def approved_attendance(self, email):
+        attendee = Attendee.objects.create(full_name=email.split('@')[0].title(), email=email)
+        attendance = Attendance.objects.create(event=self.event, attendee=attendee, present=True,
+                                               certificate_approved=True)
+        attendance.generate_certificate()
+        return attendance
+
+    def send_event_certificates(self):
+        with mock.patch('vpass.management.commands.email_event_certificates.get_connection',
+                        wraps=mail.get_connection) as command_connection, \
+                mock.patch('vpass.emails.get_connection') as batch_connection:
+            call_command('email_event_certificates', '--event', str(self.event.id), '--batch-size', '2',
+                         stdout=StringIO())
+        self.assertEqual(command_connection.call_count, 1)
+        batch_connection.assert_not_called()
+
+    def test_event_certificates_go_over_one_connection(self):
+        for email in ('ana@example.com', 'ben@example.com', 'cora@example.com'):
+            self.approved_attendance(email)
+        self.send_event_certificates()
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['ana@example.com', 'ben@example.com', 'cora@example.com'])
+        for message in mail.outbox:
+            self.assertEqual(message.subject, 'Certificate for Graduation')
+            (name, content, mimetype), = message.attachments
+            self.assertEqual((name, mimetype), ('certificate.pdf', 'application/pdf'))
+            self.assertTrue(content.startswith(b'%PDF'))
+        self.assertEqual(set(OutboundEmail.objects.values_list('status', 'attempts')), {('SENT', 1)})
+
+    def test_sent_certificates_are_not_resent(self):
+        self.approved_attendance('ana@example.com')
+        self.send_event_certificates()
+        self.send_event_certificates()
+        call_command('run_email_worker', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        outbound = queue_verification_email(mock.Mock(email='ana@example.com'), 'https://example.com/verify')
+        connection = mail.get_connection()
+        with mock.patch.object(connection, 'send_messages', side_effect=SMTPException('421 try again later')):
+            for attempt, delay in ((1, 60), (2, 120)):
+                before = timezone.now()
+                deliver(claim_emails(10), connection=connection)
+                outbound.refresh_from_db()
+                self.assertEqual((outbound.status, outbound.attempts), ('PENDING', attempt))
+                self.assertEqual(outbound.last_error, '421 try again later')
+                self.assertGreaterEqual(outbound.next_attempt_at, before + timedelta(seconds=delay))
+                self.assertLess(outbound.next_attempt_at, timezone.now() + timedelta(seconds=delay))
+                # Not due yet, so nothing is claimed before the backoff ends
+                self.assertEqual(claim_emails(10), [])
+                OutboundEmail.objects.filter(pk=outbound.pk).update(next_attempt_at=timezone.now())
+
+            deliver(claim_emails(10), connection=connection)
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.attempts), ('FAILED', 3))
+        call_command('run_email_worker', '--once', stdout=StringIO())
+        self.assertEqual(mail.outbox, [])
+
+    def test_retry_after_backoff_is_sent_once(self):
+        outbound = queue_verification_email(mock.Mock(email='ana@example.com'), 'https://example.com/verify')
+        OutboundEmail.objects.filter(pk=outbound.pk).update(attempts=1, last_error='421 try again later')
+        call_command('run_email_worker', '--once', stdout=StringIO())
+        call_command('run_email_worker', '--once', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, 'Click this link to verify your email: https://example.com/verify')
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.attempts, outbound.last_error), ('SENT', 2, ''))
+        self.assertIsNotNone(outbound.sent_at)
+
+
+class CapacityTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(title='Seminar', start=now - timedelta(hours=1), end=now + timedelta(hours=2),
+                                          max_capacity=2)
+
+    def check_in(self, email):
+        return self.client.post('/api/checkin/', {
+            'event_id': self.event.id, 'email': email, 'full_name': email.split('@')[0].title(),
+        }, content_type='application/json')
+
+    def present_count(self):
+        self.event.refresh_from_db(fields=['present_count'])
+        return self.event.present_count
+
+    def test_full_event_rejects_the_next_attendee(self):
+        self.assertEqual(self.check_in('ana@example.com').status_code, 200)
+        self.assertEqual(self.check_in('ben@example.com').status_code, 200)
+        self.assertEqual(self.present_count(), 2)
+
+        response = self.check_in('cora@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], 'Event is full! Maximum capacity: 2')
+        self.assertEqual(self.present_count(), 2)
+        self.assertFalse(Attendance.objects.filter(attendee__email='cora@example.com', present=True).exists())
+
+    def test_duplicate_scan_takes_no_seat(self):
+        self.assertEqual(self.check_in('ana@example.com').status_code, 200)
+        self.assertEqual(self.check_in('ana@example.com').status_code, 200)
+        self.assertEqual(self.present_count(), 1)
+        self.assertEqual(Attendance.objects.filter(event=self.event).count(), 1)
+        # The seat left is still there for someone else
+        self.assertEqual(self.check_in('ben@example.com').status_code, 200)
+
+    def test_reserve_seat_stops_at_the_limit(self):
+        self.assertTrue(reserve_seat(self.event.id))
+        self.assertFalse(reserve_seat(self.event.id, policy_version=self.event.capacity_policy_version + 1))
+        self.assertTrue(reserve_seat(self.event.id, policy_version=self.event.capacity_policy_version))
+        self.assertFalse(reserve_seat(self.event.id))
+        self.assertEqual(self.present_count(), 2)
+
+    def test_reconcile_repairs_a_drifted_counter(self):
+        self.check_in('ana@example.com')
+        Event.objects.filter(pk=self.event.pk).update(present_count=2)
+        call_command('reconcile_present_counts', stdout=StringIO())
+        self.assertEqual(self.present_count(), 1)
+
+
+class BatchCheckinTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(title='Seminar', start=now - timedelta(hours=1), end=now + timedelta(hours=2),
+                                          max_capacity=2)
+        self.ana = Attendee.objects.create(full_name='Ana Cruz', email='ana@example.com', student_id='S-1')
+        self.ben = Attendee.objects.create(full_name='Ben Reyes', email='ben@example.com', student_id='S-2')
+        self.cora = Attendee.objects.create(full_name='Cora Lim', email='cora@example.com')
+
+    def upload(self, *scans):
+        response = self.client.post('/api/checkin/batch/', {
+            'scans': [dict(scan, event_id=self.event.id) for scan in scans],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def present_count(self):
+        self.event.refresh_from_db(fields=['present_count'])
+        return self.event.present_count
+
+    def test_duplicate_scans_check_in_once(self):
+        results = self.upload({'email': 'ana@example.com'}, {'student_id': 's-1'})
+        self.assertEqual([result['status'] for result in results], ['checked_in', 'already_present'])
+        results = self.upload({'email': 'ANA@example.com'})
+        self.assertEqual(results[0]['status'], 'already_present')
+        self.assertEqual(Attendance.objects.filter(event=self.event).count(), 1)
+        self.assertEqual(self.present_count(), 1)
+
+    def test_replayed_upload_is_not_applied_again(self):
+        scans = [{'email': 'ana@example.com', 'idempotency_key': 'device-1-0001'},
+                 {'email': 'nobody@example.com', 'idempotency_key': 'device-1-0002'}]
+        first = self.upload(*scans)
+        self.assertEqual([result['status'] for result in first], ['checked_in', 'unknown_attendee'])
+
+        # The device never saw the response and sends the same scans again
+        replay = self.upload(*scans)
+        self.assertEqual((replay[0]['status'], replay[0]['attendance']), ('checked_in', first[0]['attendance']))
+        self.assertTrue(replay[0]['replayed'])
+        self.assertEqual(replay[1]['status'], 'unknown_attendee')
+        self.assertEqual(self.present_count(), 1)
+
+    def test_upsert_marks_an_existing_row_present(self):
+        absent = Attendance.objects.create(event=self.event, attendee=self.ana, present=False,
+                                           certificate_reviewed=True)
+        results = self.upload({'email': 'ana@example.com'}, {'email': 'ben@example.com'})
+        self.assertEqual([result['status'] for result in results], ['checked_in', 'checked_in'])
+
+        rows = {row.attendee_id: row for row in Attendance.objects.filter(event=self.event)}
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[self.ana.id].pk, absent.pk)
+        self.assertTrue(rows[self.ana.id].present)
+        # Only present and updated_at are overwritten by the upsert
+        self.assertTrue(rows[self.ana.id].certificate_reviewed)
+        self.assertGreater(rows[self.ana.id].updated_at, absent.updated_at)
+        self.assertEqual(self.present_count(), 2)
+
+    def test_earliest_scans_get_the_last_seats(self):
+        now = timezone.now()
+        results = self.upload(
+            {'email': 'cora@example.com', 'scanned_at': (now - timedelta(seconds=10)).isoformat()},
+            {'email': 'ben@example.com', 'scanned_at': (now - timedelta(seconds=30)).isoformat()},
+            {'email': 'ana@example.com', 'scanned_at': (now - timedelta(seconds=20)).isoformat()},
+        )
+        self.assertEqual([result['status'] for result in results], ['full', 'checked_in', 'checked_in'])
+        self.assertEqual(self.present_count(), 2)
@@ -18,6 +18,10 @@ urlpatterns = [
     path('auth/register/', views.RegisterView.as_view(), name='register'),
     path('auth/login/', views.LoginView.as_view(), name='login'),
     path('auth/verify-email/<str:token>/', views.VerifyEmailView.as_view(), name='verify_email'),
+    path('checkin/', views.CheckInView.as_view(), name='checkin'),
+    path('checkin/batch/', views.CheckInBatchView.as_view(), name='checkin_batch'),
+    path('checkin/status/', views.CheckInStatusView.as_view(), name='checkin_status'),
+    path('checkin/session/', views.CheckInSessionView.as_view(), name='checkin_session'),
     
 
 ]
\ No newline at end of file
@@ -1,77 +1,151 @@
 from django.core.files.base import ContentFile
-import os
 
 
 def generate_certificate_image(attendance, template_text=None):
     """
-    Generate a simple certificate image using PIL and return a Django ContentFile ready to save.
+    Generate a certificate image and return a Django ContentFile ready to save.
 
-    This function does **not** access Django settings at import time. It resolves
-    font paths relative to this file and performs local imports for Pillow/io so
-    importing the module is safe in lightweight/test environments.
+    The image is drawn from the same compiled template plan as the PDF
+    certificate (see vpass.certificates), so both formats share one layout.
     """
-    
-    import io
-    from PIL import Image, ImageDraw, ImageFont
+    from .certificates import render_certificate_png
 
-    
-    width, height = 1200, 850
-    image = Image.new('RGB', (width, height), color=(255, 255, 255))
-    draw = ImageDraw.Draw(image)
+    content = render_certificate_png(attendance, extra_text=template_text)
+    fname = f'certificate_{getattr(attendance, "id", "temp")}.png'
+    return ContentFile(content, name=fname)
+
+
+def generate_certificate_images(attendances, template_text=None):
+    """Batch version of generate_certificate_image(); yields (attendance, ContentFile) pairs."""
+    from .certificates import render_certificate_pngs
+
+    for attendance, content in render_certificate_pngs(attendances, extra_text=template_text):
+        yield attendance, ContentFile(content, name=f'certificate_{getattr(attendance, "id", "temp")}.png')
+
+
+class _ZipStreamBuffer:
+    """Write-only file object that hands whatever zipfile wrote back to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries, chunk_size=64 * 1024):
+    """
+    Yield a ZIP archive built from ``entries`` piece by piece.
+
+    ``entries`` is an iterable of (archive_name, open_callable) pairs; each
+    callable returns a binary file object. Files are copied in ``chunk_size``
+    blocks and stored uncompressed (certificates are already compressed
+    PDFs), so memory use stays flat however many files the archive holds.
+    Entries whose file cannot be opened are skipped.
+    """
+    import zipfile
+
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for archive_name, open_file in entries:
+            try:
+                source = open_file()
+            except OSError:
+                continue
+            with source, archive.open(archive_name, mode='w') as target:
+                while True:
+                    block = source.read(chunk_size)
+                    if not block:
+                        break
+                    target.write(block)
+                    yield buffer.pop()
+            yield buffer.pop()
+    yield buffer.pop()
 
-    
+
+def _parse_range(header, size):
+    """Parse a single 'bytes=start-end' range. Returns (start, end), None to ignore, or False if unsatisfiable."""
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, _, end = header[len('bytes='):].strip().partition('-')
     try:
-        app_dir = os.path.dirname(__file__)
-        font_path = os.path.join(app_dir, '..', 'fonts', 'OpenSans-Bold.ttf')
-        
-        font_path = os.path.abspath(font_path)
-        if os.path.exists(font_path):
-            title_font = ImageFont.truetype(font_path, 48)
-            name_font = ImageFont.truetype(font_path, 60)
-            body_font = ImageFont.truetype(font_path, 28)
+        if start == '':
+            length = int(end)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def file_download_response(request, field_file, filename, size=None, etag=None, content_type='application/octet-stream'):
+    """
+    Serve a stored file as a download with ETag, byte-range and X-Sendfile support.
+
+    ``size`` and ``etag`` should come from recorded metadata so the file does
+    not have to be stat'ed. When settings.SENDFILE_BACKEND is
+    'x-accel-redirect' or 'x-sendfile' only headers are returned and the
+    front web server sends the bytes (and handles ranges itself).
+    Raises FileNotFoundError if the file is gone.
+    """
+    from django.conf import settings
+    from django.http import FileResponse, HttpResponse
+
+    backend = getattr(settings, 'SENDFILE_BACKEND', None)
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = getattr(settings, 'SENDFILE_URL_PREFIX', '/protected/') + field_file.name
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = field_file.path
+    else:
+        if size is None:
+            size = field_file.size
+
+        byte_range = None
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if size and (not if_range or if_range == etag):
+            byte_range = _parse_range(request.META.get('HTTP_RANGE'), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        source = field_file.storage.open(field_file.name, 'rb')
+        if byte_range:
+            start, end = byte_range
+            with source:
+                source.seek(start)
+                response = HttpResponse(source.read(end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
         else:
-            raise FileNotFoundError
-    except Exception:
-        title_font = ImageFont.load_default()
-        name_font = ImageFont.load_default()
-        body_font = ImageFont.load_default()
-
-    
-    draw.text((60, 60), "Certificate of Attendance", font=title_font, fill=(0, 0, 0))
-
-    
-    name_text = getattr(attendance.attendee, 'full_name', str(attendance.attendee))
-   
-    bbox = draw.textbbox((0, 0), name_text, font=name_font)
-    w = bbox[2] - bbox[0]
-    draw.text(((width - w) / 2, 250), name_text, font=name_font, fill=(0, 0, 128))
-
-    
-    ev_title = getattr(attendance.event, 'title', str(attendance.event))
-    ev_text = f"has attended the event: {ev_title}"
-    bbox2 = draw.textbbox((0, 0), ev_text, font=body_font)
-    w2 = bbox2[2] - bbox2[0]
-    draw.text(((width - w2) / 2, 350), ev_text, font=body_font, fill=(0, 0, 0))
-
-    date_text = ''
-    try:
-        date_text = attendance.timestamp.strftime('%B %d, %Y')
-    except Exception:
-        date_text = ''
-
-    if date_text:
-        bbox_date = draw.textbbox((0, 0), date_text, font=body_font)
-        w_date = bbox_date[2] - bbox_date[0]
-        draw.text(((width - w_date) / 2, 400), date_text, font=body_font)
-
-    
-    if template_text:
-        draw.text((60, 480), template_text, font=body_font)
-
-   
-    buffer = io.BytesIO()
-    image.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    fname = f'certificate_{getattr(attendance, "id", "temp")}.png'
-    return ContentFile(buffer.read(), name=fname)
\ No newline at end of file
+            response = FileResponse(source, content_type=content_type)
+            response['Content-Length'] = size
+        response['Accept-Ranges'] = 'bytes'
+
+    if etag:
+        response['ETag'] = etag
+    # Let browsers keep the file but revalidate it with If-None-Match
+    response['Cache-Control'] = 'private, no-cache'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -6,14 +6,59 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Event, Attendee, Attendance, Survey, SurveyResponse, UserProfile
 from .serializers import EventSerializer, AttendeeSerializer, AttendanceSerializer, SurveySerializer, SurveyResponseSerializer, UserProfileSerializer
+from .tasks import enqueue_certificate, certificate_status
+from .checkin_tokens import InvalidCheckinToken, issue_nonce, verify_nonce, verify_token
+from .utils import file_download_response
+from .db_router import reads_from_replica
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
 
 User = get_user_model()
 
+
+def checkin_token_response(e):
+    """403 Response for an InvalidCheckinToken."""
+    messages = {
+        'expired': 'This QR code has expired. Please scan the code currently displayed.',
+        'not_yet_valid': 'Check-in for this event has not opened yet',
+        'wrong_event': 'This QR code belongs to a different event',
+    }
+    return Response({'detail': messages.get(e.reason, 'Invalid QR code'), 'reason': e.reason},
+                    status=status.HTTP_403_FORBIDDEN)
+
+
+def verify_checkin_token(request, event_id):
+    """
+    Validate the signed QR token, or the check-in page's nonce, sent with a
+    check-in, before any database read.
+
+    Returns (token, error): the verified CheckinToken or CheckinNonce (None
+    if neither was sent and QR_REQUIRE_CHECKIN_TOKEN is off) and an error
+    Response or None. A nonce is only good for one check-in: wrap the
+    check-in in vpass.checkin.consuming_nonce.
+    """
+    from django.conf import settings
+
+    token = request.data.get('token')
+    nonce = request.data.get('nonce')
+    if not token and not nonce:
+        if settings.QR_REQUIRE_CHECKIN_TOKEN:
+            return None, Response({'detail': 'Please scan the event QR code to check in', 'reason': 'missing_token'},
+                                  status=status.HTTP_403_FORBIDDEN)
+        return None, None
+    try:
+        if nonce:
+            return verify_nonce(nonce, event_id=event_id), None
+        return verify_token(token, event_id=event_id), None
+    except InvalidCheckinToken as e:
+        return None, checkin_token_response(e)
+
+
 class RegisterView(APIView):
     """
     User Registration Endpoint
@@ -29,7 +74,7 @@ class RegisterView(APIView):
     )
     def post(self, request):
         import uuid
-        from django.core.mail import send_mail
+        from .emails import queue_verification_email
         
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
@@ -40,18 +85,10 @@ class RegisterView(APIView):
             profile.verification_token = str(uuid.uuid4())
             profile.save()
             
-            # Send verification email
+            # Queue verification email (delivered by run_email_worker)
             verification_link = f"http://localhost:8000/api/auth/verify-email/{profile.verification_token}/"
-            try:
-                send_mail(
-                    'Verify Your Email - HCDC Event System',
-                    f'Click this link to verify your email: {verification_link}',
-                    'noreply@hcdc.edu.ph',
-                    [user.email],
-                    fail_silently=True,
-                )
-            except:
-                pass
+            if user.email:
+                queue_verification_email(user, verification_link)
             
             # Generate token
             refresh = RefreshToken.for_user(user)
@@ -147,6 +184,240 @@ class LoginView(APIView):
         
         return Response({'detail': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
+class CheckInView(APIView):
+    """
+    QR Check-in Endpoint
+
+    Marks an attendee present from a scan: verifies the signed token, looks
+    the attendee up by email and upserts the attendance in one statement.
+    The response carries only ids, not nested serializers.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(
+        request={
+            'type': 'object',
+            'properties': {
+                'event_id': {'type': 'integer'},
+                'email': {'type': 'string', 'format': 'email'},
+                'token': {'type': 'string'},
+                'nonce': {'type': 'string', 'description': 'From checkin/session/, instead of the token'},
+                'full_name': {'type': 'string'},
+                'student_id': {'type': 'string'}
+            },
+            'required': ['event_id', 'email']
+        },
+        responses={200: {
+            'type': 'object',
+            'properties': {
+                'id': {'type': 'integer'},
+                'event': {'type': 'integer'},
+                'attendee': {'type': 'integer'},
+                'present': {'type': 'boolean'}
+            }
+        }, 202: {
+            'type': 'object',
+            'properties': {
+                'event': {'type': 'integer'},
+                'attendee': {'type': 'integer'},
+                'status': {'type': 'string'},
+                'receipt': {'type': 'string'}
+            }
+        }},
+        description="Check in to an event by scanning its QR code (202 with a receipt when CHECKIN_WRITE_BEHIND is on)"
+    )
+    def post(self, request):
+        from .checkin import CheckinError, check_in, consuming_nonce, queue_check_in
+        from .checkin_journal import write_behind_enabled
+        from .checkin_tokens import CheckinToken
+
+        event_id = request.data.get('event_id')
+        email = (request.data.get('email') or '').strip()
+        if not event_id or not email:
+            return Response({'detail': 'Event ID and email required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            event_id = int(event_id)
+        except (TypeError, ValueError):
+            return Response({'detail': 'Invalid event ID'}, status=status.HTTP_400_BAD_REQUEST)
+
+        token, error = verify_checkin_token(request, event_id)
+        if error:
+            return error
+
+        details = {
+            'full_name': request.data.get('full_name', ''),
+            'student_id': request.data.get('student_id', ''),
+            'user': request.user if request.user.is_authenticated else None,
+        }
+        if token:
+            details['policy_version'] = token.policy_version
+        try:
+            with consuming_nonce(token):
+                if write_behind_enabled():
+                    # Acknowledged from the check-in journal; run_checkin_writer writes it
+                    journal_token = request.data.get('token') if isinstance(token, CheckinToken) else None
+                    attendance = queue_check_in(event_id, email, token=journal_token, **details)
+                else:
+                    attendance = check_in(event_id, email, verified=token is not None, **details)
+        except CheckinError as e:
+            body = {'detail': e.detail}
+            if e.action:
+                body['action'] = e.action
+            return Response(body, status=e.status)
+        if attendance['id'] is None:
+            return Response(attendance, status=status.HTTP_202_ACCEPTED)
+        return Response(attendance)
+
+class CheckInSessionView(APIView):
+    """
+    Check-in Session Endpoint
+
+    Called by the check-in page as soon as it opens: verifies the rotating
+    token from the scanned QR code while it is fresh and trades it for a
+    nonce that the check-in form submits instead, valid for
+    CHECKIN_NONCE_TTL seconds and for one check-in.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(
+        request={
+            'type': 'object',
+            'properties': {
+                'event_id': {'type': 'integer'},
+                'token': {'type': 'string'}
+            },
+            'required': ['event_id', 'token']
+        },
+        responses={200: {
+            'type': 'object',
+            'properties': {
+                'nonce': {'type': 'string'},
+                'expires_in': {'type': 'integer'}
+            }
+        }},
+        description="Exchange the token of a just-scanned QR code for a check-in nonce"
+    )
+    def post(self, request):
+        from django.conf import settings
+
+        try:
+            event_id = int(request.data.get('event_id'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Invalid event ID'}, status=status.HTTP_400_BAD_REQUEST)
+        token = request.data.get('token')
+        if not token:
+            return Response({'detail': 'Please scan the event QR code to check in', 'reason': 'missing_token'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            verified = verify_token(token, event_id=event_id)
+        except InvalidCheckinToken as e:
+            return checkin_token_response(e)
+        return Response({'nonce': issue_nonce(verified), 'expires_in': settings.CHECKIN_NONCE_TTL})
+
+class CheckInStatusView(APIView):
+    """
+    Check-in Status Endpoint
+
+    State of a scan by its write-behind ``receipt``, or of an attendee at
+    an event (``event_id`` and ``email``), counting scans still waiting in
+    the check-in journal as pending.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('receipt', OpenApiTypes.STR, description='Receipt key returned by a pending check-in'),
+            OpenApiParameter('event_id', OpenApiTypes.INT),
+            OpenApiParameter('email', OpenApiTypes.STR),
+        ],
+        responses={200: {
+            'type': 'object',
+            'properties': {
+                'status': {'type': 'string'},
+                'pending': {'type': 'boolean'},
+                'attendance': {'type': 'integer', 'nullable': True}
+            }
+        }},
+        description="Whether a check-in has been written yet: pending, present, absent, or a batch status such as full"
+    )
+    def get(self, request):
+        from .checkin import check_in_status
+
+        receipt = request.query_params.get('receipt')
+        if receipt:
+            state = check_in_status(receipt=receipt)
+        else:
+            email = (request.query_params.get('email') or '').strip()
+            try:
+                event_id = int(request.query_params.get('event_id'))
+            except (TypeError, ValueError):
+                return Response({'detail': 'A receipt, or an event ID and email, is required'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if not email:
+                return Response({'detail': 'A receipt, or an event ID and email, is required'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            state = check_in_status(event_id=event_id, email=email)
+        if state is None:
+            return Response({'detail': 'No check-in found', 'status': 'unknown', 'pending': False},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(state)
+
+class CheckInBatchView(APIView):
+    """
+    Batch Check-in Endpoint
+
+    Accepts up to CHECKIN_BATCH_MAX scans queued by a scanner device and
+    returns one result per scan, in order.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(
+        request={
+            'type': 'object',
+            'properties': {
+                'scans': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'event_id': {'type': 'integer'},
+                            'email': {'type': 'string', 'format': 'email'},
+                            'student_id': {'type': 'string'},
+                            'scanned_at': {'type': 'string', 'format': 'date-time'},
+                            'token': {'type': 'string'}
+                        }
+                    }
+                }
+            },
+            'required': ['scans']
+        },
+        responses={200: {
+            'type': 'object',
+            'properties': {
+                'results': {'type': 'array', 'items': {'type': 'object'}},
+                'summary': {'type': 'object'}
+            }
+        }},
+        description="Check in a batch of queued scans; each result has a status such as checked_in, already_present, unknown_attendee or full"
+    )
+    def post(self, request):
+        from collections import Counter
+        from django.conf import settings
+        from .checkin import check_in_batch
+
+        scans = request.data.get('scans')
+        if not isinstance(scans, list) or not scans:
+            return Response({'detail': 'A non-empty list of scans is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > settings.CHECKIN_BATCH_MAX:
+            return Response({'detail': f'At most {settings.CHECKIN_BATCH_MAX} scans per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = check_in_batch(scans)
+        return Response({
+            'results': results,
+            'summary': Counter(result['status'] for result in results),
+        })
+
 class EventViewSet(viewsets.ModelViewSet):
     """
     Event Management ViewSet
@@ -163,6 +434,17 @@ class EventViewSet(viewsets.ModelViewSet):
         event.generate_qr_code()
         event.save()
     
+    def perform_update(self, serializer):
+        old_start, old_end, old_capacity = serializer.instance.start, serializer.instance.end, serializer.instance.max_capacity
+        event = serializer.save()
+        # Outstanding check-in tokens carry the capacity policy version
+        if event.max_capacity != old_capacity:
+            event.capacity_policy_version += 1
+        # The printed QR code's token is tied to the schedule and policy
+        if (event.start, event.end, event.max_capacity) != (old_start, old_end, old_capacity):
+            event.generate_qr_code()
+            event.save(update_fields=['capacity_policy_version', 'qr_code'])
+    
     @action(detail=True, methods=['get'])
     def attendees(self, request, pk=None):
         event = self.get_object()
@@ -171,6 +453,7 @@ class EventViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
+    @reads_from_replica
     def export_attendance(self, request, pk=None):
         import csv
         from django.http import HttpResponse
@@ -197,7 +480,96 @@ class EventViewSet(viewsets.ModelViewSet):
         
         return response
     
+    @action(detail=True, methods=['get'])
+    def download_certificates(self, request, pk=None):
+        """Stream a ZIP of every generated certificate for the event"""
+        import re
+        from django.http import StreamingHttpResponse
+        from .utils import stream_zip
+        
+        event = self.get_object()
+        attendances = (Attendance.objects.filter(event=event)
+                       .exclude(certificate='').exclude(certificate__isnull=True)
+                       .select_related('attendee')
+                       .only('id', 'certificate', 'attendee__full_name')
+                       .order_by('id'))
+        
+        def entries():
+            for att in attendances.iterator(chunk_size=500):
+                name = re.sub(r'[^A-Za-z0-9_-]+', '_', att.attendee.full_name).strip('_') or 'attendee'
+                yield f"certificate_{name}_{att.id}.pdf", (lambda f=att.certificate: f.storage.open(f.name, 'rb'))
+        
+        response = StreamingHttpResponse(stream_zip(entries()), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="certificates_event_{event.id}.zip"'
+        return response
+    
+    @action(detail=True, methods=['get'])
+    def print_certificates(self, request, pk=None):
+        """Render every issued certificate for the event into one print-ready PDF"""
+        import tempfile
+        from .certificates import render_certificates_pdf
+        
+        event = self.get_object()
+        attendances = (Attendance.objects.filter(event=event, present=True)
+                       .exclude(certificate='').exclude(certificate__isnull=True)
+                       .select_related('attendee', 'event')
+                       .order_by('attendee__full_name'))
+        if not attendances.exists():
+            return Response({'detail': 'No certificates have been generated for this event'}, status=status.HTTP_404_NOT_FOUND)
+        
+        output = tempfile.TemporaryFile()
+        render_certificates_pdf(attendances.iterator(chunk_size=500), output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'certificates_event_{event.id}_print.pdf', content_type='application/pdf')
+    
+    @action(detail=True, methods=['get', 'post'])
+    def sync(self, request, pk=None):
+        """
+        Offline scanner sync.
+
+        GET returns the event's roster: everything without ``cursor``,
+        otherwise only attendances changed since that cursor, or everything
+        again with ``full`` set when rows were deleted or merged. POST also
+        uploads queued scans ({scans: [...], cursor}) for this event first;
+        scans carrying an idempotency key that was already applied are not
+        applied twice. Rows are [attendee, email, student_id, present, time_out].
+        """
+        from django.conf import settings
+        from .checkin import ROSTER_FIELDS, check_in_batch, decode_sync_cursor, event_roster
+        
+        event = self.get_object()
+        params = request.data if request.method == 'POST' else request.query_params
+        cursor = params.get('cursor')
+        since = None
+        if cursor:
+            try:
+                since = decode_sync_cursor(cursor)
+            except (TypeError, ValueError, OverflowError):
+                return Response({'detail': 'Invalid sync cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = None
+        if request.method == 'POST':
+            scans = request.data.get('scans') or []
+            if not isinstance(scans, list) or len(scans) > settings.CHECKIN_BATCH_MAX:
+                return Response({'detail': f'scans must be a list of at most {settings.CHECKIN_BATCH_MAX} items'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            results = check_in_batch([dict(scan, event_id=event.id) if isinstance(scan, dict) else scan for scan in scans])
+            event.refresh_from_db(fields=['present_count'])
+        
+        rows, next_cursor, full = event_roster(event.id, since)
+        data = {
+            'event': {'id': event.id, 'max_capacity': event.max_capacity, 'present_count': event.present_count},
+            'full': full,
+            'cursor': next_cursor,
+            'fields': ROSTER_FIELDS,
+            'rows': rows,
+        }
+        if results is not None:
+            data['results'] = results
+        return Response(data)
+    
     @action(detail=False, methods=['get'])
+    @reads_from_replica
     def stats(self, request):
         total_events = Event.objects.count()
         upcoming = Event.objects.filter(start__gt=timezone.now()).count()
@@ -215,50 +587,64 @@ class EventViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def qr_code(self, request, pk=None):
+        """
+        QR code for the event's check-in page.
+
+        ``?output=svg`` or ``?output=png`` returns the live image, with a
+        rotating check-in token, from the in-memory QR cache (SVG scales
+        cleanly on projectors); otherwise the URL of the stored PNG, whose
+        token lasts for the whole event, is returned together with how
+        often the live image must be reloaded.
+        """
+        from django.conf import settings
+        from django.http import HttpResponse
+        from .checkin_tokens import rotation_expires_in
+        from .qr import QR_CONTENT_TYPES, event_qr
+        
         event = self.get_object()
+        output = request.query_params.get('output')
+        if output:
+            if output not in QR_CONTENT_TYPES:
+                return Response({'detail': 'output must be png or svg'}, status=status.HTTP_400_BAD_REQUEST)
+            # Live codes carry the rotating token and expire with it
+            response = HttpResponse(event_qr(event, output, rotating=True), content_type=QR_CONTENT_TYPES[output])
+            max_age = rotation_expires_in()
+            response['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'public, max-age=300'
+            return response
+        
         if not event.qr_code:
             event.generate_qr_code()
-            event.save()
-        return Response({'qr_code_url': event.qr_code.url if event.qr_code else None})
-    
-    @action(detail=False, methods=['post'])
-    def qr_checkin(self, request):
-        """Check in using QR code data"""
-        qr_data = request.data.get('qr_data')
-        attendee_data = request.data.get('attendee')
-        
-        # Parse QR data to get event ID
-        try:
-            event_id = int(qr_data.split('Event ID: ')[1].split(' -')[0])
-            event = Event.objects.get(id=event_id)
-        except:
-            return Response({'detail': 'Invalid QR code'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Use existing time_in logic
-        return AttendanceViewSet().time_in(request._request if hasattr(request, '_request') else request)
+            event.save(update_fields=['qr_code'])
+        return Response({
+            'qr_code_url': event.qr_code.url if event.qr_code else None,
+            'rotation_seconds': settings.QR_TOKEN_ROTATION,
+        })
     
     @action(detail=False, methods=['get'])
+    @reads_from_replica
     def analytics(self, request):
         """Event analytics dashboard"""
-        from django.db.models import Count, Q
+        from django.db.models import Count, F
+        from django.db.models.functions import TruncMonth
         from datetime import datetime, timedelta
         
         now = timezone.now()
         last_30_days = now - timedelta(days=30)
+        # TruncMonth instead of SQLite's strftime() so this also runs on PostgreSQL
+        by_month = (Event.objects.filter(start__gte=last_30_days).annotate(month=TruncMonth('start'))
+                    .values('month').annotate(count=Count('id')).order_by('month'))
         
         analytics = {
             'events_by_category': list(Event.objects.values('category').annotate(count=Count('id'))),
-            'events_by_month': list(Event.objects.filter(start__gte=last_30_days).extra(
-                select={'month': 'strftime("%%Y-%%m", start)'}
-            ).values('month').annotate(count=Count('id'))),
+            'events_by_month': [{'month': row['month'].strftime('%Y-%m'), 'count': row['count']} for row in by_month],
             'attendance_rate': {
                 'total_registered': Attendance.objects.count(),
                 'total_present': Attendance.objects.filter(present=True).count(),
                 'total_certificates': Attendance.objects.exclude(certificate='').count(),
             },
-            'popular_events': list(Event.objects.annotate(
-                attendee_count=Count('attendances', filter=Q(attendances__present=True))
-            ).order_by('-attendee_count')[:5].values('id', 'title', 'attendee_count')),
+            'popular_events': list(Event.objects.order_by('-present_count')[:5].values(
+                'id', 'title', attendee_count=F('present_count')
+            )),
         }
         
         return Response(analytics)
@@ -334,7 +720,32 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.AllowAny]
     
+    # Direct edits keep Event.present_count in step; capacity is only enforced on check-in
+    def perform_create(self, serializer):
+        from .checkin import adjust_present_count
+        attendance = serializer.save()
+        if attendance.present:
+            adjust_present_count(attendance.event_id, 1)
+    
+    def perform_update(self, serializer):
+        from .checkin import adjust_present_count
+        old_event_id, old_present = serializer.instance.event_id, serializer.instance.present
+        attendance = serializer.save()
+        if (old_event_id, old_present) != (attendance.event_id, attendance.present):
+            if old_present:
+                adjust_present_count(old_event_id, -1)
+            if attendance.present:
+                adjust_present_count(attendance.event_id, 1)
+    
+    def perform_destroy(self, instance):
+        from .checkin import adjust_present_count
+        event_id, present = instance.event_id, instance.present
+        instance.delete()
+        if present:
+            adjust_present_count(event_id, -1)
+    
     @action(detail=False, methods=['get'])
+    @reads_from_replica
     def analytics(self, request):
         event_id = request.query_params.get('event_id')
         if event_id:
@@ -366,66 +777,60 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Event ID and email required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            event = Event.objects.get(id=event_id)
-        except Event.DoesNotExist:
-            return Response({'detail': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
+            event_id = int(event_id)
+        except (TypeError, ValueError):
+            return Response({'detail': 'Invalid event ID'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Find or create attendee
+        token, error = verify_checkin_token(request, event_id)
+        if error:
+            return error
+        
+        # Decided from the event's cached roster; see vpass.roster_cache
+        from django.db import transaction
+        from .checkin import CheckinError, consuming_nonce, toggle_attendance
+        from .checkin_tokens import CheckinNonce
         try:
-            attendee = Attendee.objects.get(email=attendee_email)
-        except Attendee.DoesNotExist:
+            with consuming_nonce(token):
+                action, roster, member = toggle_attendance(event_id, attendee_email,
+                                                           policy_version=token.policy_version if token else None)
+                if action == 'register' and isinstance(token, CheckinNonce):
+                    # Nothing was checked in: keep the nonce for the details form
+                    transaction.set_rollback(True)
+        except CheckinError as e:
+            return Response({'detail': e.detail}, status=e.status)
+        
+        if action == 'register':
             return Response({
                 'action': 'register',
                 'detail': 'Please provide your details first',
-                'event': EventSerializer(event).data
+                'event': EventSerializer(Event.objects.get(id=roster.event_id)).data
             }, status=status.HTTP_200_OK)
         
-        # Check if attendance record exists
-        try:
-            attendance = Attendance.objects.get(event=event, attendee=attendee)
-            
-            # If already timed in but not timed out: TIME OUT
-            if attendance.present and not attendance.time_out:
-                attendance.time_out = timezone.now()
-                attendance.save()
-                
-                serializer = self.get_serializer(attendance)
-                return Response({
-                    'action': 'time_out',
-                    'detail': 'Time Out successful!',
-                    'attendance': serializer.data,
-                    'next_step': 'survey' if Survey.objects.filter(event=event, is_active=True).exists() else 'certificate'
-                }, status=status.HTTP_200_OK)
-            
-            # If already completed everything
-            elif attendance.time_out:
-                serializer = self.get_serializer(attendance)
-                return Response({
-                    'action': 'completed',
-                    'detail': 'You have already completed this event',
-                    'attendance': serializer.data
-                }, status=status.HTTP_200_OK)
-                
-        except Attendance.DoesNotExist:
-            # No attendance record: TIME IN
-            # Check capacity
-            if event.max_capacity > 0:
-                current_count = Attendance.objects.filter(event=event, present=True).count()
-                if current_count >= event.max_capacity:
-                    return Response({'detail': f'Event is full! Maximum capacity: {event.max_capacity}'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            attendance = Attendance.objects.create(
-                event=event,
-                attendee=attendee,
-                present=True
-            )
-            
-            serializer = self.get_serializer(attendance)
+        attendance = {
+            'id': member.attendance_id,
+            'event': roster.event_id,
+            'attendee': member.attendee_id,
+            'present': member.present,
+            'time_out': member.time_out,
+        }
+        if action == 'time_out':
             return Response({
-                'action': 'time_in',
-                'detail': 'Time In successful! Enjoy the event.',
-                'attendance': serializer.data
-            }, status=status.HTTP_201_CREATED)
+                'action': 'time_out',
+                'detail': 'Time Out successful!',
+                'attendance': attendance,
+                'next_step': 'survey' if roster.has_survey else 'certificate'
+            }, status=status.HTTP_200_OK)
+        if action == 'completed':
+            return Response({
+                'action': 'completed',
+                'detail': 'You have already completed this event',
+                'attendance': attendance
+            }, status=status.HTTP_200_OK)
+        return Response({
+            'action': 'time_in',
+            'detail': 'Time In successful! Enjoy the event.',
+            'attendance': attendance
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=False, methods=['post'])
     def time_in(self, request):
@@ -435,38 +840,36 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         if not event_id or not attendee_data:
             return Response({'detail': 'Event ID and attendee data required'}, status=status.HTTP_400_BAD_REQUEST)
         
+        token, error = verify_checkin_token(request, event_id)
+        if error:
+            return error
+        
         try:
             event = Event.objects.get(id=event_id)
         except Event.DoesNotExist:
             return Response({'detail': 'Event not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Check capacity
-        if event.max_capacity > 0:
-            current_count = Attendance.objects.filter(event=event, present=True).count()
-            if current_count >= event.max_capacity:
-                return Response({'detail': f'Event is full! Maximum capacity: {event.max_capacity}'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        attendee, _ = Attendee.objects.get_or_create(
-            email=attendee_data['email'],
-            defaults={
-                'full_name': attendee_data.get('full_name', ''),
-                'student_id': attendee_data.get('student_id', ''),
-                'user': request.user if request.user.is_authenticated else None
-            }
-        )
-        
-        attendance, created = Attendance.objects.get_or_create(
-            event=event,
-            attendee=attendee,
-            defaults={'present': True}
-        )
-        
-        if not created:
-            attendance.present = True
-            attendance.save()
+        # Capacity is checked by taking a seat on the event's present counter
+        from .checkin import CheckinError, consuming_nonce, find_attendee_id, mark_present, note_present, register_attendee
+        email = attendee_data.get('email')
+        if not email:
+            return Response({'detail': 'Attendee email required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with consuming_nonce(token):
+                attendee_id = find_attendee_id(email) or register_attendee(
+                    email,
+                    attendee_data.get('full_name', ''),
+                    attendee_data.get('student_id', ''),
+                    request.user if request.user.is_authenticated else None,
+                )
+                result = mark_present(event.id, attendee_id, policy_version=token.policy_version if token else None)
+        except CheckinError as e:
+            return Response({'detail': e.detail}, status=e.status)
+        note_present(event.id, email, attendee_id, result.attendance_id)
         
+        attendance = self.get_queryset().get(pk=result.attendance_id)
         serializer = self.get_serializer(attendance)
-        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if result.created else status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'])
     def time_out(self, request, pk=None):
@@ -496,10 +899,12 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         
         all_tasks_completed = time_in_done and time_out_done and survey_done
         
-        # ONLY generate certificate if ALL 3 tasks are completed
-        if all_tasks_completed:
-            if not attendance.certificate or attendance.certificate.size < 1000:
-                attendance.generate_certificate()
+        # ONLY queue certificate generation if ALL 3 tasks are completed.
+        # The PDF is rendered by the run_certificate_worker command.
+        if all_tasks_completed and not attendance.has_valid_certificate:
+            enqueue_certificate(attendance)
+        
+        certificate_ready = attendance.has_valid_certificate and all_tasks_completed
         
         return Response({
             'time_in': time_in_done,
@@ -507,7 +912,8 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             'survey_completed': survey_done,
             'event_has_survey': event_has_surveys,
             'all_completed': all_tasks_completed,
-            'certificate_ready': bool(attendance.certificate and attendance.certificate.size > 1000) and all_tasks_completed,
+            'certificate_ready': certificate_ready,
+            'certificate_status': 'ready' if certificate_ready else certificate_status(attendance) if all_tasks_completed else 'none',
             'certificate_reviewed': attendance.certificate_reviewed,
             'certificate_approved': attendance.certificate_approved
         })
@@ -527,35 +933,44 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         
     @action(detail=True, methods=['get'])
     def download_certificate(self, request, pk=None):
-        import os
-        from django.conf import settings
-        
         attendance = self.get_object()
         
-        # If no certificate or file is too small (corrupted), regenerate
-        if not attendance.certificate or attendance.certificate.size < 1000:
-            if attendance.present:
-                attendance.generate_certificate()
-            else:
+        # If no certificate or it was recorded as too small (corrupted), queue a regeneration
+        if not attendance.has_valid_certificate:
+            if not attendance.present:
                 return Response({'detail': 'Certificate not available'}, status=status.HTTP_404_NOT_FOUND)
+            
+            job = enqueue_certificate(attendance)
+            if job.status == 'FAILED':
+                return Response({
+                    'detail': 'Certificate generation failed. Please contact the event organizer.',
+                    'certificate_status': 'failed'
+                }, status=status.HTTP_202_ACCEPTED)
+            return Response({
+                'detail': 'Certificate is being generated. Please try again shortly.',
+                'certificate_status': 'pending'
+            }, status=status.HTTP_202_ACCEPTED)
         
-        if not attendance.certificate:
-            return Response({'detail': 'Certificate generation failed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        # Get the full file path
-        certificate_path = attendance.certificate.path
-        
-        # Check if file exists
-        if not os.path.exists(certificate_path):
-            return Response({'detail': 'Certificate file not found on server'}, status=status.HTTP_404_NOT_FOUND)
+        # The checksum is a strong validator: repeat downloads only cost a 304
+        etag = quote_etag(attendance.certificate_sha256) if attendance.certificate_sha256 else None
+        if etag:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
         
-        # Open the file and create response
+        filename = f"certificate_{attendance.attendee.full_name.replace(' ', '_')}.pdf"
         try:
-            certificate_file = open(certificate_path, 'rb')
-            response = FileResponse(certificate_file, content_type='application/pdf')
-            filename = f"certificate_{attendance.attendee.full_name.replace(' ', '_')}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
+            return file_download_response(
+                request,
+                attendance.certificate,
+                filename,
+                size=attendance.certificate_size,
+                etag=etag,
+                content_type='application/pdf'
+            )
+        except FileNotFoundError:
+            return Response({'detail': 'Certificate file not found on server'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({'detail': f'Error opening certificate: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -605,42 +1020,19 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def email_certificate(self, request, pk=None):
-        import os
-        from django.core.mail import EmailMessage
+        from .emails import queue_certificate_email
         
         attendance = self.get_object()
         if not attendance.certificate:
             return Response({'detail': 'Certificate not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Check if file exists
-        certificate_path = attendance.certificate.path
-        if not os.path.exists(certificate_path):
-            return Response({'detail': 'Certificate file not found on server'}, status=status.HTTP_404_NOT_FOUND)
-        
-        try:
-            email = EmailMessage(
-                subject=f'Certificate for {attendance.event.title}',
-                body=f'Dear {attendance.attendee.full_name},\n\nCongratulations! Your certificate for {attendance.event.title} is attached.\n\nBest regards,\nHCDC Event System',
-                from_email='noreply@hcdc.edu.ph',
-                to=[attendance.attendee.email]
-            )
-            
-            # Read the certificate file
-            with open(certificate_path, 'rb') as cert_file:
-                email.attach(f'certificate.pdf', cert_file.read(), 'application/pdf')
-            
-            email.send(fail_silently=False)
-            return Response({
-                'detail': f'Certificate sent to {attendance.attendee.email}! Please check your inbox.',
-                'note': 'Note: Email feature is in development mode. Check Django console for email preview.'
-            })
-        except Exception as e:
-            # Email sending failed - this is OK for development
-            # In production, you would configure a real email server
-            return Response({
-                'detail': 'Email feature not configured. Please download the certificate instead.',
-                'note': 'To enable email: Configure EMAIL_BACKEND in settings.py'
-            }, status=status.HTTP_200_OK)  # Return 200 instead of 500
+        # Only queued here; run_email_worker attaches the PDF and sends it
+        email = queue_certificate_email(attendance)
+        return Response({
+            'detail': f'Certificate will be sent to {attendance.attendee.email} shortly. Please check your inbox.',
+            'email_id': email.id,
+            'email_status': email.status.lower(),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class SurveyViewSet(viewsets.ModelViewSet):
@@ -681,7 +1073,7 @@ class SurveyResponseViewSet(viewsets.ModelViewSet):
             
             # Check completion
             if attendance.present and not attendance.certificate:
-                attendance.generate_certificate()
+                enqueue_certificate(attendance)
         
         return response
 
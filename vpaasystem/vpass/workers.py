@@ -0,0 +1,29 @@
+"""
+Entry points for the certificate rendering process pools.
+
+With the spawn start method (the default on Windows and macOS) each pool
+child imports this module before Django is set up, so nothing here may
+import models at module level: the initializer sets Django up first and
+the entry points only import vpass.tasks when they run.
+"""
+
+
+def init_worker():
+    """Pool initializer: set Django up and make sure no parent DB connection is reused."""
+    import django
+    from django.apps import apps
+    from django.db import connections
+
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def run_certificate_job(job_id):
+    from .tasks import run_certificate_job
+    return run_certificate_job(job_id)
+
+
+def generate_certificates_for_ids(attendance_ids):
+    from .tasks import generate_certificates_for_ids
+    return generate_certificates_for_ids(attendance_ids)